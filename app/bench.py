@@ -0,0 +1,389 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+import orjson
+
+
+# Per-turn stages reported from /api/metrics: (metric, label filter).
+STAGES = {
+	"memory_load": ("samurai_memory_operation_duration_seconds", 'operation="load"'),
+	"context_state": ("samurai_memory_operation_duration_seconds", 'operation="load_state"'),
+	"tool": ("samurai_tool_duration_seconds", ""),
+	"llm": ("samurai_llm_request_duration_seconds", ""),
+	"llm_ttft": ("samurai_llm_time_to_first_token_seconds", ""),
+	"memory_save": ("samurai_memory_operation_duration_seconds", 'operation="append"'),
+}
+
+
+def _int_list(value: str) -> List[int]:
+	return [int(v) for v in value.split(",") if v.strip()]
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+	if not values:
+		return None
+	ordered = sorted(values)
+	return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def parse_metrics(text: str) -> Dict[str, float]:
+	"""Samples of a Prometheus text exposition keyed by ``name{labels}``."""
+	samples: Dict[str, float] = {}
+	for line in text.splitlines():
+		if not line or line.startswith("#"):
+			continue
+		key, _, value = line.rpartition(" ")
+		try:
+			samples[key] = float(value)
+		except ValueError:
+			continue
+	return samples
+
+
+def _series_total(samples: Dict[str, float], name: str, label: str) -> float:
+	return sum(
+		v for k, v in samples.items()
+		if (k == name or k.startswith(name + "{")) and label in k
+	)
+
+
+def stage_breakdown(before: Dict[str, float], after: Dict[str, float]) -> Dict[str, Any]:
+	"""Mean milliseconds and call count per stage between two scrapes."""
+	stages: Dict[str, Any] = {}
+	for stage, (metric, label) in STAGES.items():
+		count = _series_total(after, metric + "_count", label) - _series_total(
+			before, metric + "_count", label
+		)
+		total = _series_total(after, metric + "_sum", label) - _series_total(
+			before, metric + "_sum", label
+		)
+		if count > 0:
+			stages[stage] = {"calls": int(count), "mean_ms": total / count * 1000}
+	return stages
+
+
+async def chat_once(client: httpx.AsyncClient, payload: Dict[str, Any]) -> Tuple[float, None]:
+	start = time.perf_counter()
+	resp = await client.post("/api/chat", json=payload)
+	resp.raise_for_status()
+	return time.perf_counter() - start, None
+
+
+async def stream_once(
+	client: httpx.AsyncClient, payload: Dict[str, Any]
+) -> Tuple[float, Optional[float]]:
+	"""Latency of a full ``/api/chat/stream`` response and its time to the
+	first text chunk."""
+	start = time.perf_counter()
+	ttft = None
+	async with client.stream("POST", "/api/chat/stream", json=payload) as resp:
+		resp.raise_for_status()
+		async for line in resp.aiter_lines():
+			if ttft is None and line.startswith("data:"):
+				event = orjson.loads(line[5:])
+				if "chunk" in event:
+					ttft = time.perf_counter() - start
+	return time.perf_counter() - start, ttft
+
+
+async def run_level(
+	client: httpx.AsyncClient,
+	endpoint: str,
+	concurrency: int,
+	history: int,
+	requests: int,
+	message: str,
+	tool: Optional[str],
+	seed: Callable[[str, int], Awaitable[None]],
+) -> Dict[str, Any]:
+	run = uuid.uuid4().hex[:8]
+	sessions = [f"bench-{run}-{i}" for i in range(concurrency)]
+	for session_id in sessions:
+		await seed(session_id, history)
+	before = parse_metrics((await client.get("/api/metrics")).text)
+	send = stream_once if endpoint == "stream" else chat_once
+	latencies: List[float] = []
+	ttfts: List[float] = []
+	errors: Dict[str, int] = {}
+	remaining = iter(range(requests))
+
+	async def worker(session_id: str) -> None:
+		for _ in remaining:
+			payload: Dict[str, Any] = {"session_id": session_id, "message": message}
+			if tool:
+				payload["options"] = {"tool": tool}
+			try:
+				latency, ttft = await send(client, payload)
+			except httpx.HTTPStatusError as e:
+				key = str(e.response.status_code)
+				errors[key] = errors.get(key, 0) + 1
+				continue
+			except httpx.HTTPError as e:
+				key = type(e).__name__
+				errors[key] = errors.get(key, 0) + 1
+				continue
+			latencies.append(latency)
+			if ttft is not None:
+				ttfts.append(ttft)
+
+	start = time.perf_counter()
+	await asyncio.gather(*(worker(s) for s in sessions))
+	elapsed = time.perf_counter() - start
+	after = parse_metrics((await client.get("/api/metrics")).text)
+
+	def ms(value: Optional[float]) -> Optional[float]:
+		return None if value is None else value * 1000
+
+	rss_before = before.get("process_resident_memory_bytes")
+	rss_after = after.get("process_resident_memory_bytes")
+	return {
+		"endpoint": endpoint,
+		"concurrency": concurrency,
+		"history": history,
+		"requests": requests,
+		"ok": len(latencies),
+		"errors": errors,
+		"elapsed_s": elapsed,
+		"throughput_rps": len(latencies) / elapsed if elapsed > 0 else 0.0,
+		"latency_ms": {
+			"p50": ms(percentile(latencies, 0.5)),
+			"p95": ms(percentile(latencies, 0.95)),
+			"p99": ms(percentile(latencies, 0.99)),
+		},
+		"ttft_ms": {
+			"p50": ms(percentile(ttfts, 0.5)),
+			"p95": ms(percentile(ttfts, 0.95)),
+			"p99": ms(percentile(ttfts, 0.99)),
+		} if ttfts else None,
+		"stages": stage_breakdown(before, after),
+		"rss_mb": None if rss_after is None else rss_after / 2**20,
+		"rss_growth_mb": None if rss_before is None or rss_after is None
+		else (rss_after - rss_before) / 2**20,
+	}
+
+
+def _print_row(result: Dict[str, Any]) -> None:
+	def fmt(value: Optional[float]) -> str:
+		return "-" if value is None else f"{value:.1f}"
+
+	ttft = result["ttft_ms"] or {}
+	stages = " ".join(f"{k}={v['mean_ms']:.2f}" for k, v in result["stages"].items())
+	print(
+		f"{result['endpoint']:>6} c={result['concurrency']:<4} h={result['history']:<5} "
+		f"{result['throughput_rps']:8.1f} req/s  "
+		f"p50={fmt(result['latency_ms']['p50'])} p95={fmt(result['latency_ms']['p95'])} "
+		f"p99={fmt(result['latency_ms']['p99'])} ttft50={fmt(ttft.get('p50'))}ms  "
+		f"err={sum(result['errors'].values())} rss={fmt(result['rss_mb'])}MB  [{stages}]",
+		file=sys.stderr,
+	)
+
+
+def measure_import(module: str = "app.main", runs: int = 5) -> Dict[str, Any]:
+	"""Import time of ``module`` in fresh interpreters (``python -X
+	importtime``), the part of a cold start the app controls. Also reports
+	the slowest imports made directly by ``module``. A failed import is
+	reported under ``error`` with ``ms`` set to None."""
+	totals: List[float] = []
+	error: Optional[str] = None
+	children: Dict[str, List[float]] = {}
+	for _ in range(max(1, runs)):
+		proc = subprocess.run(
+			[sys.executable, "-X", "importtime", "-c", f"import {module}"],
+			capture_output=True,
+			text=True,
+		)
+		if proc.returncode != 0:
+			lines = [line for line in proc.stderr.splitlines() if not line.startswith("import time:")]
+			error = "\n".join(lines[-5:]) or f"exit status {proc.returncode}"
+			break
+		# Lines are "import time: self [us] | cumulative | <indent>name", a
+		# module's imports listed (one level deeper) right before it.
+		block: List[Tuple[str, float]] = []
+		for line in proc.stderr.splitlines():
+			parts = line.split("|")
+			if len(parts) != 3 or not parts[1].strip().isdigit():
+				continue
+			name = parts[2].rstrip()
+			depth = (len(name) - len(name.lstrip()) - 1) // 2
+			cumulative = int(parts[1]) / 1000
+			if depth == 1:
+				block.append((name.strip(), cumulative))
+			elif depth == 0:
+				if name.strip() == module:
+					totals.append(cumulative)
+					for child, ms in block:
+						children.setdefault(child, []).append(ms)
+				block = []
+	slowest = sorted(
+		((name, statistics.median(values)) for name, values in children.items()),
+		key=lambda item: item[1],
+		reverse=True,
+	)[:5]
+	return {
+		"module": module,
+		"runs": len(totals),
+		"ms": {"median": round(statistics.median(totals), 1), "min": round(min(totals), 1)} if totals else None,
+		"slowest": {name: round(ms, 1) for name, ms in slowest},
+		"error": error,
+	}
+
+
+async def _start_server() -> Tuple[Any, "asyncio.Task[None]", str]:
+	"""Serve ``app.main`` from this process on an ephemeral local port."""
+	import uvicorn
+
+	from .main import app
+
+	sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+	# Accepted sockets inherit this; without it small responses on a socket
+	# passed to uvicorn wait ~40ms for delayed ACKs.
+	sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+	sock.bind(("127.0.0.1", 0))
+	port = sock.getsockname()[1]
+	server = uvicorn.Server(uvicorn.Config(app, log_level="warning", lifespan="on"))
+	task = asyncio.ensure_future(server.serve(sockets=[sock]))
+	while not server.started:
+		if task.done():
+			task.result()
+		await asyncio.sleep(0.01)
+	return server, task, f"http://127.0.0.1:{port}"
+
+
+async def main() -> None:
+	parser = argparse.ArgumentParser(
+		description="SAMURAI load test: measures the app's own overhead against the mock provider"
+	)
+	parser.add_argument("--url", default=None, help="Benchmark a running server instead of starting one in-process")
+	parser.add_argument("--endpoint", choices=["chat", "stream", "both"], default="both")
+	parser.add_argument("--concurrency", type=_int_list, default=[1, 8, 32], help="Comma-separated levels")
+	parser.add_argument("--history", type=_int_list, default=[0, 100], help="Comma-separated session sizes (messages)")
+	parser.add_argument("--requests", type=int, default=200, help="Requests per level")
+	parser.add_argument("--message", default="benchmark message")
+	parser.add_argument("--tool", default=None, help="Invoke this tool on every turn")
+	parser.add_argument("--mock-ttft", type=float, default=0.05, help="In-process mock: seconds to first token")
+	parser.add_argument("--mock-tps", type=float, default=200.0, help="In-process mock: tokens per second")
+	parser.add_argument("--mock-reply-tokens", type=int, default=64, help="In-process mock: reply length")
+	parser.add_argument("--json", dest="json_path", default=None, help="Write results as JSON to this path ('-' for stdout)")
+	parser.add_argument("--import-runs", type=int, default=5, help="Fresh interpreters timing the import of app.main (0 = skip)")
+	parser.add_argument("--import-budget-ms", type=float, default=None, help="Exit with status 1 if the median import time exceeds this")
+	parser.add_argument("--import-only", action="store_true", help="Only measure import time")
+	args = parser.parse_args()
+
+	import_report = None
+	if args.import_runs > 0 or args.import_only:
+		# Measured before the load test configures this process's environment.
+		import_report = measure_import("app.main", max(1, args.import_runs))
+		ms = import_report["ms"]
+		import_report["budget_ms"] = args.import_budget_ms
+		import_report["ok"] = args.import_budget_ms is None or (
+			ms is not None and ms["median"] <= args.import_budget_ms
+		)
+		if ms is None:
+			reason = (import_report["error"] or "no import time reported").splitlines()[-1]
+			print(f"import app.main  FAILED: {reason}", file=sys.stderr)
+		else:
+			budget = "" if args.import_budget_ms is None else f" budget={args.import_budget_ms:g}ms {'OK' if import_report['ok'] else 'OVER'}"
+			slowest = ", ".join(f"{name} {value:.0f}ms" for name, value in import_report["slowest"].items())
+			print(
+				f"import app.main  median={ms['median']:.0f}ms min={ms['min']:.0f}ms{budget}  [{slowest}]",
+				file=sys.stderr,
+			)
+
+	if args.import_only:
+		_finish({"import": import_report}, args.json_path, import_report)
+		return
+
+	server = task = None
+	tmpdir = None
+	if args.url:
+		base_url = args.url.rstrip("/")
+	else:
+		# Settings are read when app.main is imported, so configure first.
+		os.environ["SAMURAI_PROVIDERS"] = "mock"
+		os.environ["SAMURAI_MOCK_TTFT"] = str(args.mock_ttft)
+		os.environ["SAMURAI_MOCK_TOKENS_PER_SEC"] = str(args.mock_tps)
+		os.environ["SAMURAI_MOCK_REPLY_TOKENS"] = str(args.mock_reply_tokens)
+		if "SAMURAI_MEMORY_PATH" not in os.environ:
+			tmpdir = tempfile.TemporaryDirectory(prefix="samurai-bench-")
+			os.environ["SAMURAI_MEMORY_PATH"] = tmpdir.name
+		server, task, base_url = await _start_server()
+
+	endpoints = ["chat", "stream"] if args.endpoint == "both" else [args.endpoint]
+	limits = httpx.Limits(max_connections=max(args.concurrency) + 4)
+	results: List[Dict[str, Any]] = []
+	try:
+		async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+
+			async def seed(session_id: str, history: int) -> None:
+				if history <= 0:
+					return
+				if server is not None:
+					from .llm import ChatMessage
+					from .main import memory_store
+
+					roles = ("user", "assistant")
+					await memory_store.save_history(
+						session_id,
+						[ChatMessage(role=roles[i % 2], content=f"{args.message} {i}") for i in range(history)],
+					)
+				else:
+					for _ in range(history // 2):
+						await chat_once(client, {"session_id": session_id, "message": args.message})
+
+			for endpoint in endpoints:
+				for history in args.history:
+					for concurrency in args.concurrency:
+						result = await run_level(
+							client, endpoint, concurrency, history, args.requests,
+							args.message, args.tool, seed,
+						)
+						_print_row(result)
+						results.append(result)
+	finally:
+		if server is not None:
+			server.should_exit = True
+			await task
+		if tmpdir is not None:
+			tmpdir.cleanup()
+
+	report = {
+		"config": {
+			"url": args.url,
+			"requests": args.requests,
+			"tool": args.tool,
+			"mock": None if args.url else {
+				"ttft": args.mock_ttft,
+				"tokens_per_sec": args.mock_tps,
+				"reply_tokens": args.mock_reply_tokens,
+			},
+		},
+		"import": import_report,
+		"results": results,
+	}
+	_finish(report, args.json_path, import_report)
+
+
+def _finish(report: Dict[str, Any], json_path: Optional[str], import_report: Optional[Dict[str, Any]]) -> None:
+	if json_path == "-":
+		sys.stdout.buffer.write(orjson.dumps(report, option=orjson.OPT_INDENT_2) + b"\n")
+	elif json_path:
+		with open(json_path, "wb") as f:
+			f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+	if import_report is not None and not import_report["ok"]:
+		sys.exit(1)
+
+
+if __name__ == "__main__":
+	asyncio.run(main())
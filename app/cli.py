@@ -15,8 +15,11 @@ async def main() -> None:
 
 	settings = load_settings()
 	llm = LLMManager(settings)
-	resp = await llm.complete([ChatMessage(role="user", content=args.message)], model_hint=args.model)
-	print(getattr(resp, "text", str(resp)))
+	try:
+		resp = await llm.complete([ChatMessage(role="user", content=args.message)], model_hint=args.model)
+		print(getattr(resp, "text", str(resp)))
+	finally:
+		await llm.aclose()
 
 
 if __name__ == "__main__":
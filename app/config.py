@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import os
-from typing import List
+from typing import Dict, List, Optional
 
 
 class Settings:
@@ -22,6 +22,86 @@ class Settings:
 	openrouter_api_key: str
 	hf_api_key: str
 	ollama_base_url: str
+	hf_base_url: str
+	hf_timeout: float
+	hf_chat_template: str
+	hf_max_new_tokens: int
+	hf_batch_size: int
+	hf_batch_window_ms: float
+
+	http2: bool
+	http_max_connections: int
+	http_max_keepalive_connections: int
+	http_keepalive_expiry: float
+	openai_timeout: float
+	openrouter_timeout: float
+	ollama_timeout: float
+	ollama_keep_alive: str
+	ollama_preload: bool
+	ollama_warm_models: int
+	ollama_ping_interval: Optional[float]
+	mock_ttft: float
+	mock_ttft_jitter: float
+	mock_tokens_per_sec: float
+	mock_reply_tokens: int
+	mock_error_rate: float
+	mock_timeout_rate: float
+	mock_rate_limit_rate: float
+	mock_retry_after: float
+	mock_timeout: float
+	mock_seed: Optional[int]
+
+	health_window: int
+	circuit_failure_threshold: int
+	circuit_cooldown: float
+	hedge: bool
+	hedge_delay: float
+	hedge_min_delay: float
+
+	sse_coalesce_ms: float
+	sse_coalesce_bytes: int
+	sse_heartbeat: float
+	stream_buffer_items: int
+	stream_detach_timeout: float
+	stream_retention: float
+	provider_concurrency: str
+	provider_rpm: str
+	provider_tpm: str
+	provider_queue_max: int
+	rate_limit_retries: int
+	retry_after_max: float
+	session_affinity_max: int
+	batch_concurrency: int
+	batch_max_items: int
+
+	response_cache: str
+	response_cache_path: str
+	response_cache_ttl: float
+	response_cache_max_entries: int
+
+	context_budget: int
+	context_budgets: str
+	context_reserve: int
+	context_summarize: bool
+	schema_repair_retries: int
+
+	memory_backend: str
+	memory_path: str
+	memory_sqlite_path: str
+	memory_compact_ratio: float
+	memory_compact_min_bytes: int
+	memory_io_workers: int
+	memory_cache: bool
+	memory_cache_max_messages: int
+	memory_cache_max_bytes: int
+	memory_flush_interval: float
+
+	tool_timeout: float
+	tool_max_result_bytes: int
+	tool_thread_workers: int
+	tool_process_workers: int
+	tool_inline_max_bytes: int
+	tool_max_calls: int
 
 	def __init__(self) -> None:
 		self.app_name = os.getenv("SAMURAI_APP_NAME", "SAMURAI")
@@ -43,6 +123,168 @@ class Settings:
 		self.openrouter_api_key = os.getenv("OPENROUTER_API_KEY", "")
 		self.hf_api_key = os.getenv("HF_API_KEY", "")
 		self.ollama_base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+		# Text-generation-inference server, prompt format for the model
+		# ("mistral", "chatml", "llama3", "plain") and reply length. Batching
+		# of concurrent requests is for servers that accept a list of inputs.
+		self.hf_base_url = os.getenv("HF_BASE_URL", "http://localhost:8080")
+		self.hf_timeout = float(os.getenv("HF_TIMEOUT", "60"))
+		self.hf_chat_template = os.getenv("HF_CHAT_TEMPLATE", "mistral").strip().lower()
+		self.hf_max_new_tokens = int(os.getenv("HF_MAX_NEW_TOKENS", "512"))
+		self.hf_batch_size = int(os.getenv("HF_BATCH_SIZE", "0"))
+		self.hf_batch_window_ms = float(os.getenv("HF_BATCH_WINDOW_MS", "5"))
+
+		# Shared HTTP connection pool used by all network providers. HTTP/2 is
+		# only enabled when the optional ``h2`` package is installed.
+		self.http2 = _env_bool("SAMURAI_HTTP2", False)
+		self.http_max_connections = int(os.getenv("SAMURAI_HTTP_MAX_CONNECTIONS", "100"))
+		self.http_max_keepalive_connections = int(
+			os.getenv("SAMURAI_HTTP_MAX_KEEPALIVE", "20")
+		)
+		self.http_keepalive_expiry = float(os.getenv("SAMURAI_HTTP_KEEPALIVE_EXPIRY", "30"))
+		# Per-provider request timeouts in seconds; 0 disables the timeout.
+		self.openai_timeout = float(os.getenv("OPENAI_TIMEOUT", "60"))
+		self.openrouter_timeout = float(os.getenv("OPENROUTER_TIMEOUT", "60"))
+		self.ollama_timeout = float(os.getenv("OLLAMA_TIMEOUT", "0"))
+		# Ollama model residency: keep_alive sent with every request ("30m",
+		# seconds, -1 = forever), preload OLLAMA_MODEL at startup, models kept
+		# loaded at once (least recently used is unloaded; 0 = no limit) and
+		# seconds between keep-alive pings (default: half of keep_alive, 0 = off).
+		self.ollama_keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+		self.ollama_preload = _env_bool("OLLAMA_PRELOAD", True)
+		self.ollama_warm_models = int(os.getenv("OLLAMA_WARM_MODELS", "2"))
+		ping = os.getenv("OLLAMA_PING_INTERVAL", "")
+		self.ollama_ping_interval = float(ping) if ping else None
+		# Mock provider simulation for benchmarks and failure drills: median
+		# seconds before the first token (log-normal sigma in the jitter),
+		# generation rate (0 = legacy fixed pacing), reply length in tokens
+		# (0 = echo the prompt) and per-request fault probabilities.
+		self.mock_ttft = float(os.getenv("SAMURAI_MOCK_TTFT", "0"))
+		self.mock_ttft_jitter = float(os.getenv("SAMURAI_MOCK_TTFT_JITTER", "0"))
+		self.mock_tokens_per_sec = float(os.getenv("SAMURAI_MOCK_TOKENS_PER_SEC", "0"))
+		self.mock_reply_tokens = int(os.getenv("SAMURAI_MOCK_REPLY_TOKENS", "0"))
+		self.mock_error_rate = float(os.getenv("SAMURAI_MOCK_ERROR_RATE", "0"))
+		self.mock_timeout_rate = float(os.getenv("SAMURAI_MOCK_TIMEOUT_RATE", "0"))
+		self.mock_rate_limit_rate = float(os.getenv("SAMURAI_MOCK_RATE_LIMIT_RATE", "0"))
+		self.mock_retry_after = float(os.getenv("SAMURAI_MOCK_RETRY_AFTER", "1"))
+		self.mock_timeout = float(os.getenv("SAMURAI_MOCK_TIMEOUT", "30"))
+		seed = os.getenv("SAMURAI_MOCK_SEED", "")
+		self.mock_seed = int(seed) if seed else None
+
+		# Provider health: rolling window size, circuit breaker, hedging.
+		self.health_window = int(os.getenv("SAMURAI_HEALTH_WINDOW", "100"))
+		self.circuit_failure_threshold = int(os.getenv("SAMURAI_CIRCUIT_FAILURES", "5"))
+		self.circuit_cooldown = float(os.getenv("SAMURAI_CIRCUIT_COOLDOWN", "30"))
+		self.hedge = _env_bool("SAMURAI_HEDGE", False)
+		# Hedge delay before a provider has latency history, and lower bound.
+		self.hedge_delay = float(os.getenv("SAMURAI_HEDGE_DELAY", "2.0"))
+		self.hedge_min_delay = float(os.getenv("SAMURAI_HEDGE_MIN_DELAY", "0.25"))
+
+		# Max in-flight requests per provider, e.g. "openai=16,ollama=2".
+		self.provider_concurrency = os.getenv("SAMURAI_PROVIDER_CONCURRENCY", "")
+		# Per-provider requests/min and tokens/min, e.g. "openai=500".
+		self.provider_rpm = os.getenv("SAMURAI_PROVIDER_RPM", "")
+		self.provider_tpm = os.getenv("SAMURAI_PROVIDER_TPM", "")
+		# Requests allowed to wait per provider before answering 503.
+		self.provider_queue_max = int(os.getenv("SAMURAI_PROVIDER_QUEUE_MAX", "100"))
+		# On 429, retry the same provider after Retry-After if it is short.
+		self.rate_limit_retries = int(os.getenv("SAMURAI_RATE_LIMIT_RETRIES", "1"))
+		self.retry_after_max = float(os.getenv("SAMURAI_RETRY_AFTER_MAX", "10"))
+		# Sessions whose last provider is remembered, so their next turn goes
+		# back to it and its prompt cache (0 = plain priority order).
+		self.session_affinity_max = int(os.getenv("SAMURAI_SESSION_AFFINITY_MAX", "10000"))
+		# /api/chat/batch defaults.
+		self.batch_concurrency = int(os.getenv("SAMURAI_BATCH_CONCURRENCY", "8"))
+		self.batch_max_items = int(os.getenv("SAMURAI_BATCH_MAX_ITEMS", "1000"))
+
+		# SSE output: hold text up to this many ms / bytes per frame (0 = send
+		# whatever is ready), and a keep-alive comment after idle seconds.
+		self.sse_coalesce_ms = float(os.getenv("SAMURAI_SSE_COALESCE_MS", "0"))
+		self.sse_coalesce_bytes = int(os.getenv("SAMURAI_SSE_COALESCE_BYTES", "4096"))
+		self.sse_heartbeat = float(os.getenv("SAMURAI_SSE_HEARTBEAT", "15"))
+		# Streamed turns outlive their connection: items kept for resuming,
+		# seconds without a reader before the turn is abandoned (its partial
+		# reply is saved; 0 = always finish) and seconds kept after finishing.
+		self.stream_buffer_items = int(os.getenv("SAMURAI_STREAM_BUFFER_ITEMS", "4096"))
+		self.stream_detach_timeout = float(os.getenv("SAMURAI_STREAM_DETACH_TIMEOUT", "30"))
+		self.stream_retention = float(os.getenv("SAMURAI_STREAM_RETENTION", "60"))
+
+		# Response cache for LLM completions: "off", "memory" or "sqlite".
+		self.response_cache = os.getenv("SAMURAI_RESPONSE_CACHE", "off").strip().lower()
+		self.response_cache_path = os.getenv(
+			"SAMURAI_RESPONSE_CACHE_PATH",
+			"/workspace/samurai_data/response_cache.sqlite3",
+		)
+		self.response_cache_ttl = float(os.getenv("SAMURAI_RESPONSE_CACHE_TTL", "3600"))
+		self.response_cache_max_entries = int(
+			os.getenv("SAMURAI_RESPONSE_CACHE_MAX_ENTRIES", "10000")
+		)
+
+		# Prompt token budget per turn; SAMURAI_CONTEXT_BUDGETS overrides it per
+		# model ("gpt-4o-mini=120000,llama3.1=8000"). 0 sends the whole history.
+		self.context_budget = int(os.getenv("SAMURAI_CONTEXT_BUDGET", "16000"))
+		self.context_budgets = os.getenv("SAMURAI_CONTEXT_BUDGETS", "")
+		# Tokens left free for the reply.
+		self.context_reserve = int(os.getenv("SAMURAI_CONTEXT_RESERVE", "1024"))
+		# Replace dropped turns with a rolling summary stored with the session.
+		self.context_summarize = _env_bool("SAMURAI_CONTEXT_SUMMARIZE", False)
+		# Re-ask the model this many times when a reply fails options.schema.
+		self.schema_repair_retries = int(os.getenv("SAMURAI_SCHEMA_REPAIR_RETRIES", "0"))
+
+		# Session memory. "file" rewrites one JSON document per session,
+		# "jsonl" appends new messages to an indexed log, "sqlite" keeps all
+		# sessions in one WAL database that several workers can share.
+		self.memory_backend = os.getenv("SAMURAI_MEMORY_BACKEND", "file").strip().lower()
+		self.memory_path = os.getenv("SAMURAI_MEMORY_PATH", "/workspace/samurai_data/memory")
+		# Defaults to memory.sqlite3 under the memory path.
+		self.memory_sqlite_path = os.getenv("SAMURAI_MEMORY_SQLITE_PATH", "")
+		# Compact a session log once this fraction of it is dead records.
+		self.memory_compact_ratio = float(os.getenv("SAMURAI_MEMORY_COMPACT_RATIO", "0.5"))
+		self.memory_compact_min_bytes = int(
+			os.getenv("SAMURAI_MEMORY_COMPACT_MIN_BYTES", "65536")
+		)
+		# Threads used for session file I/O and (de)serialization.
+		self.memory_io_workers = int(os.getenv("SAMURAI_MEMORY_IO_WORKERS", "4"))
+		# In-process LRU of hot sessions; reads are served from it, saves go
+		# to the backend as configured below.
+		self.memory_cache = _env_bool("SAMURAI_MEMORY_CACHE", True)
+		self.memory_cache_max_messages = int(
+			os.getenv("SAMURAI_MEMORY_CACHE_MAX_MESSAGES", "50000")
+		)
+		self.memory_cache_max_bytes = int(
+			os.getenv("SAMURAI_MEMORY_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+		)
+		# Seconds between write-behind flushes; 0 (the default) writes through
+		# on every save. Write-behind batches disk writes, but a crash loses
+		# the turns saved since the last flush, and other worker processes
+		# read stale histories until then, so only enable it for one worker.
+		self.memory_flush_interval = float(os.getenv("SAMURAI_MEMORY_FLUSH_INTERVAL", "0"))
+
+		# Tool calls: default timeout in seconds and result size cap (0 = none),
+		# worker pools for thread/process tools, input size (UTF-8 bytes) below
+		# which process tools still run inline, and tools allowed per turn.
+		self.tool_timeout = float(os.getenv("SAMURAI_TOOL_TIMEOUT", "10"))
+		self.tool_max_result_bytes = int(os.getenv("SAMURAI_TOOL_MAX_RESULT_BYTES", str(1024 * 1024)))
+		self.tool_thread_workers = int(os.getenv("SAMURAI_TOOL_THREAD_WORKERS", "4"))
+		self.tool_process_workers = int(os.getenv("SAMURAI_TOOL_PROCESS_WORKERS", "2"))
+		self.tool_inline_max_bytes = int(os.getenv("SAMURAI_TOOL_INLINE_MAX_BYTES", "8192"))
+		self.tool_max_calls = int(os.getenv("SAMURAI_TOOL_MAX_CALLS", "8"))
+
+
+def parse_int_map(spec: str) -> Dict[str, int]:
+	"""Parse ``"name=1,other=2"`` settings into ``{"name": 1, "other": 2}``."""
+	values: Dict[str, int] = {}
+	for item in spec.split(","):
+		name, sep, value = item.partition("=")
+		if sep and name.strip() and value.strip().isdigit():
+			values[name.strip()] = int(value.strip())
+	return values
+
+
+def _env_bool(name: str, default: bool) -> bool:
+	value = os.getenv(name)
+	if value is None:
+		return default
+	return value.strip().lower() in ("1", "true", "yes", "on")
 
 
 def load_settings() -> Settings:
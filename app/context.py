@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from . import metrics
+from .config import Settings, parse_int_map
+from .llm import ChatMessage, LLMManager
+from .llm.tokens import message_tokens
+from .memory.memory import MemoryStore
+
+
+SUMMARY_PROMPT = (
+	"Summarize the conversation so far in a few sentences. Keep facts, "
+	"decisions, user preferences and open questions; drop pleasantries."
+)
+
+
+def select_context(
+	messages: List[ChatMessage], budget: int, summary: Optional[str] = None
+) -> Tuple[List[ChatMessage], int]:
+	"""Fit ``messages`` into ``budget`` tokens.
+
+	System messages and the current turn (the last user message and anything
+	after it, e.g. tool output) are always kept. Older turns are added newest
+	first until the budget is spent. Returns the prompt and the index of the
+	oldest kept history message; everything non-system before it was dropped
+	and, if given, ``summary`` is inserted in its place.
+	"""
+	n = len(messages)
+	current = n - 1
+	for i in range(n - 1, -1, -1):
+		if messages[i].role == "user":
+			current = i
+			break
+	keep = [False] * n
+	used = 0
+	for i, m in enumerate(messages):
+		if m.role == "system" or i >= current:
+			keep[i] = True
+			used += message_tokens(m)
+	summary_message = None
+	if summary:
+		summary_message = ChatMessage(
+			role="system", content=f"Summary of the earlier conversation: {summary}"
+		)
+		used += message_tokens(summary_message)
+	start = current
+	for i in range(current - 1, -1, -1):
+		if keep[i]:
+			continue
+		cost = message_tokens(messages[i])
+		if used + cost > budget:
+			break
+		keep[i] = True
+		used += cost
+		start = i
+	if start <= 0 or not any(not keep[i] for i in range(start)):
+		return list(messages), 0
+	prompt = [m for i, m in enumerate(messages) if keep[i] and i < start and m.role == "system"]
+	if summary_message is not None:
+		prompt.append(summary_message)
+	prompt.extend(m for i, m in enumerate(messages) if keep[i] and i >= start)
+	return prompt, start
+
+
+class ContextBuilder:
+	"""Assembles the prompt for a turn between memory load and completion.
+
+	Enforces a per-model token budget and, when enabled, replaces dropped
+	turns with a rolling summary kept in the session state. The summary is
+	extended in the background only when more turns fall out of the window,
+	so it is computed once per dropped turn rather than on every request.
+	One builder is shared by all requests; :meth:`aclose` drains the
+	summaries still running.
+	"""
+
+	def __init__(self, llm_manager: LLMManager, memory_store: MemoryStore, settings: Settings) -> None:
+		self.llm_manager = llm_manager
+		self.memory_store = memory_store
+		self.settings = settings
+		self.budgets = parse_int_map(settings.context_budgets)
+		# Sessions with a summary update in flight, and the tasks running them.
+		self._summarizing: Set[str] = set()
+		self._summary_tasks: Set[asyncio.Task] = set()
+
+	async def aclose(self, timeout: float = 5.0) -> None:
+		"""Let running summary updates finish for up to ``timeout`` seconds,
+		then cancel the rest."""
+		tasks = list(self._summary_tasks)
+		if not tasks:
+			return
+		_, pending = await asyncio.wait(tasks, timeout=timeout)
+		for task in pending:
+			task.cancel()
+		await asyncio.gather(*tasks, return_exceptions=True)
+
+	def budget_for(self, model: Optional[str]) -> int:
+		model = model or self.llm_manager.primary_model()
+		budget = self.budgets.get(model, self.settings.context_budget)
+		return max(budget - self.settings.context_reserve, 0)
+
+	async def build(
+		self,
+		session_id: str,
+		messages: List[ChatMessage],
+		model_hint: Optional[str],
+		options: Dict[str, Any],
+	) -> List[ChatMessage]:
+		budget = options.get("context_budget")
+		if not isinstance(budget, int) or isinstance(budget, bool) or budget == 0:
+			budget = self.budget_for(model_hint)
+		if budget <= 0:
+			return messages
+		summarize = bool(options.get("summarize", self.settings.context_summarize))
+		state: Dict[str, Any] = {}
+		if summarize:
+			with metrics.MEMORY_SECONDS.time("load_state"):
+				state = await self.memory_store.load_state(session_id)
+		summary = state.get("summary") or None
+		prompt, start = select_context(messages, budget, summary)
+		if summarize and start > int(state.get("summary_covers", 0)):
+			self._schedule_summary(session_id, messages[:start], state, model_hint)
+		return prompt
+
+	def _schedule_summary(
+		self,
+		session_id: str,
+		dropped: List[ChatMessage],
+		state: Dict[str, Any],
+		model_hint: Optional[str],
+	) -> None:
+		if session_id in self._summarizing:
+			return
+		self._summarizing.add(session_id)
+		task = asyncio.get_running_loop().create_task(
+			self._update_summary(session_id, dropped, state, model_hint)
+		)
+		self._summary_tasks.add(task)
+		task.add_done_callback(self._summary_tasks.discard)
+
+	async def _update_summary(
+		self,
+		session_id: str,
+		dropped: List[ChatMessage],
+		state: Dict[str, Any],
+		model_hint: Optional[str],
+	) -> None:
+		try:
+			covers = int(state.get("summary_covers", 0))
+			prompt = [ChatMessage(role="system", content=SUMMARY_PROMPT)]
+			if state.get("summary"):
+				prompt.append(
+					ChatMessage(role="system", content=f"Summary so far: {state['summary']}")
+				)
+			prompt.extend(m for m in dropped[covers:] if m.role != "system")
+			resp = await self.llm_manager.complete(
+				prompt, model_hint=model_hint, priority="batch", session_id=session_id
+			)
+			new_state = dict(state)
+			new_state["summary"] = getattr(resp, "text", str(resp)).strip()
+			new_state["summary_covers"] = len(dropped)
+			with metrics.MEMORY_SECONDS.time("save_state"):
+				await self.memory_store.save_state(session_id, new_state)
+		except Exception:
+			# The next turn retries; the prompt just lacks the newest summary.
+			pass
+		finally:
+			self._summarizing.discard(session_id)
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import asyncio
+import uuid
+from collections import deque
+from typing import Any, AsyncGenerator, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+
+class Generation:
+	"""One streamed turn, buffered independently of the HTTP connection.
+
+	Items (text chunks and event dicts) are numbered from 0. The newest
+	``max_items`` are kept in a ring buffer; text that falls out of it is
+	kept as one string so a late reader can still be sent a snapshot.
+	"""
+
+	def __init__(self, session_id: str, turn_id: str, max_items: int) -> None:
+		self.session_id = session_id
+		self.turn_id = turn_id
+		self.items: Deque[Any] = deque(maxlen=max_items)
+		self.base = 0
+		self.end = 0
+		self.done = False
+		self.readers = 0
+		self.task: Optional["asyncio.Task[None]"] = None
+		self.detach_timer: Optional[asyncio.TimerHandle] = None
+		self._dropped_text: List[str] = []
+		self._waiters: List[asyncio.Future] = []
+
+	def push(self, item: Any) -> None:
+		if len(self.items) == self.items.maxlen:
+			dropped = self.items[0]
+			if isinstance(dropped, str):
+				self._dropped_text.append(dropped)
+			self.base += 1
+		self.items.append(item)
+		self.end += 1
+		self._wake()
+
+	def finish(self) -> None:
+		self.done = True
+		self._wake()
+
+	async def follow(self, after: int = 0) -> AsyncGenerator[Tuple[int, Any], None]:
+		"""``(offset, item)`` pairs from offset ``after`` on, until the
+		generation finishes. If those items are no longer buffered, a
+		``snapshot`` event with the text that fell out of the buffer comes
+		first, numbered as the item just before the oldest buffered one."""
+		offset = min(max(after, 0), self.end)
+		self.readers += 1
+		try:
+			if offset < self.base:
+				yield self.base - 1, {"event": "snapshot", "text": "".join(self._dropped_text)}
+				offset = self.base
+			while True:
+				while offset < self.end:
+					if offset < self.base:
+						# The reader fell behind the ring; it cannot catch up.
+						yield self.end, {"event": "error", "detail": "stream reader fell too far behind"}
+						return
+					yield offset, self.items[offset - self.base]
+					offset += 1
+				if self.done:
+					return
+				waiter = asyncio.get_running_loop().create_future()
+				self._waiters.append(waiter)
+				await waiter
+		finally:
+			self.readers -= 1
+
+	def _wake(self) -> None:
+		waiters, self._waiters = self._waiters, []
+		for waiter in waiters:
+			if not waiter.done():
+				waiter.set_result(None)
+
+
+class GenerationRegistry:
+	"""In-flight streamed turns keyed by ``(session_id, turn_id)``.
+
+	A generation keeps running when its client disconnects so the client can
+	reconnect and continue. If no reader is attached for ``detach_timeout``
+	seconds (0 = never give up) it is cancelled, which makes the orchestrator
+	persist the partial reply. Finished generations stay readable for
+	``retention`` seconds.
+	"""
+
+	def __init__(self, max_items: int = 4096, detach_timeout: float = 30.0, retention: float = 60.0) -> None:
+		self.max_items = max_items
+		self.detach_timeout = detach_timeout
+		self.retention = retention
+		self._generations: Dict[Tuple[str, str], Generation] = {}
+
+	def start(self, session_id: str, source: AsyncIterator[Any]) -> Generation:
+		turn_id = uuid.uuid4().hex[:12]
+		generation = Generation(session_id, turn_id, self.max_items)
+		generation.push({"event": "generation", "session_id": session_id, "turn_id": turn_id})
+		self._generations[(session_id, turn_id)] = generation
+		generation.task = asyncio.get_running_loop().create_task(self._run(generation, source))
+		return generation
+
+	def get(self, session_id: str, turn_id: str) -> Optional[Generation]:
+		return self._generations.get((session_id, turn_id))
+
+	async def follow(self, generation: Generation, after: int = 0) -> AsyncGenerator[Tuple[int, Any], None]:
+		"""Like :meth:`Generation.follow`, arming the detach timer when the
+		last reader goes away."""
+		if generation.detach_timer is not None:
+			generation.detach_timer.cancel()
+			generation.detach_timer = None
+		try:
+			async for pair in generation.follow(after):
+				yield pair
+		finally:
+			if not generation.done and generation.readers == 0 and self.detach_timeout > 0:
+				generation.detach_timer = asyncio.get_running_loop().call_later(
+					self.detach_timeout, self._abandon_if_detached, generation
+				)
+
+	def stats(self) -> Dict[str, Any]:
+		running = sum(1 for g in self._generations.values() if not g.done)
+		return {"running": running, "retained": len(self._generations) - running}
+
+	async def aclose(self) -> None:
+		tasks = [g.task for g in self._generations.values() if g.task is not None and not g.task.done()]
+		for task in tasks:
+			task.cancel()
+		if tasks:
+			await asyncio.gather(*tasks, return_exceptions=True)
+
+	async def _run(self, generation: Generation, source: AsyncIterator[Any]) -> None:
+		try:
+			async for item in source:
+				generation.push(item)
+		except asyncio.CancelledError:
+			generation.push({"event": "error", "detail": "generation cancelled"})
+		except Exception as e:
+			generation.push({"event": "error", "detail": f"{type(e).__name__}: {e}"})
+		finally:
+			generation.push({"event": "end"})
+			generation.finish()
+			asyncio.get_running_loop().call_later(
+				self.retention, self._generations.pop, (generation.session_id, generation.turn_id), None
+			)
+
+	@staticmethod
+	def _abandon_if_detached(generation: Generation) -> None:
+		if not generation.done and generation.readers == 0 and generation.task is not None:
+			generation.task.cancel()
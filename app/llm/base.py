@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any, AsyncGenerator, Dict, List, Optional, Protocol
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Protocol
 
 
 @dataclass
@@ -10,6 +10,14 @@ class ChatMessage:
 	content: str
 	name: Optional[str] = None
 
+	def to_dict(self) -> Dict[str, str]:
+		"""Wire form for chat APIs: ``role`` and ``content``, plus ``name`` only
+		when set. Keys always come in the same order, so an unchanged history
+		serializes to the same bytes and provider prompt caches can match it."""
+		if self.name is None:
+			return {"role": self.role, "content": self.content}
+		return {"role": self.role, "content": self.content, "name": self.name}
+
 
 @dataclass
 class LLMResponse:
@@ -19,6 +27,48 @@ class LLMResponse:
 	finish_reason: str = "stop"
 	usage: Optional[Dict[str, Any]] = None
 	tool_calls: Optional[List[Dict[str, Any]]] = None
+	fallback_reason: Optional[str] = None
+	cached: bool = False
+
+
+class LLMStream:
+	"""Streamed reply: an async iterator of text chunks plus the metadata of
+	the provider that is serving it.
+
+	``on_close`` runs from :meth:`aclose`, even when the stream was never
+	iterated, which a generator's own ``finally`` does not cover.
+	"""
+
+	def __init__(
+		self,
+		chunks: AsyncIterator[str],
+		provider: str,
+		model: str,
+		fallback_reason: Optional[str] = None,
+		cached: bool = False,
+		on_close: Optional[Callable[[], Awaitable[None]]] = None,
+	) -> None:
+		self._chunks = chunks
+		self._on_close = on_close
+		self.provider = provider
+		self.model = model
+		self.fallback_reason = fallback_reason
+		self.cached = cached
+
+	def __aiter__(self) -> "LLMStream":
+		return self
+
+	async def __anext__(self) -> str:
+		return await self._chunks.__anext__()
+
+	async def aclose(self) -> None:
+		try:
+			aclose = getattr(self._chunks, "aclose", None)
+			if aclose is not None:
+				await aclose()
+		finally:
+			if self._on_close is not None:
+				await self._on_close()
 
 
 class LLMProvider(Protocol):
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+
+from .base import ChatMessage
+
+
+def cache_key(
+	provider: str, model: str, messages: List[ChatMessage], kwargs: Dict[str, Any]
+) -> str:
+	"""Canonical hash of everything that determines a provider's answer."""
+	payload = {
+		"provider": provider,
+		"model": model,
+		"messages": [[m.role, m.content, m.name] for m in messages],
+		"kwargs": kwargs,
+	}
+	raw = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str)
+	return hashlib.sha256(raw).hexdigest()
+
+
+class ResponseCache:
+	"""Stores completed replies as dicts (``text``, ``provider``, ``model``,
+	``finish_reason``, ``usage``) with TTL and LRU eviction."""
+
+	def __init__(self, ttl: float = 3600.0, max_entries: int = 10000) -> None:
+		self.ttl = ttl
+		self.max_entries = max_entries
+		self.hits = 0
+		self.misses = 0
+		self.stores = 0
+
+	async def get(self, key: str) -> Optional[Dict[str, Any]]:
+		raise NotImplementedError
+
+	async def set(self, key: str, value: Dict[str, Any]) -> None:
+		raise NotImplementedError
+
+	async def aclose(self) -> None:
+		return None
+
+	def stats(self) -> Dict[str, Any]:
+		return {"hits": self.hits, "misses": self.misses, "stores": self.stores}
+
+
+class MemoryResponseCache(ResponseCache):
+	def __init__(self, ttl: float = 3600.0, max_entries: int = 10000) -> None:
+		super().__init__(ttl=ttl, max_entries=max_entries)
+		self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+	async def get(self, key: str) -> Optional[Dict[str, Any]]:
+		item = self._entries.get(key)
+		if item is None or item[0] < time.monotonic():
+			if item is not None:
+				del self._entries[key]
+			self.misses += 1
+			return None
+		self._entries.move_to_end(key)
+		self.hits += 1
+		return item[1]
+
+	async def set(self, key: str, value: Dict[str, Any]) -> None:
+		self._entries[key] = (time.monotonic() + self.ttl, value)
+		self._entries.move_to_end(key)
+		self.stores += 1
+		while len(self._entries) > self.max_entries:
+			self._entries.popitem(last=False)
+
+	def stats(self) -> Dict[str, Any]:
+		stats = super().stats()
+		stats["entries"] = len(self._entries)
+		return stats
+
+
+class SQLiteResponseCache(ResponseCache):
+	"""On-disk cache in a SQLite file; queries run on a dedicated thread."""
+
+	def __init__(self, path: str, ttl: float = 3600.0, max_entries: int = 10000) -> None:
+		super().__init__(ttl=ttl, max_entries=max_entries)
+		self.path = path
+		self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="samurai-cache")
+		self._conn: Optional[sqlite3.Connection] = None
+		self._writes = 0
+
+	def _connect(self) -> sqlite3.Connection:
+		if self._conn is None:
+			os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+			conn = sqlite3.connect(self.path, check_same_thread=False)
+			conn.execute("PRAGMA journal_mode=WAL")
+			conn.execute("PRAGMA synchronous=NORMAL")
+			conn.execute(
+				"CREATE TABLE IF NOT EXISTS responses ("
+				"key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+				"expires REAL NOT NULL, accessed REAL NOT NULL)"
+			)
+			conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+			self._conn = conn
+		return self._conn
+
+	async def _run(self, fn: Any, *args: Any) -> Any:
+		return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+	async def get(self, key: str) -> Optional[Dict[str, Any]]:
+		value = await self._run(self._get, key)
+		if value is None:
+			self.misses += 1
+			return None
+		self.hits += 1
+		return value
+
+	async def set(self, key: str, value: Dict[str, Any]) -> None:
+		await self._run(self._set, key, orjson.dumps(value))
+		self.stores += 1
+
+	async def aclose(self) -> None:
+		if self._conn is not None:
+			await self._run(self._conn.close)
+			self._conn = None
+		self._executor.shutdown(wait=True)
+
+	def _get(self, key: str) -> Optional[Dict[str, Any]]:
+		conn = self._connect()
+		now = time.time()
+		row = conn.execute(
+			"SELECT value, expires FROM responses WHERE key = ?", (key,)
+		).fetchone()
+		if row is None:
+			return None
+		if row[1] < now:
+			conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+			conn.commit()
+			return None
+		conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+		conn.commit()
+		return orjson.loads(row[0])
+
+	def _set(self, key: str, value: bytes) -> None:
+		conn = self._connect()
+		now = time.time()
+		conn.execute(
+			"INSERT OR REPLACE INTO responses (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+			(key, value, now + self.ttl, now),
+		)
+		self._writes += 1
+		# Trim expired and least recently used rows every so often.
+		if self._writes % 100 == 0:
+			conn.execute("DELETE FROM responses WHERE expires < ?", (now,))
+			conn.execute(
+				"DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+				"ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+				(self.max_entries,),
+			)
+		conn.commit()
+
+
+def create_response_cache(
+	backend: str, path: str, ttl: float, max_entries: int
+) -> Optional[ResponseCache]:
+	if backend == "memory":
+		return MemoryResponseCache(ttl=ttl, max_entries=max_entries)
+	if backend == "sqlite":
+		return SQLiteResponseCache(path=path, ttl=ttl, max_entries=max_entries)
+	return None
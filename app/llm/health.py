@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+
+class ProviderHealth:
+	"""Rolling latency/error window and circuit breaker for one provider.
+
+	The circuit opens after ``failure_threshold`` consecutive failures and
+	stays open for ``cooldown`` seconds. After that a single probe request is
+	let through (half-open); its outcome closes or re-opens the circuit.
+	"""
+
+	def __init__(self, window: int = 100, failure_threshold: int = 5, cooldown: float = 30.0) -> None:
+		self.failure_threshold = failure_threshold
+		self.cooldown = cooldown
+		self._latencies: Deque[float] = deque(maxlen=window)
+		self._outcomes: Deque[bool] = deque(maxlen=window)
+		self.consecutive_failures = 0
+		self.opened_at: Optional[float] = None
+		self._probing = False
+		self.successes = 0
+		self.failures = 0
+
+	@property
+	def state(self) -> str:
+		if self.opened_at is None:
+			return "closed"
+		if self._probing or time.monotonic() - self.opened_at >= self.cooldown:
+			return "half_open"
+		return "open"
+
+	def allow(self) -> bool:
+		"""Whether a request may be sent now; claims the probe when half-open."""
+		state = self.state
+		if state == "closed":
+			return True
+		if state == "half_open" and not self._probing:
+			self._probing = True
+			return True
+		return False
+
+	def record_success(self, latency: float) -> None:
+		self._latencies.append(latency)
+		self._outcomes.append(True)
+		self.successes += 1
+		self.consecutive_failures = 0
+		self.opened_at = None
+		self._probing = False
+
+	def record_failure(self) -> None:
+		self._outcomes.append(False)
+		self.failures += 1
+		self.consecutive_failures += 1
+		if self._probing or self.consecutive_failures >= self.failure_threshold:
+			self.opened_at = time.monotonic()
+		self._probing = False
+
+	def release_probe(self) -> None:
+		"""Give back a half-open probe whose request was cancelled."""
+		self._probing = False
+
+	def percentile(self, q: float) -> Optional[float]:
+		if not self._latencies:
+			return None
+		ordered = sorted(self._latencies)
+		return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+	@property
+	def error_rate(self) -> float:
+		if not self._outcomes:
+			return 0.0
+		return self._outcomes.count(False) / len(self._outcomes)
+
+	def snapshot(self) -> Dict[str, Any]:
+		return {
+			"state": self.state,
+			"successes": self.successes,
+			"failures": self.failures,
+			"consecutive_failures": self.consecutive_failures,
+			"error_rate": self.error_rate,
+			"latency_p50": self.percentile(0.5),
+			"latency_p95": self.percentile(0.95),
+		}
+
+
+class HealthTracker:
+	"""Lazily creates one :class:`ProviderHealth` per provider name."""
+
+	def __init__(self, window: int = 100, failure_threshold: int = 5, cooldown: float = 30.0) -> None:
+		self.window = window
+		self.failure_threshold = failure_threshold
+		self.cooldown = cooldown
+		self._providers: Dict[str, ProviderHealth] = {}
+
+	def get(self, name: str) -> ProviderHealth:
+		health = self._providers.get(name)
+		if health is None:
+			health = self._providers[name] = ProviderHealth(
+				window=self.window,
+				failure_threshold=self.failure_threshold,
+				cooldown=self.cooldown,
+			)
+		return health
+
+	def snapshot(self) -> Dict[str, Dict[str, Any]]:
+		return {name: health.snapshot() for name, health in self._providers.items()}
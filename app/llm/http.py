@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, AsyncGenerator, Callable, Dict, Optional
+
+import orjson
+
+from ..config import Settings
+
+if TYPE_CHECKING:
+	import httpx
+
+
+def _http2_available() -> bool:
+	try:
+		import h2  # noqa: F401
+	except ImportError:
+		return False
+	return True
+
+
+class HTTPClientPool:
+	"""Owns one keep-alive ``httpx.AsyncClient`` per provider.
+
+	Clients are created on first use (or eagerly via :meth:`open`) and reused
+	for every request so chat turns do not pay a new TCP/TLS handshake.
+	httpx itself is imported with the first client, not at startup.
+	"""
+
+	def __init__(self, settings: Settings) -> None:
+		self.settings = settings
+		self._http2: Optional[bool] = None
+		self._clients: Dict[str, httpx.AsyncClient] = {}
+
+	@property
+	def http2(self) -> bool:
+		if self._http2 is None:
+			self._http2 = self.settings.http2 and _http2_available()
+		return self._http2
+
+	def get(self, name: str, timeout: Optional[float] = None) -> httpx.AsyncClient:
+		client = self._clients.get(name)
+		if client is None or client.is_closed:
+			import httpx
+
+			client = httpx.AsyncClient(
+				http2=self.http2,
+				limits=httpx.Limits(
+					max_connections=self.settings.http_max_connections,
+					max_keepalive_connections=self.settings.http_max_keepalive_connections,
+					keepalive_expiry=self.settings.http_keepalive_expiry,
+				),
+				timeout=httpx.Timeout(timeout or None),
+			)
+			self._clients[name] = client
+		return client
+
+	def open(self, timeouts: Dict[str, Optional[float]]) -> None:
+		for name, timeout in timeouts.items():
+			self.get(name, timeout)
+
+	async def aclose(self) -> None:
+		clients = list(self._clients.values())
+		self._clients.clear()
+		for client in clients:
+			await client.aclose()
+
+
+async def open_stream(
+	client: httpx.AsyncClient, method: str, url: str, **kwargs: Any
+) -> httpx.Response:
+	"""Send a request and return the response with its body still unread.
+
+	HTTP errors are raised here, before any token is yielded, so callers can
+	fall back to another provider. The caller owns the open response and must
+	close it (the ``iter_*`` helpers below do so when they finish).
+	"""
+	import httpx
+
+	request = client.build_request(method, url, **kwargs)
+	response = await client.send(request, stream=True)
+	try:
+		response.raise_for_status()
+	except httpx.HTTPStatusError:
+		await response.aclose()
+		raise
+	return response
+
+
+async def iter_sse_deltas(response: httpx.Response) -> AsyncGenerator[str, None]:
+	"""Yield ``choices[0].delta.content`` text from an OpenAI-style SSE stream."""
+	try:
+		async for line in response.aiter_lines():
+			if not line.startswith("data:"):
+				continue
+			data = line[5:].strip()
+			if data == "[DONE]":
+				break
+			try:
+				obj = orjson.loads(data)
+			except orjson.JSONDecodeError:
+				continue
+			choices = obj.get("choices") or []
+			if not choices:
+				continue
+			content = (choices[0].get("delta") or {}).get("content")
+			if content:
+				yield content
+	finally:
+		await response.aclose()
+
+
+async def iter_ndjson_messages(
+	response: httpx.Response, on_done: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> AsyncGenerator[str, None]:
+	"""Yield ``message.content`` text from an Ollama-style NDJSON stream.
+	``on_done`` receives the final object (with the server's timings)."""
+	try:
+		async for line in response.aiter_lines():
+			if not line:
+				continue
+			try:
+				obj = orjson.loads(line)
+			except orjson.JSONDecodeError:
+				continue
+			content = (obj.get("message") or {}).get("content")
+			if content:
+				yield content
+			if obj.get("done"):
+				if on_done is not None:
+					on_done(obj)
+				break
+	finally:
+		await response.aclose()
@@ -1,11 +1,49 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Any, AsyncGenerator, Dict, List, Optional
+import time
+from collections import OrderedDict
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Dict, List, Optional, Set
 
-from ..config import Settings
-from .base import ChatMessage, LLMProvider, LLMResponse
-from .providers.mock import MockProvider
+from .. import metrics
+from ..config import Settings, parse_int_map
+from .base import ChatMessage, LLMProvider, LLMResponse, LLMStream
+from .cache import ResponseCache, cache_key, create_response_cache
+from .health import HealthTracker, ProviderHealth
+from .http import HTTPClientPool
+from .ratelimit import ProviderGate, QueueFullError, priority_value, retry_after_seconds
+from .tokens import prompt_tokens
+
+
+class ProvidersFailedError(Exception):
+	"""Raised when every provider, including the mock fallback, failed."""
+
+	def __init__(self, reasons: List[str]) -> None:
+		super().__init__("all providers failed: " + "; ".join(reasons))
+		self.reasons = reasons
+
+
+class _StreamSlot:
+	"""A gate slot held by a streamed reply until the stream ends, whether it
+	finishes, fails, is cancelled or is closed before it is read. A stream
+	that ends without a recorded outcome gives back the half-open probe, or
+	the circuit would never be tried again."""
+
+	def __init__(self, gate: ProviderGate, health: ProviderHealth) -> None:
+		self.gate = gate
+		self.health = health
+		self.held = True
+		self.recorded = False
+
+	def release(self) -> None:
+		if self.held:
+			self.held = False
+			self.gate.release()
+			if not self.recorded:
+				self.health.release_probe()
+
+	async def aclose(self) -> None:
+		self.release()
 
 
 class LLMManager:
@@ -13,39 +51,125 @@ class LLMManager:
 
 	def __init__(self, settings: Settings) -> None:
 		self.settings = settings
-		self._providers: Dict[str, LLMProvider] = {
-			"mock": MockProvider(),
-		}
-		# Lazy import heavy providers to avoid import errors if optional deps miss
-		try:
-			from .providers.openai import OpenAIProvider
+		self.http_pool = HTTPClientPool(settings)
+		self.health = HealthTracker(
+			window=settings.health_window,
+			failure_threshold=settings.circuit_failure_threshold,
+			cooldown=settings.circuit_cooldown,
+		)
+		self.response_cache: Optional[ResponseCache] = create_response_cache(
+			settings.response_cache,
+			path=settings.response_cache_path,
+			ttl=settings.response_cache_ttl,
+			max_entries=settings.response_cache_max_entries,
+		)
+		self._concurrency = parse_int_map(settings.provider_concurrency)
+		self._rpm = parse_int_map(settings.provider_rpm)
+		self._tpm = parse_int_map(settings.provider_tpm)
+		self._gates: Dict[str, ProviderGate] = {}
+		# session_id -> provider that served its last turn, LRU.
+		self._affinity: "OrderedDict[str, str]" = OrderedDict()
+		# Providers are built on first use, and only those named in
+		# SAMURAI_PROVIDERS (plus the mock, the last-resort fallback).
+		self._providers: Dict[str, LLMProvider] = {}
+		self._unavailable: Set[str] = set()
 
-			self._providers["openai"] = OpenAIProvider(api_key=settings.openai_api_key)
-		except Exception:
-			pass
+	def _provider(self, name: str) -> Optional[LLMProvider]:
+		"""The provider called ``name``, built on first use. None if it is not
+		configured or could not be built (e.g. an optional dependency is
+		missing)."""
+		provider = self._providers.get(name)
+		if provider is not None or name in self._unavailable:
+			return provider
+		build = _BUILDERS.get(name)
+		if build is None or (name != "mock" and name not in self.settings.providers_priority):
+			return None
 		try:
-			from .providers.openrouter import OpenRouterProvider
-
-			self._providers["openrouter"] = OpenRouterProvider(
-				api_key=settings.openrouter_api_key
-			)
+			provider = self._providers[name] = build(self)
 		except Exception:
-			pass
-		try:
-			from .providers.ollama import OllamaProvider
+			self._unavailable.add(name)
+			return None
+		return provider
 
-			self._providers["ollama"] = OllamaProvider(base_url=settings.ollama_base_url)
-		except Exception:
-			pass
-		try:
-			from .providers.hf import HFProvider
+	def _available(self, name: str) -> bool:
+		return name in _BUILDERS and name in self.settings.providers_priority and name not in self._unavailable
 
-			self._providers["hf"] = HFProvider(api_key=settings.hf_api_key)
-		except Exception:
-			pass
+	def _build_mock(self) -> LLMProvider:
+		from .providers.mock import MockProvider, SimulationProfile
+
+		return MockProvider(SimulationProfile.from_settings(self.settings))
+
+	def _build_openai(self) -> LLMProvider:
+		from .providers.openai import OpenAIProvider
+
+		return OpenAIProvider(
+			api_key=self.settings.openai_api_key,
+			pool=self.http_pool,
+			timeout=self.settings.openai_timeout,
+		)
+
+	def _build_openrouter(self) -> LLMProvider:
+		from .providers.openrouter import OpenRouterProvider
+
+		return OpenRouterProvider(
+			api_key=self.settings.openrouter_api_key,
+			pool=self.http_pool,
+			timeout=self.settings.openrouter_timeout,
+		)
+
+	def _build_ollama(self) -> LLMProvider:
+		from .providers.ollama import OllamaProvider
+
+		settings = self.settings
+		return OllamaProvider(
+			pool=self.http_pool,
+			base_url=settings.ollama_base_url,
+			timeout=settings.ollama_timeout,
+			keep_alive=settings.ollama_keep_alive,
+			default_model=settings.default_model_ollama,
+			preload=settings.ollama_preload,
+			warm_models=settings.ollama_warm_models,
+			ping_interval=settings.ollama_ping_interval,
+		)
+
+	def _build_hf(self) -> LLMProvider:
+		from .providers.hf import HFProvider
+
+		settings = self.settings
+		return HFProvider(
+			api_key=settings.hf_api_key,
+			pool=self.http_pool,
+			base_url=settings.hf_base_url,
+			timeout=settings.hf_timeout,
+			chat_template=settings.hf_chat_template,
+			max_new_tokens=settings.hf_max_new_tokens,
+			batch_size=settings.hf_batch_size,
+			batch_window=settings.hf_batch_window_ms / 1000,
+		)
+
+	async def startup(self) -> None:
+		"""Build the configured providers that do background work from startup
+		(Ollama model preloading) and run their startup hooks. The others,
+		and their pooled HTTP clients, are created by the first request that
+		needs them."""
+		for name in self.settings.providers_priority:
+			if name not in _STARTUP_PROVIDERS:
+				continue
+			hook = getattr(self._provider(name), "startup", None)
+			if hook is not None:
+				await hook()
+
+	async def aclose(self) -> None:
+		for provider in self._providers.values():
+			hook = getattr(provider, "aclose", None)
+			if hook is not None:
+				await hook()
+		await self.http_pool.aclose()
+		if self.response_cache is not None:
+			await self.response_cache.aclose()
 
 	def get_provider(self, name: str) -> Optional[LLMProvider]:
-		return self._providers.get(name)
+		return self._provider(name)
 
 	async def complete(
 		self,
@@ -53,19 +177,391 @@ class LLMManager:
 		model_hint: Optional[str] = None,
 		stream: bool = False,
 		**kwargs: Any,
-	) -> LLMResponse | AsyncGenerator[str, None]:
-		"""Try providers by priority until one succeeds."""
-		for provider_name in self.settings.providers_priority:
-			provider = self.get_provider(provider_name)
-			if provider is None:
+	) -> LLMResponse | LLMStream:
+		"""Try providers by priority until one succeeds.
+
+		Providers whose circuit is open are skipped. With hedging enabled, a
+		non-streaming request also goes to the next healthy provider if the
+		first has not answered within its p95 latency, and the first answer
+		wins. The returned response names the provider that answered and, in
+		``fallback_reason``, why earlier providers were passed over.
+
+		When a response cache is configured, each provider's cache entry is
+		checked before calling it. ``cache=False`` bypasses the cache and
+		``cache="refresh"`` skips the lookup but stores the new answer.
+
+		Requests pass each provider's admission gate with ``priority``
+		(``"interactive"`` or ``"batch"``). A full queue raises
+		:class:`QueueFullError` instead of falling back. If every provider,
+		the mock included, fails, :class:`ProvidersFailedError` is raised.
+
+		With ``session_id``, the provider that served the session's previous
+		turn is tried first while its circuit is closed (the model follows
+		from the provider and ``model_hint``). Consecutive turns then reach
+		the upstream prompt cache (or loaded Ollama model) that already holds
+		the conversation, even after a fallback or a hedge.
+		"""
+		priority = priority_value(kwargs.pop("priority", None))
+		session_id = kwargs.pop("session_id", None)
+		cache_option = kwargs.pop("cache", None)
+		cache = self.response_cache if cache_option is not False else None
+		read_cache = cache is not None and cache_option != "refresh"
+		reasons: List[str] = []
+		candidates = [name for name in self.settings.providers_priority if self._available(name)]
+		sticky = self._sticky(session_id, candidates)
+		if sticky is not None:
+			candidates.remove(sticky)
+			candidates.insert(0, sticky)
+		tried = set()
+		for i, provider_name in enumerate(candidates):
+			if provider_name in tried:
+				continue
+			if read_cache:
+				cached = await cache.get(  # type: ignore[union-attr]
+					self._cache_key(provider_name, messages, model_hint, kwargs)
+				)
+				if cached is not None:
+					metrics.LLM_REQUESTS.inc(provider_name, "cached")
+					return _replay(cached, stream)
+			if not self.health.get(provider_name).allow():
+				reasons.append(f"{provider_name}: circuit open")
 				continue
+			tried.add(provider_name)
+			backup = None
+			if self.settings.hedge and not stream:
+				backup = next((n for n in candidates[i + 1 :] if n not in tried), None)
 			try:
-				model = model_hint or self._default_model_for(provider_name)
-				return await provider.complete(messages, model=model, stream=stream, **kwargs)
-			except Exception:
+				if backup is not None:
+					resp = await self._hedged(
+						provider_name, backup, tried, reasons, messages, model_hint, priority, kwargs
+					)
+				else:
+					resp = await self._call(
+						provider_name, messages, model_hint, stream, priority, kwargs
+					)
+			except QueueFullError:
+				raise
+			except Exception as e:
+				reasons.append(_failure_reason(provider_name, e))
 				continue
+			if cache is not None:
+				resp = await self._store(cache, resp, messages, model_hint, kwargs)
+			if reasons and not resp.fallback_reason:
+				resp.fallback_reason = "; ".join(reasons)
+			if resp.fallback_reason:
+				metrics.LLM_FALLBACKS.inc(resp.provider)
+			if session_id is not None:
+				self._remember(session_id, resp.provider)
+			return resp
 		# Fallback to mock
-		return await self._providers["mock"].complete(messages, model="mock", stream=stream)
+		if "mock" in tried:
+			raise ProvidersFailedError(reasons)
+		try:
+			resp = await self._call("mock", messages, "mock", stream, priority, {})
+		except QueueFullError:
+			raise
+		except Exception as e:
+			reasons.append(_failure_reason("mock", e))
+			raise ProvidersFailedError(reasons) from e
+		resp.fallback_reason = "; ".join(reasons) or "no provider available"
+		metrics.LLM_FALLBACKS.inc("mock")
+		return resp
+
+	async def complete_many(
+		self,
+		requests: List[Dict[str, Any]],
+		concurrency: Optional[int] = None,
+		**kwargs: Any,
+	) -> AsyncGenerator[Dict[str, Any], None]:
+		"""Complete many independent prompts and yield results as they finish.
+
+		Each request is a dict with ``messages`` (a list of :class:`ChatMessage`)
+		and optional ``id`` and ``model``. At most ``concurrency`` requests run
+		at once, on top of the per-provider limits. Failures are reported per
+		item (``ok: false`` with ``error``) and never abort the batch.
+		"""
+		limit = max(1, concurrency or self.settings.batch_concurrency)
+		kwargs.setdefault("priority", "batch")
+		results: asyncio.Queue = asyncio.Queue()
+		pending = iter(enumerate(requests))
+
+		async def worker() -> None:
+			for index, request in pending:
+				result: Dict[str, Any] = {"index": index, "id": request.get("id", index)}
+				try:
+					resp = await self.complete(
+						request["messages"], model_hint=request.get("model"), **kwargs
+					)
+				except Exception as e:
+					result.update(ok=False, error=f"{type(e).__name__}: {e}")
+				else:
+					result.update(
+						ok=True,
+						reply=resp.text,  # type: ignore[union-attr]
+						provider=resp.provider,
+						model=resp.model,
+						cached=resp.cached,
+						fallback_reason=resp.fallback_reason,
+					)
+				await results.put(result)
+
+		workers = [asyncio.ensure_future(worker()) for _ in range(min(limit, len(requests)))]
+		try:
+			for _ in range(len(requests)):
+				yield await results.get()
+		finally:
+			for task in workers:
+				task.cancel()
+
+	def primary_model(self) -> str:
+		"""Default model of the highest-priority configured provider."""
+		for name in self.settings.providers_priority:
+			if self._available(name):
+				return self._default_model_for(name)
+		return "mock"
+
+	def health_snapshot(self) -> Dict[str, Dict[str, Any]]:
+		return self.health.snapshot()
+
+	def cache_stats(self) -> Optional[Dict[str, Any]]:
+		return self.response_cache.stats() if self.response_cache is not None else None
+
+	def queue_snapshot(self) -> Dict[str, Dict[str, Any]]:
+		return {name: gate.snapshot() for name, gate in self._gates.items()}
+
+	def provider_stats(self) -> Dict[str, Dict[str, Any]]:
+		"""Provider-specific state, for providers that report any."""
+		return {
+			name: provider.stats()  # type: ignore[attr-defined]
+			for name, provider in self._providers.items()
+			if hasattr(provider, "stats")
+		}
+
+	def affinity_stats(self) -> Dict[str, Any]:
+		return {"sessions": len(self._affinity), "max_sessions": self.settings.session_affinity_max}
+
+	def _sticky(self, session_id: Optional[str], candidates: List[str]) -> Optional[str]:
+		if session_id is None or self.settings.session_affinity_max <= 0:
+			return None
+		provider_name = self._affinity.get(session_id)
+		if provider_name not in candidates or self.health.get(provider_name).state != "closed":
+			return None
+		return provider_name
+
+	def _remember(self, session_id: str, provider_name: str) -> None:
+		if self.settings.session_affinity_max <= 0 or provider_name not in self._providers:
+			return
+		self._affinity[session_id] = provider_name
+		self._affinity.move_to_end(session_id)
+		while len(self._affinity) > self.settings.session_affinity_max:
+			self._affinity.popitem(last=False)
+
+	def _gate(self, provider_name: str) -> ProviderGate:
+		gate = self._gates.get(provider_name)
+		if gate is None:
+			gate = self._gates[provider_name] = ProviderGate(
+				provider_name,
+				max_in_flight=self._concurrency.get(provider_name, 0),
+				rpm=self._rpm.get(provider_name, 0),
+				tpm=self._tpm.get(provider_name, 0),
+				max_queue=self.settings.provider_queue_max,
+			)
+		return gate
+
+	def _cache_key(
+		self,
+		provider_name: str,
+		messages: List[ChatMessage],
+		model_hint: Optional[str],
+		kwargs: Dict[str, Any],
+	) -> str:
+		model = model_hint or self._default_model_for(provider_name)
+		return cache_key(provider_name, model, messages, kwargs)
+
+	async def _store(
+		self,
+		cache: ResponseCache,
+		resp: LLMResponse | LLMStream,
+		messages: List[ChatMessage],
+		model_hint: Optional[str],
+		kwargs: Dict[str, Any],
+	) -> LLMResponse | LLMStream:
+		key = self._cache_key(resp.provider, messages, model_hint, kwargs)
+		if isinstance(resp, LLMStream):
+			return LLMStream(
+				self._cache_stream(cache, key, resp),
+				provider=resp.provider,
+				model=resp.model,
+				on_close=resp.aclose,
+			)
+		if resp.finish_reason in (None, "stop"):
+			await cache.set(key, _cache_value(resp.text, resp))
+		return resp
+
+	@staticmethod
+	async def _cache_stream(
+		cache: ResponseCache, key: str, stream: LLMStream
+	) -> AsyncGenerator[str, None]:
+		"""Pass chunks through and cache the full text once the stream ends."""
+		parts: List[str] = []
+		try:
+			async for chunk in stream:
+				parts.append(chunk)
+				yield chunk
+		finally:
+			await stream.aclose()
+		await cache.set(key, _cache_value("".join(parts), stream))
+
+	async def _call(
+		self,
+		provider_name: str,
+		messages: List[ChatMessage],
+		model_hint: Optional[str],
+		stream: bool,
+		priority: int,
+		kwargs: Dict[str, Any],
+	) -> LLMResponse | LLMStream:
+		provider = self._provider(provider_name)
+		health = self.health.get(provider_name)
+		if provider is None:
+			health.release_probe()
+			raise RuntimeError(f"provider {provider_name} is unavailable")
+		model = model_hint or self._default_model_for(provider_name)
+		gate = self._gate(provider_name)
+		estimated = prompt_tokens(messages) if gate.tokens is not None else 0
+		retries = 0
+		while True:
+			try:
+				await gate.acquire(priority, estimated)
+			except BaseException:
+				health.release_probe()
+				raise
+			start = time.perf_counter()
+			handed_off = False
+			try:
+				# The gate slot covers the whole request; a stream holds it
+				# until its last chunk (see _StreamSlot).
+				resp = await provider.complete(messages, model=model, stream=stream, **kwargs)
+				handed_off = stream
+			except asyncio.CancelledError:
+				health.release_probe()
+				raise
+			except Exception as e:
+				delay = retry_after_seconds(e)
+				if delay is None:
+					metrics.LLM_REQUESTS.inc(provider_name, "error")
+					health.record_failure()
+					raise
+				metrics.LLM_REQUESTS.inc(provider_name, "rate_limited")
+				# 429: pause the gate for Retry-After and retry if the wait is short.
+				gate.backoff(delay)
+				if retries >= self.settings.rate_limit_retries or delay > self.settings.retry_after_max:
+					health.release_probe()
+					raise
+				retries += 1
+				continue
+			finally:
+				if not handed_off:
+					gate.release()
+			break
+		metrics.LLM_SECONDS.observe(time.perf_counter() - start, provider_name)
+		if stream:
+			slot = _StreamSlot(gate, health)
+			return LLMStream(
+				self._track_stream(resp, slot, health, start, provider_name),  # type: ignore[arg-type]
+				provider=provider_name,
+				model=model,
+				on_close=slot.aclose,
+			)
+		health.record_success(time.perf_counter() - start)
+		metrics.LLM_REQUESTS.inc(provider_name, "success")
+		usage = getattr(resp, "usage", None) or {}
+		for kind in ("prompt_tokens", "completion_tokens"):
+			if usage.get(kind):
+				metrics.LLM_TOKENS.inc(provider_name, kind[: -len("_tokens")], amount=usage[kind])
+		gate.settle(estimated, usage.get("total_tokens"))
+		return resp  # type: ignore[return-value]
+
+	@staticmethod
+	async def _track_stream(
+		chunks: AsyncIterator[str],
+		slot: _StreamSlot,
+		health: ProviderHealth,
+		start: float,
+		provider_name: str,
+	) -> AsyncGenerator[str, None]:
+		"""Record time to first chunk as the provider's latency, or a failure
+		if the stream breaks before finishing; free the gate slot at the end."""
+		first = True
+		try:
+			async for chunk in chunks:
+				if first:
+					first = False
+					ttft = time.perf_counter() - start
+					health.record_success(ttft)
+					slot.recorded = True
+					metrics.LLM_TTFT_SECONDS.observe(ttft, provider_name)
+				yield chunk
+			if first:
+				health.record_success(time.perf_counter() - start)
+				slot.recorded = True
+		except Exception:
+			metrics.LLM_REQUESTS.inc(provider_name, "error")
+			health.record_failure()
+			slot.recorded = True
+			raise
+		finally:
+			try:
+				aclose = getattr(chunks, "aclose", None)
+				if aclose is not None:
+					await aclose()
+			finally:
+				slot.release()
+		metrics.LLM_REQUESTS.inc(provider_name, "success")
+
+	async def _hedged(
+		self,
+		primary: str,
+		backup: str,
+		tried: set,
+		reasons: List[str],
+		messages: List[ChatMessage],
+		model_hint: Optional[str],
+		priority: int,
+		kwargs: Dict[str, Any],
+	) -> LLMResponse:
+		"""Race ``primary`` against ``backup`` started after a p95-based delay."""
+		p95 = self.health.get(primary).percentile(0.95)
+		delay = max(self.settings.hedge_min_delay, p95 if p95 is not None else self.settings.hedge_delay)
+		first = asyncio.ensure_future(
+			self._call(primary, messages, model_hint, False, priority, kwargs)
+		)
+		done, _ = await asyncio.wait({first}, timeout=delay)
+		if done or not self.health.get(backup).allow():
+			return await first  # type: ignore[return-value]
+		tried.add(backup)
+		second = asyncio.ensure_future(
+			self._call(backup, messages, model_hint, False, priority, kwargs)
+		)
+		pending = {first, second}
+		try:
+			while pending:
+				done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+				for task in done:
+					if task.exception() is None:
+						if task is second:
+							if first.done() and not first.cancelled() and first.exception() is not None:
+								reasons.append(_failure_reason(primary, first.exception()))
+							else:
+								reasons.append(f"{primary}: slower than {delay:.2f}s, hedged")
+						return task.result()
+					if task is second:
+						reasons.append(_failure_reason(backup, task.exception()))
+			# Both failed; the caller records the primary's error.
+			raise first.exception()  # type: ignore[misc]
+		finally:
+			for task in pending:
+				task.cancel()
 
 	def _default_model_for(self, provider_name: str) -> str:
 		if provider_name == "openai":
@@ -77,3 +573,43 @@ class LLMManager:
 		if provider_name == "hf":
 			return self.settings.default_model_hf
 		return "mock"
+
+
+_BUILDERS: Dict[str, Callable[[LLMManager], LLMProvider]] = {
+	"mock": LLMManager._build_mock,
+	"openai": LLMManager._build_openai,
+	"openrouter": LLMManager._build_openrouter,
+	"ollama": LLMManager._build_ollama,
+	"hf": LLMManager._build_hf,
+}
+# Providers with startup hooks, built by :meth:`LLMManager.startup`.
+_STARTUP_PROVIDERS = ("ollama",)
+
+
+def _failure_reason(provider_name: str, error: BaseException) -> str:
+	return f"{provider_name}: {type(error).__name__}: {error}"[:200]
+
+
+_REPLAY_CHUNK = 32
+
+
+def _cache_value(text: str, resp: LLMResponse | LLMStream) -> Dict[str, Any]:
+	return {
+		"text": text,
+		"provider": resp.provider,
+		"model": resp.model,
+		"finish_reason": getattr(resp, "finish_reason", "stop"),
+		"usage": getattr(resp, "usage", None),
+	}
+
+
+def _replay(cached: Dict[str, Any], stream: bool) -> LLMResponse | LLMStream:
+	if not stream:
+		return LLMResponse(cached=True, **cached)
+	text = cached["text"]
+
+	async def chunks() -> AsyncGenerator[str, None]:
+		for i in range(0, len(text), _REPLAY_CHUNK):
+			yield text[i : i + _REPLAY_CHUNK]
+
+	return LLMStream(chunks(), provider=cached["provider"], model=cached["model"], cached=True)
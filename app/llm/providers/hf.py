@@ -1,17 +1,61 @@
 from __future__ import annotations
 
-from typing import Any, AsyncGenerator, Dict, List, Optional
+import asyncio
+from typing import TYPE_CHECKING, Any, AsyncGenerator, Callable, Dict, List, Optional, Tuple
 
-import httpx
+import orjson
 
 from ..base import ChatMessage, LLMResponse
+from ..http import HTTPClientPool, open_stream
+from ..tokens import prompt_tokens
+
+if TYPE_CHECKING:
+	import httpx
+
+
+_FINISH_REASONS = {"eos_token": "stop", "stop_sequence": "stop", "length": "length"}
 
 
 class HFProvider:
+	"""Client for a Hugging Face text-generation-inference (TGI) server.
+
+	Chat messages are rendered into one prompt with ``chat_template``
+	(``mistral``, ``chatml``, ``llama3`` or ``plain``). Requests go to
+	``/generate``, streams to ``/generate_stream``. Both use the pooled
+	keep-alive client.
+
+	TGI batches requests on the server. Some servers also accept a list of
+	``inputs`` on ``/``, as the HF Inference API does. For those,
+	``batch_size`` > 1 gathers concurrent non-streaming requests with equal
+	parameters for up to ``batch_window`` seconds and sends them as one
+	request. If the server rejects a batch, batching is switched off and
+	requests are sent one by one.
+	"""
+
 	name = "hf"
 
-	def __init__(self, api_key: str) -> None:
+	def __init__(
+		self,
+		api_key: str,
+		pool: HTTPClientPool,
+		base_url: str = "http://localhost:8080",
+		timeout: float = 60.0,
+		chat_template: str = "mistral",
+		max_new_tokens: int = 512,
+		batch_size: int = 0,
+		batch_window: float = 0.005,
+	) -> None:
+		if chat_template not in TEMPLATES:
+			raise ValueError(f"unknown HF chat template: {chat_template}")
 		self.api_key = api_key
+		self.pool = pool
+		self.base_url = base_url.rstrip("/")
+		self.timeout = timeout
+		self.chat_template = chat_template
+		self.max_new_tokens = max_new_tokens
+		self.batcher: Optional[MicroBatcher] = None
+		if batch_size > 1:
+			self.batcher = MicroBatcher(self._generate_batch, batch_size, batch_window)
 
 	async def complete(
 		self,
@@ -20,6 +64,204 @@ class HFProvider:
 		stream: bool = False,
 		**kwargs: Any,
 	) -> LLMResponse | AsyncGenerator[str, None]:
-		# Use text-generation-inference compatible endpoints if available; for simplicity we just return last user message reversed as placeholder
-		text = " ".join(m.content for m in messages if m.role == "user")[::-1]
-		return LLMResponse(text=f"[HF-PLACEHOLDER] {text}", provider=self.name, model=model or "hf")
+		prompt = TEMPLATES[self.chat_template](messages)
+		parameters = self._parameters(kwargs)
+		if stream:
+			resp = await open_stream(
+				self.pool.get(self.name, self.timeout),
+				"POST",
+				f"{self.base_url}/generate_stream",
+				headers=self._headers(),
+				json={"inputs": prompt, "parameters": parameters},
+			)
+			return iter_tgi_tokens(resp)
+		if self.batcher is not None and self.batcher.enabled:
+			data = await self.batcher.submit(prompt, parameters)
+		else:
+			data = await self._generate(prompt, parameters)
+		details = data.get("details") or {}
+		usage: Optional[Dict[str, Any]] = None
+		if details.get("generated_tokens") is not None:
+			usage = {
+				"prompt_tokens": prompt_tokens(messages),
+				"completion_tokens": details["generated_tokens"],
+			}
+			usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+		return LLMResponse(
+			text=data.get("generated_text") or "",
+			provider=self.name,
+			model=model or "hf",
+			finish_reason=_FINISH_REASONS.get(details.get("finish_reason"), "stop"),
+			usage=usage,
+		)
+
+	def _parameters(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+		parameters: Dict[str, Any] = {"max_new_tokens": self.max_new_tokens, "details": True}
+		for key in ("max_new_tokens", "temperature", "top_p", "stop", "seed"):
+			if kwargs.get(key) is not None:
+				parameters[key] = kwargs[key]
+		return parameters
+
+	def _headers(self) -> Dict[str, str]:
+		return {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+
+	async def _generate(self, prompt: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+		client = self.pool.get(self.name, self.timeout)
+		resp = await client.post(
+			f"{self.base_url}/generate",
+			headers=self._headers(),
+			json={"inputs": prompt, "parameters": parameters},
+		)
+		resp.raise_for_status()
+		return resp.json()
+
+	async def _generate_batch(self, prompts: List[str], parameters: Dict[str, Any]) -> List[Dict[str, Any]]:
+		if len(prompts) == 1:
+			return [await self._generate(prompts[0], parameters)]
+		client = self.pool.get(self.name, self.timeout)
+		resp = await client.post(
+			f"{self.base_url}/",
+			headers=self._headers(),
+			json={"inputs": prompts, "parameters": parameters},
+		)
+		if 400 <= resp.status_code < 500 and resp.status_code != 429:
+			# No list support: stop batching and send these one by one.
+			self.batcher.enabled = False  # type: ignore[union-attr]
+			return list(await asyncio.gather(*(self._generate(p, parameters) for p in prompts)))
+		resp.raise_for_status()
+		data = resp.json()
+		if not isinstance(data, list) or len(data) != len(prompts):
+			raise ValueError("batched response does not match the inputs")
+		return data
+
+
+class MicroBatcher:
+	"""Collects concurrent requests with equal parameters into batches of up
+	to ``max_size``, waiting at most ``window`` seconds for a batch to fill.
+	Errors from a batch are raised to every request in it."""
+
+	def __init__(
+		self,
+		send: Callable[[List[str], Dict[str, Any]], Any],
+		max_size: int,
+		window: float,
+	) -> None:
+		self.send = send
+		self.max_size = max_size
+		self.window = window
+		self.enabled = True
+		self.batches = 0
+		self._pending: Dict[bytes, Tuple[Dict[str, Any], List[Tuple[str, asyncio.Future]], asyncio.TimerHandle]] = {}
+		self._tasks: set = set()
+
+	async def submit(self, prompt: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+		loop = asyncio.get_running_loop()
+		key = orjson.dumps(parameters, option=orjson.OPT_SORT_KEYS)
+		future = loop.create_future()
+		entry = self._pending.get(key)
+		if entry is None:
+			entry = (parameters, [], loop.call_later(self.window, self._flush, key))
+			self._pending[key] = entry
+		entry[1].append((prompt, future))
+		if len(entry[1]) >= self.max_size:
+			self._flush(key)
+		return await future
+
+	def _flush(self, key: bytes) -> None:
+		entry = self._pending.pop(key, None)
+		if entry is None:
+			return
+		parameters, items, timer = entry
+		timer.cancel()
+		task = asyncio.get_running_loop().create_task(self._run(parameters, items))
+		self._tasks.add(task)
+		task.add_done_callback(self._tasks.discard)
+
+	async def _run(self, parameters: Dict[str, Any], items: List[Tuple[str, asyncio.Future]]) -> None:
+		live = [(prompt, future) for prompt, future in items if not future.cancelled()]
+		if not live:
+			return
+		self.batches += 1
+		try:
+			results = await self.send([prompt for prompt, _ in live], parameters)
+		except Exception as e:
+			for _, future in live:
+				if not future.done():
+					future.set_exception(e)
+			return
+		for (_, future), result in zip(live, results):
+			if not future.done():
+				future.set_result(result)
+
+
+async def iter_tgi_tokens(response: httpx.Response) -> AsyncGenerator[str, None]:
+	"""Yield token text from a TGI ``/generate_stream`` SSE response,
+	skipping special tokens. An ``error`` event raises."""
+	try:
+		async for line in response.aiter_lines():
+			if not line.startswith("data:"):
+				continue
+			try:
+				obj = orjson.loads(line[5:])
+			except orjson.JSONDecodeError:
+				continue
+			if obj.get("error"):
+				raise RuntimeError(f"TGI stream error: {obj['error']}")
+			token = obj.get("token") or {}
+			if token.get("text") and not token.get("special"):
+				yield token["text"]
+			if obj.get("details") is not None or obj.get("generated_text") is not None:
+				break
+	finally:
+		await response.aclose()
+
+
+def _turns(messages: List[ChatMessage]) -> List[Tuple[str, str]]:
+	"""``(role, content)`` with roles other than system/user/assistant
+	(e.g. tool output) passed as user turns."""
+	turns = []
+	for m in messages:
+		if m.role in ("system", "user", "assistant"):
+			turns.append((m.role, m.content))
+		else:
+			turns.append(("user", f"[{m.role} result]\n{m.content}"))
+	return turns
+
+
+def render_mistral(messages: List[ChatMessage]) -> str:
+	system = "\n\n".join(content for role, content in _turns(messages) if role == "system")
+	parts: List[str] = []
+	for role, content in _turns(messages):
+		if role == "user":
+			if system:
+				content, system = f"{system}\n\n{content}", ""
+			parts.append(f"[INST] {content} [/INST]")
+		elif role == "assistant":
+			parts.append(f" {content}</s>")
+	return "".join(parts)
+
+
+def render_chatml(messages: List[ChatMessage]) -> str:
+	body = "".join(f"<|im_start|>{role}\n{content}<|im_end|>\n" for role, content in _turns(messages))
+	return body + "<|im_start|>assistant\n"
+
+
+def render_llama3(messages: List[ChatMessage]) -> str:
+	body = "".join(
+		f"<|start_header_id|>{role}<|end_header_id|>\n\n{content}<|eot_id|>"
+		for role, content in _turns(messages)
+	)
+	return body + "<|start_header_id|>assistant<|end_header_id|>\n\n"
+
+
+def render_plain(messages: List[ChatMessage]) -> str:
+	body = "".join(f"{role.capitalize()}: {content}\n" for role, content in _turns(messages))
+	return body + "Assistant:"
+
+
+TEMPLATES: Dict[str, Callable[[List[ChatMessage]], str]] = {
+	"mistral": render_mistral,
+	"chatml": render_chatml,
+	"llama3": render_llama3,
+	"plain": render_plain,
+}
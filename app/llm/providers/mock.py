@@ -1,14 +1,119 @@
 from __future__ import annotations
 
 import asyncio
+import math
+import random
+from dataclasses import dataclass
 from typing import Any, AsyncGenerator, Dict, List, Optional
 
 from ..base import ChatMessage, LLMResponse
+from ..tokens import estimate_tokens, prompt_tokens
+
+
+@dataclass
+class SimulationProfile:
+	"""How the mock behaves, so benchmarks and failure drills are reproducible.
+
+	``ttft`` is the median time to first token; with ``ttft_jitter`` > 0 it is
+	drawn from a log-normal distribution with that sigma. ``tokens_per_sec``
+	paces generation (0 keeps the legacy fixed 8-character chunks).
+	``error_rate``, ``timeout_rate`` and ``rate_limit_rate`` are per-request
+	probabilities of a 500, a hang of ``timeout`` seconds and a 429 with
+	``Retry-After: retry_after``. A ``seed`` makes the sequence repeatable.
+	"""
+
+	ttft: float = 0.0
+	ttft_jitter: float = 0.0
+	tokens_per_sec: float = 0.0
+	reply_tokens: int = 0
+	error_rate: float = 0.0
+	timeout_rate: float = 0.0
+	rate_limit_rate: float = 0.0
+	retry_after: float = 1.0
+	timeout: float = 30.0
+	seed: Optional[int] = None
+
+	@classmethod
+	def from_settings(cls, settings: Any) -> "SimulationProfile":
+		return cls(
+			ttft=settings.mock_ttft,
+			ttft_jitter=settings.mock_ttft_jitter,
+			tokens_per_sec=settings.mock_tokens_per_sec,
+			reply_tokens=settings.mock_reply_tokens,
+			error_rate=settings.mock_error_rate,
+			timeout_rate=settings.mock_timeout_rate,
+			rate_limit_rate=settings.mock_rate_limit_rate,
+			retry_after=settings.mock_retry_after,
+			timeout=settings.mock_timeout,
+			seed=settings.mock_seed,
+		)
+
+
+class Simulation:
+	"""Draws latencies and faults for a :class:`SimulationProfile`."""
+
+	def __init__(self, profile: SimulationProfile) -> None:
+		self.profile = profile
+		self.rng = random.Random(profile.seed)
+
+	def fault(self) -> Optional[str]:
+		"""``"error"``, ``"timeout"``, ``"rate_limit"`` or None for this request."""
+		p = self.profile
+		roll = self.rng.random()
+		for kind, rate in (("error", p.error_rate), ("timeout", p.timeout_rate), ("rate_limit", p.rate_limit_rate)):
+			if roll < rate:
+				return kind
+			roll -= rate
+		return None
+
+	def ttft(self) -> float:
+		p = self.profile
+		if p.ttft <= 0 or p.ttft_jitter <= 0:
+			return max(p.ttft, 0.0)
+		return p.ttft * math.exp(self.rng.gauss(0.0, p.ttft_jitter))
+
+	def reply(self, messages: List[ChatMessage]) -> str:
+		last = messages[-1].content if messages else ""
+		reply = f"[SAMURAI-MOCK] You said: {last}"
+		n = self.profile.reply_tokens
+		if n > 0:
+			words = reply.split(" ")[:n]
+			words.extend("lorem" for _ in range(n - len(words)))
+			reply = " ".join(words)
+		return reply
+
+	def generation_time(self, reply: str) -> float:
+		if self.profile.tokens_per_sec <= 0:
+			return 0.0
+		return len(reply.split(" ")) / self.profile.tokens_per_sec
+
+	async def chunks(self, reply: str, ttft: float) -> AsyncGenerator[str, None]:
+		if ttft > 0:
+			await asyncio.sleep(ttft)
+		if self.profile.tokens_per_sec <= 0:
+			for i in range(0, len(reply), 8):
+				await asyncio.sleep(0.01)
+				yield reply[i : i + 8]
+			return
+		delay = 1.0 / self.profile.tokens_per_sec
+		words = reply.split(" ")
+		for i, word in enumerate(words):
+			if i:
+				await asyncio.sleep(delay)
+			yield word if i == len(words) - 1 else word + " "
 
 
 class MockProvider:
+	"""Echoes the last message, optionally with simulated latency and faults
+	(see :class:`SimulationProfile`). Faults surface as the same httpx errors
+	the network providers raise, so fallback, circuit breaking and 429
+	backoff see them exactly like real ones."""
+
 	name = "mock"
 
+	def __init__(self, profile: Optional[SimulationProfile] = None) -> None:
+		self.sim = Simulation(profile or SimulationProfile())
+
 	async def complete(
 		self,
 		messages: List[ChatMessage],
@@ -16,13 +121,36 @@ class MockProvider:
 		stream: bool = False,
 		**kwargs: Any,
 	) -> LLMResponse | AsyncGenerator[str, None]:
-		last = messages[-1].content if messages else ""
-		reply = f"[SAMURAI-MOCK] You said: {last}"
+		fault = self.sim.fault()
+		if fault is not None:
+			await self._raise_fault(fault)
+		reply = self.sim.reply(messages)
+		ttft = self.sim.ttft()
 		if stream:
-			async def generator() -> AsyncGenerator[str, None]:
-				for i in range(0, len(reply), 8):
-					await asyncio.sleep(0.01)
-					yield reply[i : i + 8]
+			return self.sim.chunks(reply, ttft)
+		delay = ttft + self.sim.generation_time(reply)
+		if delay > 0:
+			await asyncio.sleep(delay)
+		usage: Dict[str, Any] = {
+			"prompt_tokens": prompt_tokens(messages),
+			"completion_tokens": estimate_tokens(reply),
+		}
+		usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+		return LLMResponse(text=reply, provider=self.name, model=model or "mock", usage=usage)
+
+	async def _raise_fault(self, fault: str) -> None:
+		import httpx
 
-			return generator()
-		return LLMResponse(text=reply, provider=self.name, model=model or "mock")
+		request = httpx.Request("POST", "http://mock/chat/completions")
+		if fault == "timeout":
+			await asyncio.sleep(self.sim.profile.timeout)
+			raise httpx.ReadTimeout("simulated timeout", request=request)
+		if fault == "rate_limit":
+			response = httpx.Response(
+				429, headers={"Retry-After": f"{self.sim.profile.retry_after:g}"}, request=request
+			)
+		else:
+			response = httpx.Response(500, request=request)
+		raise httpx.HTTPStatusError(
+			f"simulated {response.status_code}", request=request, response=response
+		)
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import time
+from typing import Any, AsyncGenerator, Dict
+
+import orjson
+from fastapi import Body, FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from ...config import load_settings
+from ..base import ChatMessage
+from ..tokens import estimate_tokens, prompt_tokens
+from .mock import Simulation, SimulationProfile
+
+
+def create_app(profile: SimulationProfile) -> FastAPI:
+	"""An OpenAI-compatible ``/v1/chat/completions`` stand-in driven by the
+	mock simulation, for exercising :class:`OpenAIProvider` end to end."""
+	sim = Simulation(profile)
+	ids = itertools.count(1)
+	app = FastAPI(title="SAMURAI mock OpenAI")
+
+	@app.get("/v1/models")
+	async def models() -> Dict[str, Any]:
+		return {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "samurai"}]}
+
+	@app.post("/v1/chat/completions")
+	async def completions(payload: Dict[str, Any] = Body(..., embed=False)) -> Any:
+		messages = [
+			ChatMessage(role=str(m.get("role") or "user"), content=str(m.get("content") or ""))
+			for m in payload.get("messages") or []
+		]
+		model = str(payload.get("model") or "mock")
+		fault = sim.fault()
+		if fault == "timeout":
+			await asyncio.sleep(profile.timeout)
+			return _error(504, "simulated timeout", "timeout")
+		if fault == "rate_limit":
+			return _error(
+				429, "simulated rate limit", "rate_limit_exceeded",
+				headers={"Retry-After": f"{profile.retry_after:g}"},
+			)
+		if fault == "error":
+			return _error(500, "simulated server error", "server_error")
+
+		completion_id = f"chatcmpl-mock-{next(ids)}"
+		created = int(time.time())
+		reply = sim.reply(messages)
+		ttft = sim.ttft()
+		if payload.get("stream"):
+			return StreamingResponse(
+				_sse(sim.chunks(reply, ttft), completion_id, created, model),
+				media_type="text/event-stream",
+			)
+		delay = ttft + sim.generation_time(reply)
+		if delay > 0:
+			await asyncio.sleep(delay)
+		usage = {"prompt_tokens": prompt_tokens(messages), "completion_tokens": estimate_tokens(reply)}
+		usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+		return {
+			"id": completion_id,
+			"object": "chat.completion",
+			"created": created,
+			"model": model,
+			"choices": [
+				{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}
+			],
+			"usage": usage,
+		}
+
+	return app
+
+
+async def _sse(
+	chunks: AsyncGenerator[str, None], completion_id: str, created: int, model: str
+) -> AsyncGenerator[bytes, None]:
+	def frame(delta: Dict[str, Any], finish: Any = None) -> bytes:
+		body = {
+			"id": completion_id,
+			"object": "chat.completion.chunk",
+			"created": created,
+			"model": model,
+			"choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+		}
+		return b"data: " + orjson.dumps(body) + b"\n\n"
+
+	yield frame({"role": "assistant"})
+	async for chunk in chunks:
+		yield frame({"content": chunk})
+	yield frame({}, "stop")
+	yield b"data: [DONE]\n\n"
+
+
+def _error(status: int, message: str, kind: str, headers: Any = None) -> JSONResponse:
+	return JSONResponse(
+		status_code=status,
+		content={"error": {"message": message, "type": kind}},
+		headers=headers,
+	)
+
+
+def main() -> None:
+	settings = load_settings()
+	parser = argparse.ArgumentParser(
+		description="OpenAI-compatible mock server (point OPENAI_BASE_URL at http://HOST:PORT/v1)"
+	)
+	parser.add_argument("--host", default="127.0.0.1")
+	parser.add_argument("--port", type=int, default=9100)
+	parser.add_argument("--ttft", type=float, default=settings.mock_ttft)
+	parser.add_argument("--ttft-jitter", type=float, default=settings.mock_ttft_jitter)
+	parser.add_argument("--tps", type=float, default=settings.mock_tokens_per_sec)
+	parser.add_argument("--reply-tokens", type=int, default=settings.mock_reply_tokens)
+	parser.add_argument("--error-rate", type=float, default=settings.mock_error_rate)
+	parser.add_argument("--timeout-rate", type=float, default=settings.mock_timeout_rate)
+	parser.add_argument("--rate-limit-rate", type=float, default=settings.mock_rate_limit_rate)
+	parser.add_argument("--retry-after", type=float, default=settings.mock_retry_after)
+	parser.add_argument("--timeout", type=float, default=settings.mock_timeout)
+	parser.add_argument("--seed", type=int, default=settings.mock_seed)
+	args = parser.parse_args()
+
+	import uvicorn
+
+	profile = SimulationProfile(
+		ttft=args.ttft,
+		ttft_jitter=args.ttft_jitter,
+		tokens_per_sec=args.tps,
+		reply_tokens=args.reply_tokens,
+		error_rate=args.error_rate,
+		timeout_rate=args.timeout_rate,
+		rate_limit_rate=args.rate_limit_rate,
+		retry_after=args.retry_after,
+		timeout=args.timeout,
+		seed=args.seed,
+	)
+	uvicorn.run(create_app(profile), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+	main()
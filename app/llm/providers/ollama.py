@@ -1,17 +1,93 @@
 from __future__ import annotations
 
-from typing import Any, AsyncGenerator, Dict, List, Optional
-
-import httpx
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from typing import Any, AsyncGenerator, Dict, List, Optional, Set
 
+from ... import metrics
 from ..base import ChatMessage, LLMResponse
+from ..http import HTTPClientPool, iter_ndjson_messages, open_stream
+
+
+# Server-reported load_duration below this is a residency check, not a load.
+_LOAD_THRESHOLD = 0.1
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
 
 
 class OllamaProvider:
+	"""Ollama chat client that manages which models stay loaded.
+
+	Every request carries ``keep_alive``. :meth:`startup` preloads
+	``default_model`` in the background so the first turn does not pay the
+	model load, and a ping loop refreshes models that have been idle for
+	``ping_interval`` seconds. At most ``warm_models`` models are kept warm,
+	least recently used first out: switching to another model unloads the
+	oldest one instead of leaving the server to thrash memory. Load times are
+	exported as ``samurai_ollama_model_load_seconds``.
+	"""
+
 	name = "ollama"
 
-	def __init__(self, base_url: str = "http://localhost:11434") -> None:
+	def __init__(
+		self,
+		pool: HTTPClientPool,
+		base_url: str = "http://localhost:11434",
+		timeout: float = 0,
+		keep_alive: str = "30m",
+		default_model: str = "llama3.1",
+		preload: bool = True,
+		warm_models: int = 2,
+		ping_interval: Optional[float] = None,
+	) -> None:
+		self.pool = pool
 		self.base_url = base_url.rstrip("/")
+		self.timeout = timeout
+		self.keep_alive = keep_alive
+		# Ollama reads a bare number as seconds, but not a bare number string.
+		duration = parse_duration(keep_alive)
+		self._keep_alive: Any = keep_alive
+		if duration is not None and re.fullmatch(r"-?\d+", keep_alive.strip()):
+			self._keep_alive = int(duration)
+		self.default_model = default_model
+		self.preload = preload
+		self.warm_models = warm_models
+		if ping_interval is None:
+			# Refresh halfway through keep_alive; never for "keep forever".
+			ping_interval = duration / 2 if duration and duration > 0 else 0.0
+		self.ping_interval = ping_interval
+		# model -> monotonic time of last use, least recently used first.
+		self._warm: "OrderedDict[str, float]" = OrderedDict()
+		self._tasks: Set[asyncio.Task] = set()
+		self._pinger: Optional[asyncio.Task] = None
+		self.loads = 0
+		self.unloads = 0
+
+	async def startup(self) -> None:
+		if self.preload:
+			self._spawn(self._preload(self.default_model))
+		if self.ping_interval > 0 and self._pinger is None:
+			self._pinger = asyncio.get_running_loop().create_task(self._ping_loop())
+
+	async def aclose(self) -> None:
+		tasks = list(self._tasks)
+		if self._pinger is not None:
+			tasks.append(self._pinger)
+			self._pinger = None
+		for task in tasks:
+			task.cancel()
+		if tasks:
+			await asyncio.gather(*tasks, return_exceptions=True)
+
+	def stats(self) -> Dict[str, Any]:
+		now = time.monotonic()
+		return {
+			"keep_alive": self.keep_alive,
+			"warm": {model: round(now - used, 1) for model, used in self._warm.items()},
+			"loads": self.loads,
+			"unloads": self.unloads,
+		}
 
 	async def complete(
 		self,
@@ -21,24 +97,103 @@ class OllamaProvider:
 		**kwargs: Any,
 	) -> LLMResponse | AsyncGenerator[str, None]:
 		payload = {
-			"model": model or "llama3.1",
-			"messages": [m.__dict__ for m in messages],
+			"model": model or self.default_model,
+			"messages": [m.to_dict() for m in messages],
 			"stream": bool(stream),
+			"keep_alive": self._keep_alive,
 		}
-		async with httpx.AsyncClient(timeout=None) as client:
-			if stream:
-				resp = await client.post(f"{self.base_url}/api/chat", json=payload)
-				resp.raise_for_status()
-				async def gen():
-					async for line in resp.aiter_lines():
-						if not line:
-							continue
-						yield line
-				return gen()
-			else:
-				resp = await client.post(f"{self.base_url}/api/chat", json=payload)
-				resp.raise_for_status()
-				data = resp.json()
-				# Ollama non-stream returns message.content
-				text = data.get("message", {}).get("content", "")
-				return LLMResponse(text=text, provider=self.name, model=payload["model"]) 
+		client = self.pool.get(self.name, self.timeout)
+		# Models enter the warm set only once the server has accepted them, so
+		# a mistyped model never evicts a real one.
+		if stream:
+			resp = await open_stream(client, "POST", f"{self.base_url}/api/chat", json=payload)
+			self._touch(payload["model"])
+			return iter_ndjson_messages(resp, on_done=self._observe_load)
+		else:
+			resp = await client.post(f"{self.base_url}/api/chat", json=payload)
+			resp.raise_for_status()
+			self._touch(payload["model"])
+			data = resp.json()
+			self._observe_load(data)
+			# Ollama non-stream returns message.content
+			text = data.get("message", {}).get("content", "")
+			return LLMResponse(text=text, provider=self.name, model=payload["model"])
+
+	def _touch(self, model: str) -> None:
+		"""Mark ``model`` as used; unload the least recently used model if the
+		warm set is now too big."""
+		self._warm[model] = time.monotonic()
+		self._warm.move_to_end(model)
+		while self.warm_models > 0 and len(self._warm) > self.warm_models:
+			evicted, _ = self._warm.popitem(last=False)
+			self._spawn(self._unload(evicted))
+
+	async def _load(self, model: str) -> None:
+		"""Load ``model`` (or extend its keep_alive if loaded); an empty
+		``/api/generate`` request does this without generating."""
+		start = time.perf_counter()
+		client = self.pool.get(self.name, self.timeout)
+		resp = await client.post(
+			f"{self.base_url}/api/generate", json={"model": model, "keep_alive": self._keep_alive}
+		)
+		resp.raise_for_status()
+		data = resp.json()
+		if "load_duration" not in data:
+			data["load_duration"] = int((time.perf_counter() - start) * 1e9)
+		self._observe_load(data)
+
+	async def _preload(self, model: str) -> None:
+		"""Load ``model`` and count it as warm only once Ollama accepted it."""
+		await self._load(model)
+		self._touch(model)
+
+	async def _unload(self, model: str) -> None:
+		client = self.pool.get(self.name, self.timeout)
+		resp = await client.post(f"{self.base_url}/api/generate", json={"model": model, "keep_alive": 0})
+		resp.raise_for_status()
+		self.unloads += 1
+
+	async def _ping_loop(self) -> None:
+		while True:
+			await asyncio.sleep(self.ping_interval)
+			idle_since = time.monotonic() - self.ping_interval
+			for model, used in list(self._warm.items()):
+				if used <= idle_since:
+					try:
+						await self._load(model)
+					except Exception as e:
+						# Server down; requests will report it. A model that is
+						# gone (404) is no longer kept warm.
+						if getattr(getattr(e, "response", None), "status_code", None) == 404:
+							self._warm.pop(model, None)
+
+	def _observe_load(self, data: Dict[str, Any]) -> None:
+		seconds = (data.get("load_duration") or 0) / 1e9
+		if seconds >= _LOAD_THRESHOLD:
+			self.loads += 1
+			metrics.OLLAMA_LOAD_SECONDS.observe(seconds, data.get("model") or "")
+
+	def _spawn(self, coro: Any) -> None:
+		try:
+			task = asyncio.get_running_loop().create_task(coro)
+		except RuntimeError:
+			coro.close()
+			return
+		self._tasks.add(task)
+		task.add_done_callback(self._task_done)
+
+	def _task_done(self, task: asyncio.Task) -> None:
+		self._tasks.discard(task)
+		if not task.cancelled():
+			# Preload and unload are best effort.
+			task.exception()
+
+
+def parse_duration(value: str) -> Optional[float]:
+	"""Seconds in an Ollama ``keep_alive`` value ("30m", "1h", "90", "-1");
+	negative means keep forever, None if unparseable."""
+	value = str(value).strip()
+	match = re.fullmatch(r"(-?\d+(?:\.\d+)?)(ms|s|m|h)?", value)
+	if not match:
+		return None
+	return float(match.group(1)) * _DURATION_UNITS[match.group(2) or "s"]
@@ -2,16 +2,17 @@ from __future__ import annotations
 
 from typing import Any, AsyncGenerator, Dict, List, Optional
 
-import httpx
-
 from ..base import ChatMessage, LLMResponse
+from ..http import HTTPClientPool, iter_sse_deltas, open_stream
 
 
 class OpenRouterProvider:
 	name = "openrouter"
 
-	def __init__(self, api_key: str) -> None:
+	def __init__(self, api_key: str, pool: HTTPClientPool, timeout: float = 60.0) -> None:
 		self.api_key = api_key
+		self.pool = pool
+		self.timeout = timeout
 		self.base_url = "https://openrouter.ai/api/v1"
 
 	async def complete(
@@ -28,27 +29,24 @@ class OpenRouterProvider:
 		}
 		payload = {
 			"model": model or "openrouter/auto",
-			"messages": [m.__dict__ for m in messages],
+			"messages": [m.to_dict() for m in messages],
 			"stream": bool(stream),
 		}
-		async with httpx.AsyncClient(timeout=60.0) as client:
-			if stream:
-				resp = await client.post(f"{self.base_url}/chat/completions", headers=headers, json=payload)
-				resp.raise_for_status()
-				async def gen():
-					async for line in resp.aiter_lines():
-						if not line or not line.startswith("data: "):
-							continue
-						data = line[6:]
-						if data.strip() == "[DONE]":
-							break
-						yield data
-				return gen()
-			else:
-				resp = await client.post(f"{self.base_url}/chat/completions", headers=headers, json=payload)
-				resp.raise_for_status()
-				data = resp.json()
-				text = data["choices"][0]["message"]["content"]
-				finish = data["choices"][0].get("finish_reason", "stop")
-				usage = data.get("usage")
-				return LLMResponse(text=text, provider=self.name, model=payload["model"], finish_reason=finish, usage=usage)
+		client = self.pool.get(self.name, self.timeout)
+		if stream:
+			resp = await open_stream(
+				client,
+				"POST",
+				f"{self.base_url}/chat/completions",
+				headers=headers,
+				json=payload,
+			)
+			return iter_sse_deltas(resp)
+		else:
+			resp = await client.post(f"{self.base_url}/chat/completions", headers=headers, json=payload)
+			resp.raise_for_status()
+			data = resp.json()
+			text = data["choices"][0]["message"]["content"]
+			finish = data["choices"][0].get("finish_reason", "stop")
+			usage = data.get("usage")
+			return LLMResponse(text=text, provider=self.name, model=payload["model"], finish_reason=finish, usage=usage)
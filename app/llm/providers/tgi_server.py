@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+import orjson
+from fastapi import Body, FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from ...config import load_settings
+from ..base import ChatMessage
+from ..tokens import estimate_tokens
+from .mock import Simulation, SimulationProfile
+
+
+def create_app(profile: SimulationProfile, max_concurrent: int = 0, batching: bool = True) -> FastAPI:
+	"""A text-generation-inference stand-in driven by the mock simulation,
+	for exercising :class:`HFProvider` end to end.
+
+	Serves ``/generate``, ``/generate_stream`` and ``/`` (which also takes a
+	list of inputs when ``batching`` is on, generated together as one step).
+	``max_concurrent`` > 0 caps generations in progress, like a server with
+	fixed compute, so the effect of client-side batching can be measured.
+	"""
+	sim = Simulation(profile)
+	slots: Optional[asyncio.Semaphore] = asyncio.Semaphore(max_concurrent) if max_concurrent > 0 else None
+	app = FastAPI(title="SAMURAI mock TGI")
+	app.state.requests = 0
+	app.state.batches = 0
+
+	@app.get("/info")
+	async def info() -> Dict[str, Any]:
+		return {"model_id": "mock", "max_batch_total_tokens": 16000, "version": "mock"}
+
+	@app.get("/stats")
+	async def stats() -> Dict[str, Any]:
+		return {"requests": app.state.requests, "batches": app.state.batches}
+
+	@app.post("/generate")
+	async def generate(payload: Dict[str, Any] = Body(..., embed=False)) -> Any:
+		app.state.requests += 1
+		fault = await _fault(sim)
+		if fault is not None:
+			return fault
+		return (await _generate_all([str(payload.get("inputs") or "")]))[0]
+
+	@app.post("/")
+	async def compat(payload: Dict[str, Any] = Body(..., embed=False)) -> Any:
+		app.state.requests += 1
+		inputs = payload.get("inputs")
+		if isinstance(inputs, list) and not batching:
+			return _error(422, "inputs must be a string", "validation")
+		fault = await _fault(sim)
+		if fault is not None:
+			return fault
+		if isinstance(inputs, list):
+			app.state.batches += 1
+			return await _generate_all([str(i) for i in inputs])
+		return [(await _generate_all([str(inputs or "")]))[0]]
+
+	@app.post("/generate_stream")
+	async def generate_stream(payload: Dict[str, Any] = Body(..., embed=False)) -> Any:
+		app.state.requests += 1
+		fault = await _fault(sim)
+		if fault is not None:
+			return fault
+		reply = sim.reply([ChatMessage(role="user", content=str(payload.get("inputs") or ""))])
+		return StreamingResponse(_sse(sim, slots, reply), media_type="text/event-stream")
+
+	async def _generate_all(inputs: List[str]) -> List[Dict[str, Any]]:
+		replies = [sim.reply([ChatMessage(role="user", content=text)]) for text in inputs]
+		# One decoding step serves the whole batch: it takes as long as the
+		# longest reply.
+		delay = sim.ttft() + max(sim.generation_time(reply) for reply in replies)
+		if slots is not None:
+			async with slots:
+				await asyncio.sleep(delay)
+		elif delay > 0:
+			await asyncio.sleep(delay)
+		return [
+			{
+				"generated_text": reply,
+				"details": {"finish_reason": "eos_token", "generated_tokens": estimate_tokens(reply)},
+			}
+			for reply in replies
+		]
+
+	return app
+
+
+async def _sse(sim: Simulation, slots: Optional[asyncio.Semaphore], reply: str) -> AsyncGenerator[bytes, None]:
+	if slots is not None:
+		await slots.acquire()
+	try:
+		count = 0
+		async for chunk in sim.chunks(reply, sim.ttft()):
+			count += 1
+			yield b"data:" + orjson.dumps(
+				{"token": {"id": count, "text": chunk, "logprob": 0.0, "special": False}, "generated_text": None, "details": None}
+			) + b"\n\n"
+		yield b"data:" + orjson.dumps({
+			"token": {"id": 0, "text": "</s>", "logprob": 0.0, "special": True},
+			"generated_text": reply,
+			"details": {"finish_reason": "eos_token", "generated_tokens": count},
+		}) + b"\n\n"
+	finally:
+		if slots is not None:
+			slots.release()
+
+
+async def _fault(sim: Simulation) -> Optional[JSONResponse]:
+	fault = sim.fault()
+	if fault == "timeout":
+		await asyncio.sleep(sim.profile.timeout)
+		return _error(504, "simulated timeout", "timeout")
+	if fault == "rate_limit":
+		return _error(
+			429, "simulated rate limit", "overloaded",
+			headers={"Retry-After": f"{sim.profile.retry_after:g}"},
+		)
+	if fault == "error":
+		return _error(500, "simulated server error", "generation")
+	return None
+
+
+def _error(status: int, message: str, kind: str, headers: Any = None) -> JSONResponse:
+	return JSONResponse(status_code=status, content={"error": message, "error_type": kind}, headers=headers)
+
+
+def main() -> None:
+	settings = load_settings()
+	parser = argparse.ArgumentParser(
+		description="Text-generation-inference mock server (point HF_BASE_URL at http://HOST:PORT)"
+	)
+	parser.add_argument("--host", default="127.0.0.1")
+	parser.add_argument("--port", type=int, default=9200)
+	parser.add_argument("--ttft", type=float, default=settings.mock_ttft)
+	parser.add_argument("--tps", type=float, default=settings.mock_tokens_per_sec)
+	parser.add_argument("--reply-tokens", type=int, default=settings.mock_reply_tokens)
+	parser.add_argument("--error-rate", type=float, default=settings.mock_error_rate)
+	parser.add_argument("--max-concurrent", type=int, default=0, help="Generations in progress at once (0 = unlimited)")
+	parser.add_argument("--no-batching", action="store_true", help="Reject lists of inputs on /")
+	parser.add_argument("--seed", type=int, default=settings.mock_seed)
+	args = parser.parse_args()
+
+	import uvicorn
+
+	profile = SimulationProfile(
+		ttft=args.ttft,
+		tokens_per_sec=args.tps,
+		reply_tokens=args.reply_tokens,
+		error_rate=args.error_rate,
+		seed=args.seed,
+	)
+	app = create_app(profile, max_concurrent=args.max_concurrent, batching=not args.no_batching)
+	uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import asyncio
+import email.utils
+import heapq
+import itertools
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+
+def priority_value(priority: Any) -> int:
+	"""Map a priority class name (or int) to a sort key; lower runs first."""
+	if isinstance(priority, int):
+		return priority
+	return PRIORITIES.get(str(priority or "interactive"), 0)
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+	"""Return the Retry-After delay of a 429 response error, or None if the
+	error is not a 429. A 429 without a usable header yields 1 second."""
+	response = getattr(error, "response", None)
+	if getattr(response, "status_code", None) != 429:
+		return None
+	value = (getattr(response, "headers", None) or {}).get("retry-after")
+	if not value:
+		return 1.0
+	try:
+		return max(float(value), 0.0)
+	except ValueError:
+		pass
+	try:
+		when = email.utils.parsedate_to_datetime(value)
+	except (TypeError, ValueError):
+		return 1.0
+	return max(when.timestamp() - time.time(), 0.0)
+
+
+class QueueFullError(Exception):
+	"""Raised when a provider's admission queue is full."""
+
+	def __init__(self, provider: str, depth: int, retry_after: float) -> None:
+		super().__init__(f"{provider} queue is full ({depth} waiting)")
+		self.provider = provider
+		self.depth = depth
+		self.retry_after = retry_after
+
+
+class TokenBucket:
+	"""Refills ``per_minute`` units per minute up to one minute's worth."""
+
+	def __init__(self, per_minute: float) -> None:
+		self.rate = per_minute / 60.0
+		self.capacity = float(per_minute)
+		self.level = self.capacity
+		self.updated = time.monotonic()
+
+	def _refill(self, now: float) -> None:
+		self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+		self.updated = now
+
+	def wait_time(self, amount: float, now: float) -> float:
+		"""Seconds until ``amount`` is available (0 if it is now)."""
+		self._refill(now)
+		amount = min(amount, self.capacity)
+		if self.level >= amount:
+			return 0.0
+		return (amount - self.level) / self.rate
+
+	def take(self, amount: float) -> None:
+		self.level -= amount
+
+
+class ProviderGate:
+	"""Admission control for one provider.
+
+	Requests wait in a priority queue (interactive before batch, FIFO within a
+	class) until an in-flight slot is free and the requests-per-minute and
+	tokens-per-minute buckets allow them. A Retry-After from the provider
+	pauses the whole gate. When ``max_queue`` requests are already waiting,
+	:class:`QueueFullError` is raised instead of queueing more.
+	"""
+
+	def __init__(
+		self,
+		name: str,
+		max_in_flight: int = 0,
+		rpm: int = 0,
+		tpm: int = 0,
+		max_queue: int = 100,
+	) -> None:
+		self.name = name
+		self.max_in_flight = max_in_flight
+		self.max_queue = max_queue
+		self.requests = TokenBucket(rpm) if rpm > 0 else None
+		self.tokens = TokenBucket(tpm) if tpm > 0 else None
+		self.in_flight = 0
+		self.paused_until = 0.0
+		self._queue: List[Tuple[int, int, int, asyncio.Future]] = []
+		self._seq = itertools.count()
+		self._timer: Optional[asyncio.TimerHandle] = None
+		self.admitted = 0
+		self.rejected = 0
+		self.rate_limited = 0
+
+	@property
+	def depth(self) -> int:
+		return len(self._queue)
+
+	async def acquire(self, priority: int = 0, tokens: int = 0) -> None:
+		if not self._queue and self._wait_time(tokens) == 0.0:
+			self._admit(tokens)
+			return
+		if len(self._queue) >= self.max_queue:
+			self.rejected += 1
+			raise QueueFullError(self.name, len(self._queue), self._retry_hint())
+		future = asyncio.get_running_loop().create_future()
+		heapq.heappush(self._queue, (priority, next(self._seq), tokens, future))
+		self._pump()
+		try:
+			await future
+		except asyncio.CancelledError:
+			if future.done() and not future.cancelled():
+				# Admitted just as we were cancelled: give the slot back.
+				self.release()
+			else:
+				self._queue = [item for item in self._queue if item[3] is not future]
+				heapq.heapify(self._queue)
+			raise
+
+	def release(self) -> None:
+		self.in_flight -= 1
+		self._pump()
+
+	def settle(self, estimated: int, actual: Optional[int]) -> None:
+		"""Correct the token bucket once real usage is known."""
+		if self.tokens is not None and actual is not None:
+			self.tokens.take(actual - estimated)
+
+	def backoff(self, seconds: float) -> None:
+		"""Pause admissions after a 429 with ``Retry-After: seconds``."""
+		self.rate_limited += 1
+		self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+	def snapshot(self) -> Dict[str, Any]:
+		return {
+			"in_flight": self.in_flight,
+			"queued": len(self._queue),
+			"admitted": self.admitted,
+			"rejected": self.rejected,
+			"rate_limited": self.rate_limited,
+			"paused_for": max(self.paused_until - time.monotonic(), 0.0),
+		}
+
+	def _wait_time(self, tokens: int) -> float:
+		if self.max_in_flight and self.in_flight >= self.max_in_flight:
+			return float("inf")
+		now = time.monotonic()
+		wait = max(self.paused_until - now, 0.0)
+		if self.requests is not None:
+			wait = max(wait, self.requests.wait_time(1, now))
+		if self.tokens is not None and tokens:
+			wait = max(wait, self.tokens.wait_time(tokens, now))
+		return wait
+
+	def _admit(self, tokens: int) -> None:
+		self.in_flight += 1
+		self.admitted += 1
+		if self.requests is not None:
+			self.requests.take(1)
+		if self.tokens is not None and tokens:
+			self.tokens.take(tokens)
+
+	def _pump(self) -> None:
+		if self._timer is not None:
+			self._timer.cancel()
+			self._timer = None
+		while self._queue:
+			_, _, tokens, future = self._queue[0]
+			if future.done():
+				heapq.heappop(self._queue)
+				continue
+			wait = self._wait_time(tokens)
+			if wait == float("inf"):
+				return
+			if wait > 0:
+				self._timer = asyncio.get_running_loop().call_later(wait, self._pump)
+				return
+			heapq.heappop(self._queue)
+			self._admit(tokens)
+			future.set_result(None)
+
+	def _retry_hint(self) -> float:
+		wait = max(self.paused_until - time.monotonic(), 0.0)
+		if self.requests is not None and self.requests.rate > 0:
+			wait = max(wait, len(self._queue) / self.requests.rate)
+		return max(wait, 1.0)
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+import math
+import re
+from functools import lru_cache
+from typing import List
+
+from .base import ChatMessage
+
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_MESSAGE_OVERHEAD = 4
+
+
+@lru_cache(maxsize=16384)
+def estimate_tokens(text: str) -> int:
+	"""Fast tokenizer-free estimate: words and punctuation, plus ~15% for
+	sub-word splits. Cached because history messages are re-counted every
+	turn."""
+	return math.ceil(len(_TOKEN_RE.findall(text)) * 1.15)
+
+
+def message_tokens(message: ChatMessage) -> int:
+	return _MESSAGE_OVERHEAD + estimate_tokens(message.content)
+
+
+def prompt_tokens(messages: List[ChatMessage]) -> int:
+	return sum(message_tokens(m) for m in messages)
@@ -1,34 +1,84 @@
 from __future__ import annotations
 
 import asyncio
-import json
+from contextlib import asynccontextmanager
 from typing import Any, AsyncGenerator, Dict, List, Optional
 
 import orjson
-from fastapi import Body, FastAPI, HTTPException
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import Body, FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 
-from . import __version__
+from . import __version__, metrics
 from .config import load_settings
-from .llm import LLMManager
+from .context import ContextBuilder
+from .llm import ChatMessage, LLMManager
+from .llm.manager import ProvidersFailedError
+from .llm.ratelimit import QueueFullError
+from .generations import Generation, GenerationRegistry
 from .orchestrator import ChatOrchestrator
+from .sse import SSEWriter
 from .tools.registry import ToolRegistry
-from .memory.memory import FileMemoryStore
+from .memory import create_memory_store
 
 
 settings = load_settings()
-app = FastAPI(title=settings.app_name)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+	await llm_manager.startup()
+	try:
+		yield
+	finally:
+		# Cancelled generations save their partial replies first.
+		await generations.aclose()
+		# Summaries still need the LLM and the memory store.
+		await context_builder.aclose()
+		await llm_manager.aclose()
+		await memory_store.aclose()
+		tool_registry.shutdown()
+
+
+app = FastAPI(title=settings.app_name, lifespan=lifespan)
+app.add_middleware(metrics.MetricsMiddleware)
 
 
 # Static web UI under /app to avoid colliding with /api
 app.mount("/app", StaticFiles(directory="/workspace/web", html=True), name="web")
 
 
+@app.exception_handler(QueueFullError)
+async def queue_full(request: Request, exc: QueueFullError) -> JSONResponse:
+	retry_after = max(1, int(exc.retry_after + 0.5))
+	return JSONResponse(
+		status_code=503,
+		content={"detail": str(exc), "provider": exc.provider, "queue_depth": exc.depth},
+		headers={"Retry-After": str(retry_after), "X-Queue-Depth": str(exc.depth)},
+	)
+
+
+@app.exception_handler(ProvidersFailedError)
+async def providers_failed(request: Request, exc: ProvidersFailedError) -> JSONResponse:
+	return JSONResponse(status_code=502, content={"detail": str(exc), "reasons": exc.reasons})
+
+
 # Core services
 llm_manager = LLMManager(settings)
-memory_store = FileMemoryStore(base_path="/workspace/samurai_data/memory")
-tool_registry = ToolRegistry()
+memory_store = create_memory_store(settings)
+tool_registry = ToolRegistry(
+	timeout=settings.tool_timeout,
+	max_result_bytes=settings.tool_max_result_bytes,
+	thread_workers=settings.tool_thread_workers,
+	process_workers=settings.tool_process_workers,
+	inline_max_bytes=settings.tool_inline_max_bytes,
+)
+context_builder = ContextBuilder(llm_manager, memory_store, settings)
+generations = GenerationRegistry(
+	max_items=settings.stream_buffer_items,
+	detach_timeout=settings.stream_detach_timeout,
+	retention=settings.stream_retention,
+)
 
 
 @app.get("/api/health")
@@ -37,9 +87,33 @@ async def health() -> Dict[str, Any]:
 		"status": "ok",
 		"app": settings.app_name,
 		"version": __version__,
+		"streams": generations.stats(),
+	}
+
+
+@app.get("/api/providers")
+async def providers_health() -> Dict[str, Any]:
+	return {
+		"priority": settings.providers_priority,
+		"health": llm_manager.health_snapshot(),
+		"queues": llm_manager.queue_snapshot(),
+		"affinity": llm_manager.affinity_stats(),
+		"providers": llm_manager.provider_stats(),
+		"response_cache": llm_manager.cache_stats(),
 	}
 
 
+@app.get("/api/metrics")
+async def metrics_endpoint() -> PlainTextResponse:
+	"""Prometheus text exposition of request, provider, tool and memory metrics."""
+	return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/memory/stats")
+async def memory_stats() -> Dict[str, Any]:
+	return {"memory": memory_store.stats()}
+
+
 @app.get("/api/tools")
 async def list_tools() -> Dict[str, Any]:
 	return {"tools": tool_registry.list_tools_info()}
@@ -68,6 +142,7 @@ async def chat(
 		llm_manager=llm_manager,
 		tool_registry=tool_registry,
 		memory_store=memory_store,
+		context_builder=context_builder,
 	)
 	result = await orchestrator.chat(session_id=session_id, message=message, options=options)
 	return JSONResponse(content=result)
@@ -88,17 +163,115 @@ async def chat_stream(
 		llm_manager=llm_manager,
 		tool_registry=tool_registry,
 		memory_store=memory_store,
+		context_builder=context_builder,
 	)
 
-	async def event_generator() -> AsyncGenerator[bytes, None]:
-		async for chunk in orchestrator.stream_chat(
-			session_id=session_id, message=message, options=options
-		):
-			yield f"data: {json.dumps({'chunk': chunk})}\n\n".encode("utf-8")
-		yield b"data: {\"event\": \"end\"}\n\n"
+	events = orchestrator.stream_chat(session_id=session_id, message=message, options=options)
+	# Wait for the first event before answering so that a full provider
+	# queue is still reported as a 503 rather than inside the stream.
+	try:
+		first = await events.__anext__()
+	except StopAsyncIteration:
+		first = None
+
+	async def event_source() -> AsyncGenerator[Any, None]:
+		if first is not None:
+			yield first
+		async for chunk in events:
+			yield chunk
+
+	# The generation runs on its own task so a dropped connection can resume
+	# it with GET /api/chat/stream/{session_id}/{turn_id}.
+	generation = generations.start(session_id, event_source())
+	return _stream_response(generation, 0, options.get("coalesce_ms"))
 
+
+@app.get("/api/chat/stream/{session_id}/{turn_id}")
+async def chat_stream_resume(
+	session_id: str,
+	turn_id: str,
+	request: Request,
+	last_event_id: Optional[int] = None,
+	coalesce_ms: Optional[float] = None,
+) -> StreamingResponse:
+	"""Reattach to an in-flight (or recently finished) streamed turn.
+
+	The ``Last-Event-ID`` header (or ``last_event_id`` query parameter) is the
+	``id`` of the last frame received; the stream continues after it.
+	"""
+	generation = generations.get(session_id, turn_id)
+	if generation is None:
+		raise HTTPException(status_code=404, detail="unknown or expired generation")
+	header = request.headers.get("last-event-id")
+	try:
+		after = int(header) if header else int(last_event_id or 0)
+	except ValueError:
+		raise HTTPException(status_code=400, detail="Last-Event-ID must be an integer")
+	return _stream_response(generation, after, coalesce_ms)
+
+
+def _stream_response(generation: Generation, after: int, coalesce_ms: Any) -> StreamingResponse:
+	if not isinstance(coalesce_ms, (int, float)) or isinstance(coalesce_ms, bool):
+		coalesce_ms = settings.sse_coalesce_ms
+	writer = SSEWriter(
+		coalesce_window=max(float(coalesce_ms or 0), 0.0) / 1000,
+		coalesce_bytes=settings.sse_coalesce_bytes,
+		heartbeat=settings.sse_heartbeat,
+	)
 	return StreamingResponse(
-		event_generator(),
+		writer.stream(generations.follow(generation, after), numbered=True),
 		media_type="text/event-stream",
-		headers={"Cache-Control": "no-cache", "Connection": "keep-alive"},
+		headers={"Cache-Control": "no-cache", "Connection": "keep-alive", "X-Accel-Buffering": "no"},
 	)
+
+
+@app.post("/api/chat/batch")
+async def chat_batch(
+	payload: Dict[str, Any] = Body(..., embed=False),
+) -> StreamingResponse:
+	"""Stateless multi-prompt completion streamed back as NDJSON.
+
+	Payload example:
+	{
+		"items": ["prompt one", {"id": "b", "message": "prompt two", "model": null}],
+		"concurrency": 8,
+		"options": {"cache": true}
+	}
+
+	One JSON line per item, in completion order:
+	{"index": 1, "id": "b", "ok": true, "reply": "...", "provider": "openai", ...}
+	"""
+	items = payload.get("items")
+	if not isinstance(items, list) or not items:
+		raise HTTPException(status_code=400, detail="items must be a non-empty list")
+	if len(items) > settings.batch_max_items:
+		raise HTTPException(
+			status_code=400, detail=f"at most {settings.batch_max_items} items per batch"
+		)
+	options = payload.get("options") or {}
+	requested = payload.get("concurrency") or settings.batch_concurrency
+	if not isinstance(requested, int) or isinstance(requested, bool):
+		raise HTTPException(status_code=400, detail="concurrency must be an integer")
+	concurrency = max(1, min(requested, settings.batch_concurrency))
+
+	requests: List[Dict[str, Any]] = []
+	for index, item in enumerate(items):
+		if isinstance(item, str):
+			item = {"message": item}
+		if not isinstance(item, dict) or not str(item.get("message") or "").strip():
+			raise HTTPException(status_code=400, detail=f"item {index}: message is required")
+		messages = []
+		if item.get("system"):
+			messages.append(ChatMessage(role="system", content=str(item["system"])))
+		messages.append(ChatMessage(role="user", content=str(item["message"])))
+		requests.append({"id": item.get("id", index), "messages": messages, "model": item.get("model")})
+
+	llm_options = {"cache": options["cache"]} if "cache" in options else {}
+
+	async def ndjson() -> AsyncGenerator[bytes, None]:
+		async for result in llm_manager.complete_many(
+			requests, concurrency=concurrency, **llm_options
+		):
+			yield orjson.dumps(result) + b"\n"
+
+	return StreamingResponse(ndjson(), media_type="application/x-ndjson")
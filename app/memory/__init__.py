@@ -0,0 +1,9 @@
+from .cache import CachedMemoryStore
+from .memory import FileMemoryStore, MemoryStore, create_memory_store
+
+__all__ = [
+	"CachedMemoryStore",
+	"FileMemoryStore",
+	"MemoryStore",
+	"create_memory_store",
+]
@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+
+from ..llm.base import ChatMessage
+from .memory import FileMemoryStore, MemoryStore
+
+
+BACKENDS = ("file", "jsonl", "sqlite")
+
+
+def open_store(backend: str, path: str) -> MemoryStore:
+	if backend == "jsonl":
+		from .jsonl_store import JSONLMemoryStore
+
+		return JSONLMemoryStore(path)
+	if backend == "sqlite":
+		from .sqlite_store import SQLiteMemoryStore
+
+		return SQLiteMemoryStore(os.path.join(path, "memory.sqlite3"))
+	return FileMemoryStore(path)
+
+
+def _turn(tag: str, i: int, size: int) -> List[ChatMessage]:
+	text = ("x" * size)[: max(size - 20, 0)]
+	return [
+		ChatMessage(role="user", content=f"{tag} q{i} {text}"),
+		ChatMessage(role="assistant", content=f"{tag} a{i} {text}"),
+	]
+
+
+def _ms_percentile(values: List[float], q: float) -> Optional[float]:
+	if not values:
+		return None
+	ordered = sorted(values)
+	return ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000
+
+
+async def _appends(
+	backend: str, path: str, sessions: List[str], turns: int, concurrency: int, size: int, tag: str
+) -> Tuple[List[float], float, int]:
+	store = open_store(backend, path)
+	work = [s for s in sessions for _ in range(turns)]
+	random.Random(tag).shuffle(work)
+	pending = iter(enumerate(work))
+	latencies: List[float] = []
+	errors = 0
+
+	async def worker() -> None:
+		nonlocal errors
+		for i, session_id in pending:
+			start = time.perf_counter()
+			try:
+				await store.append_history(session_id, _turn(tag, i, size))
+			except Exception:
+				errors += 1
+				continue
+			latencies.append(time.perf_counter() - start)
+
+	start = time.perf_counter()
+	await asyncio.gather(*(worker() for _ in range(concurrency)))
+	elapsed = time.perf_counter() - start
+	await store.aclose()
+	return latencies, elapsed, errors
+
+
+def _append_process(args: Tuple[Any, ...]) -> Tuple[List[float], float, int]:
+	return asyncio.run(_appends(*args))
+
+
+async def _reads(backend: str, path: str, sessions: List[str], tail: int) -> Dict[str, Any]:
+	store = open_store(backend, path)
+	full: List[float] = []
+	tails: List[float] = []
+	counts: Dict[str, int] = {}
+	errors = 0
+	for session_id in sessions:
+		start = time.perf_counter()
+		try:
+			history = await store.load_history(session_id)
+		except Exception:
+			errors += 1
+			continue
+		full.append(time.perf_counter() - start)
+		counts[session_id] = len(history)
+		start = time.perf_counter()
+		load_tail = getattr(store, "load_tail", None)
+		if load_tail is not None:
+			await load_tail(session_id, tail)
+		else:
+			(await store.load_history(session_id))[-tail:]
+		tails.append(time.perf_counter() - start)
+	await store.aclose()
+	return {"full": full, "tail": tails, "counts": counts, "errors": errors}
+
+
+async def _seed(backend: str, path: str, sessions: List[str], history: int, size: int) -> None:
+	if history <= 0:
+		return
+	store = open_store(backend, path)
+	for session_id in sessions:
+		messages: List[ChatMessage] = []
+		for i in range(history // 2):
+			messages.extend(_turn("seed", i, size))
+		await store.save_history(session_id, messages)
+	await store.aclose()
+
+
+def _fmt(ms: Optional[float]) -> str:
+	return "-" if ms is None else f"{ms:.2f}ms"
+
+
+def _disk_bytes(path: str) -> int:
+	total = 0
+	for root, _, files in os.walk(path):
+		for name in files:
+			total += os.path.getsize(os.path.join(root, name))
+	return total
+
+
+def run_backend(backend: str, base: str, args: argparse.Namespace) -> Dict[str, Any]:
+	path = os.path.join(base, backend)
+	os.makedirs(path, exist_ok=True)
+	sessions = [f"s{i}" for i in range(args.sessions)]
+	asyncio.run(_seed(backend, path, sessions, args.history, args.size))
+
+	jobs = [
+		(backend, path, sessions, args.turns, args.concurrency, args.size, f"p{p}")
+		for p in range(args.processes)
+	]
+	if args.processes == 1:
+		results = [_append_process(jobs[0])]
+	else:
+		with multiprocessing.get_context("spawn").Pool(args.processes) as pool:
+			results = pool.map(_append_process, jobs)
+	# Processes start together; the slowest one bounds the run.
+	wall = max(r[1] for r in results)
+	latencies = [v for r in results for v in r[0]]
+	append_errors = sum(r[2] for r in results)
+
+	reads = asyncio.run(_reads(backend, path, sessions, args.tail))
+	expected = (args.history // 2) * 2 + args.processes * args.turns * 2
+	lost = sum(max(expected - reads["counts"].get(s, 0), 0) for s in sessions)
+	return {
+		"backend": backend,
+		"appends": len(latencies),
+		"append_errors": append_errors,
+		"appends_per_sec": len(latencies) / wall if wall > 0 else 0.0,
+		"append_ms": {"p50": _ms_percentile(latencies, 0.5), "p99": _ms_percentile(latencies, 0.99)},
+		"load_ms": {"p50": _ms_percentile(reads["full"], 0.5), "p99": _ms_percentile(reads["full"], 0.99)},
+		"tail_ms": {"p50": _ms_percentile(reads["tail"], 0.5), "p99": _ms_percentile(reads["tail"], 0.99)},
+		"read_errors": reads["errors"],
+		"lost_messages": lost,
+		"disk_bytes": _disk_bytes(path),
+	}
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(
+		description="Benchmark the session memory backends, optionally from several processes"
+	)
+	parser.add_argument("--backends", default=",".join(BACKENDS))
+	parser.add_argument("--sessions", type=int, default=50)
+	parser.add_argument("--turns", type=int, default=20, help="Appended turns per session and process")
+	parser.add_argument("--history", type=int, default=0, help="Messages per session before the run")
+	parser.add_argument("--size", type=int, default=200, help="Characters per message")
+	parser.add_argument("--concurrency", type=int, default=16)
+	parser.add_argument("--processes", type=int, default=1, help="Writer processes sharing the store")
+	parser.add_argument("--tail", type=int, default=20)
+	parser.add_argument("--path", default=None, help="Directory to use (default: a temporary one)")
+	parser.add_argument("--json", dest="json_path", default=None, help="Write results as JSON ('-' for stdout)")
+	args = parser.parse_args()
+
+	base = args.path or tempfile.mkdtemp(prefix="samurai-memory-bench-")
+	results = []
+	try:
+		for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+			result = run_backend(backend, base, args)
+			results.append(result)
+			print(
+				f"{backend:>6}: {result['appends_per_sec']:8.0f} appends/s  "
+				f"append p50={_fmt(result['append_ms']['p50'])} p99={_fmt(result['append_ms']['p99'])}  "
+				f"load p50={_fmt(result['load_ms']['p50'])}  tail p50={_fmt(result['tail_ms']['p50'])}  "
+				f"lost={result['lost_messages']} errors={result['append_errors'] + result['read_errors']}  "
+				f"disk={result['disk_bytes'] / 2**20:.1f}MB",
+				file=sys.stderr,
+			)
+	finally:
+		if args.path is None:
+			shutil.rmtree(base, ignore_errors=True)
+
+	report = {"config": vars(args), "results": results}
+	if args.json_path == "-":
+		sys.stdout.buffer.write(orjson.dumps(report, option=orjson.OPT_INDENT_2) + b"\n")
+	elif args.json_path:
+		with open(args.json_path, "wb") as f:
+			f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
+
+from ..llm.base import ChatMessage
+from .memory import MemoryStore
+
+
+_MESSAGE_OVERHEAD = 64
+
+
+def _estimate_bytes(messages: List[ChatMessage]) -> int:
+	return sum(
+		_MESSAGE_OVERHEAD + len(m.role) + len(m.content) + len(m.name or "") for m in messages
+	)
+
+
+class _Entry:
+	__slots__ = ("messages", "size", "dirty")
+
+	def __init__(self, messages: List[ChatMessage], dirty: bool) -> None:
+		self.messages = messages
+		self.size = _estimate_bytes(messages)
+		self.dirty = dirty
+
+
+class CachedMemoryStore(MemoryStore):
+	"""LRU cache of hot sessions in front of another store.
+
+	The cache is bounded by total message count and estimated bytes. Saves
+	update the cache and mark the session dirty; dirty sessions are written
+	to the backend every ``flush_interval`` seconds, when evicted, and on
+	:meth:`aclose`. A ``flush_interval`` of 0 writes through immediately.
+	"""
+
+	def __init__(
+		self,
+		backend: MemoryStore,
+		max_messages: int = 50000,
+		max_bytes: int = 64 * 1024 * 1024,
+		flush_interval: float = 0.0,
+	) -> None:
+		self.backend = backend
+		self.max_messages = max_messages
+		self.max_bytes = max_bytes
+		self.flush_interval = flush_interval
+		self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+		self._messages = 0
+		self._bytes = 0
+		# Dirty sessions evicted before their write finished; served to readers.
+		self._evicting: Dict[str, List[ChatMessage]] = {}
+		self._tasks: Set[asyncio.Task] = set()
+		self._flusher: Optional[asyncio.Task] = None
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self.flushes = 0
+		self.flush_errors = 0
+
+	async def load_history(self, session_id: str) -> List[ChatMessage]:
+		entry = self._entries.get(session_id)
+		if entry is not None:
+			self.hits += 1
+			self._entries.move_to_end(session_id)
+			return list(entry.messages)
+		self.misses += 1
+		evicted = self._evicting.get(session_id)
+		if evicted is not None:
+			messages = list(evicted)
+		else:
+			messages = await self.backend.load_history(session_id)
+			entry = self._entries.get(session_id)
+			if entry is not None:
+				# Saved by another request while we were reading.
+				return list(entry.messages)
+		self._put(session_id, _Entry(list(messages), dirty=False))
+		return messages
+
+	async def save_history(self, session_id: str, messages: List[ChatMessage]) -> None:
+		if self.flush_interval <= 0:
+			self._put(session_id, _Entry(list(messages), dirty=False))
+			await self.backend.save_history(session_id, messages)
+			return
+		self._put(session_id, _Entry(list(messages), dirty=True))
+		self._ensure_flusher()
+
+	async def load_state(self, session_id: str) -> Dict[str, Any]:
+		return await self.backend.load_state(session_id)
+
+	async def save_state(self, session_id: str, state: Dict[str, Any]) -> None:
+		await self.backend.save_state(session_id, state)
+
+	async def flush(self) -> None:
+		"""Write every dirty session to the backend."""
+		dirty = [(sid, entry) for sid, entry in self._entries.items() if entry.dirty]
+		for _, entry in dirty:
+			entry.dirty = False
+		if dirty:
+			await asyncio.gather(*(self._write(sid, entry) for sid, entry in dirty))
+		if self._tasks:
+			await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+	async def aclose(self) -> None:
+		if self._flusher is not None:
+			self._flusher.cancel()
+			try:
+				await self._flusher
+			except asyncio.CancelledError:
+				pass
+			self._flusher = None
+		await self.flush()
+		await self.backend.aclose()
+
+	def stats(self) -> Dict[str, Any]:
+		stats = super().stats()
+		stats["cache"] = {
+			"hits": self.hits,
+			"misses": self.misses,
+			"evictions": self.evictions,
+			"flushes": self.flushes,
+			"flush_errors": self.flush_errors,
+			"sessions": len(self._entries),
+			"messages": self._messages,
+			"bytes": self._bytes,
+			"dirty": sum(1 for e in self._entries.values() if e.dirty),
+		}
+		return stats
+
+	def _put(self, session_id: str, entry: _Entry) -> None:
+		old = self._entries.pop(session_id, None)
+		if old is not None:
+			self._messages -= len(old.messages)
+			self._bytes -= old.size
+			# Keep a pending write-behind if the previous state was still dirty.
+			entry.dirty = entry.dirty or old.dirty
+		self._entries[session_id] = entry
+		self._messages += len(entry.messages)
+		self._bytes += entry.size
+		self._evict()
+
+	def _evict(self) -> None:
+		while len(self._entries) > 1 and (
+			self._messages > self.max_messages or self._bytes > self.max_bytes
+		):
+			session_id, entry = self._entries.popitem(last=False)
+			self._messages -= len(entry.messages)
+			self._bytes -= entry.size
+			self.evictions += 1
+			if entry.dirty:
+				self._evicting[session_id] = entry.messages
+				task = asyncio.get_running_loop().create_task(
+					self._write_evicted(session_id, entry.messages)
+				)
+				self._tasks.add(task)
+				task.add_done_callback(self._tasks.discard)
+
+	async def _write(self, session_id: str, entry: _Entry) -> None:
+		try:
+			await self.backend.save_history(session_id, entry.messages)
+			self.flushes += 1
+		except Exception:
+			self.flush_errors += 1
+			entry.dirty = True
+
+	async def _write_evicted(self, session_id: str, messages: List[ChatMessage]) -> None:
+		try:
+			await self.backend.save_history(session_id, messages)
+			self.flushes += 1
+		except Exception:
+			self.flush_errors += 1
+		finally:
+			if self._evicting.get(session_id) is messages:
+				del self._evicting[session_id]
+
+	def _ensure_flusher(self) -> None:
+		if self._flusher is None or self._flusher.done():
+			self._flusher = asyncio.get_running_loop().create_task(self._flush_loop())
+
+	async def _flush_loop(self) -> None:
+		while True:
+			await asyncio.sleep(self.flush_interval)
+			await self.flush()
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Generic, List, Optional, TypeVar
+
+
+T = TypeVar("T")
+
+
+class BlockingIO:
+	"""Bounded thread pool that keeps file I/O and (de)serialization off the loop."""
+
+	def __init__(self, max_workers: int = 4) -> None:
+		self._executor = ThreadPoolExecutor(
+			max_workers=max(1, max_workers),
+			thread_name_prefix="samurai-memory",
+		)
+
+	async def run(self, fn: Callable[..., T], *args: Any) -> T:
+		return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+	def shutdown(self) -> None:
+		self._executor.shutdown(wait=True)
+
+
+class _Slot(Generic[T]):
+	__slots__ = ("latest", "pending", "waiters", "task")
+
+	def __init__(self) -> None:
+		self.latest: Optional[T] = None
+		self.pending = False
+		self.waiters: List[asyncio.Future] = []
+		self.task: Optional[asyncio.Task] = None
+
+
+class CoalescingWriter(Generic[T]):
+	"""Latest-value-wins writer with at most one disk write in flight per key.
+
+	Values submitted while a write for the same key is running replace each
+	other, so a burst of saves turns into one extra write of the newest value.
+	Every submitter is resumed once a value at least as new as its own is on
+	disk.
+	"""
+
+	def __init__(self, io: BlockingIO, write: Callable[[str, T], None]) -> None:
+		self._io = io
+		self._write = write
+		self._slots: Dict[str, _Slot[T]] = {}
+
+	def latest(self, key: str) -> Optional[T]:
+		"""Newest value submitted for ``key`` that may not be on disk yet."""
+		slot = self._slots.get(key)
+		return slot.latest if slot is not None else None
+
+	async def submit(self, key: str, value: T) -> None:
+		loop = asyncio.get_running_loop()
+		slot = self._slots.get(key)
+		if slot is None:
+			slot = _Slot()
+			self._slots[key] = slot
+		slot.latest = value
+		slot.pending = True
+		waiter = loop.create_future()
+		slot.waiters.append(waiter)
+		if slot.task is None:
+			slot.task = loop.create_task(self._drain(key, slot))
+		# Shield so a cancelled request does not abort a shared write.
+		await asyncio.shield(waiter)
+
+	async def _drain(self, key: str, slot: _Slot[T]) -> None:
+		try:
+			while slot.pending:
+				value, waiters = slot.latest, slot.waiters
+				slot.pending = False
+				slot.waiters = []
+				try:
+					await self._io.run(self._write, key, value)
+				except Exception as e:
+					for waiter in waiters:
+						if not waiter.done():
+							waiter.set_exception(e)
+				else:
+					for waiter in waiters:
+						if not waiter.done():
+							waiter.set_result(None)
+		finally:
+			del self._slots[key]
+
+	async def flush(self) -> None:
+		"""Wait for every in-flight and pending write to finish."""
+		tasks = [slot.task for slot in self._slots.values() if slot.task is not None]
+		if tasks:
+			await asyncio.gather(*tasks, return_exceptions=True)
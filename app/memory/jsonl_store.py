@@ -0,0 +1,392 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import orjson
+
+from ..llm.base import ChatMessage
+from .io import BlockingIO, CoalescingWriter
+from .memory import MemoryStore, ensure_dir, read_state_file, write_state_file
+
+
+_HEADER = array("Q", [0]).itemsize
+
+
+class _SessionIndex:
+	"""Byte offsets of the live records in a session log.
+
+	``entries`` is a flat ``[offset, length, offset, length, ...]`` array and
+	``log_size`` is the size of the log the index was built against. Live
+	records are always contiguous at the end of the log: a rewrite appends a
+	truncate marker and then the new records.
+	"""
+
+	__slots__ = ("entries", "log_size")
+
+	def __init__(self, entries: Optional[array] = None, log_size: int = 0) -> None:
+		self.entries = entries if entries is not None else array("Q")
+		self.log_size = log_size
+
+	@property
+	def count(self) -> int:
+		return len(self.entries) // 2
+
+	@property
+	def dead_bytes(self) -> int:
+		return self.log_size - sum(self.entries[1::2])
+
+
+class _Session:
+	"""Per-session lock plus the index, once loaded. ``users`` counts the
+	threads holding or waiting for the lock; only idle entries are evicted."""
+
+	__slots__ = ("lock", "index", "users")
+
+	def __init__(self) -> None:
+		self.lock = threading.Lock()
+		self.index: Optional[_SessionIndex] = None
+		self.users = 0
+
+
+class JSONLMemoryStore(MemoryStore):
+	"""Append-only session store.
+
+	Each session is a ``<id>.jsonl`` log with one message per line plus a
+	``<id>.idx`` file holding the log size it covers followed by an
+	``(offset, length)`` pair per live message. Saving only appends the
+	messages that are not on disk yet, and the index lets callers read the
+	last N messages or a slice without parsing the whole log. Rewrites are
+	appended as truncate markers; the dead bytes they leave behind are
+	reclaimed by compaction on the I/O pool once they exceed
+	``compact_ratio`` of the log.
+
+	All file work runs on a bounded thread pool under a per-session lock, and
+	saves for one session are coalesced into a single append. Locks and
+	indexes are kept for the ``max_sessions`` most recently used sessions;
+	an evicted index is read back from its ``.idx`` file.
+
+	Legacy ``<id>.json`` files written by :class:`FileMemoryStore` are imported
+	the first time a session is touched (see also :func:`migrate_legacy_sessions`).
+	"""
+
+	def __init__(
+		self,
+		base_path: str,
+		compact_ratio: float = 0.5,
+		compact_min_bytes: int = 65536,
+		io: Optional[BlockingIO] = None,
+		max_sessions: int = 1024,
+	) -> None:
+		self.base_path = base_path
+		self.compact_ratio = compact_ratio
+		self.compact_min_bytes = compact_min_bytes
+		self.max_sessions = max_sessions
+		# session_id -> lock and index, LRU.
+		self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+		self._sessions_guard = threading.Lock()
+		self._io = io or BlockingIO()
+		self._writer: CoalescingWriter[List[ChatMessage]] = CoalescingWriter(
+			self._io, self._save
+		)
+
+	def _log_path(self, session_id: str) -> str:
+		return os.path.join(self.base_path, f"{session_id}.jsonl")
+
+	def _idx_path(self, session_id: str) -> str:
+		return os.path.join(self.base_path, f"{session_id}.idx")
+
+	def _state_path(self, session_id: str) -> str:
+		return os.path.join(self.base_path, f"{session_id}.state")
+
+	def _legacy_path(self, session_id: str) -> str:
+		return os.path.join(self.base_path, f"{session_id}.json")
+
+	async def load_history(self, session_id: str) -> List[ChatMessage]:
+		pending = self._writer.latest(session_id)
+		if pending is not None:
+			return list(pending)
+		return await self._io.run(self._load_slice, session_id, 0, None)
+
+	async def load_tail(self, session_id: str, n: int) -> List[ChatMessage]:
+		"""Return the last ``n`` messages of a session."""
+		pending = self._writer.latest(session_id)
+		if pending is not None:
+			return pending[max(len(pending) - n, 0) :]
+		return await self._io.run(self._load_slice, session_id, -n, None)
+
+	async def load_range(self, session_id: str, start: int, stop: int) -> List[ChatMessage]:
+		"""Return messages ``start:stop`` (non-negative indices) of a session."""
+		pending = self._writer.latest(session_id)
+		if pending is not None:
+			return pending[start:stop]
+		return await self._io.run(self._load_slice, session_id, start, stop)
+
+	async def count(self, session_id: str) -> int:
+		pending = self._writer.latest(session_id)
+		if pending is not None:
+			return len(pending)
+		return await self._io.run(self._count, session_id)
+
+	async def save_history(self, session_id: str, messages: List[ChatMessage]) -> None:
+		await self._writer.submit(session_id, list(messages))
+
+	async def load_state(self, session_id: str) -> Dict[str, Any]:
+		return await self._io.run(read_state_file, self._state_path(session_id))
+
+	async def save_state(self, session_id: str, state: Dict[str, Any]) -> None:
+		await self._io.run(write_state_file, self._state_path(session_id), dict(state))
+
+	async def compact(self, session_id: str) -> None:
+		"""Rewrite a session log so it contains only live records."""
+		await self._io.run(self._compact_locked, session_id)
+
+	async def aclose(self) -> None:
+		await self._writer.flush()
+		self._io.shutdown()
+
+	# Blocking operations, run on the I/O pool
+
+	@contextmanager
+	def _locked(self, session_id: str) -> Iterator[_Session]:
+		"""Hold the session's lock; yields its entry."""
+		with self._sessions_guard:
+			entry = self._sessions.get(session_id)
+			if entry is None:
+				entry = self._sessions[session_id] = _Session()
+			else:
+				self._sessions.move_to_end(session_id)
+			entry.users += 1
+		try:
+			with entry.lock:
+				yield entry
+		finally:
+			with self._sessions_guard:
+				entry.users -= 1
+				self._evict()
+
+	def _evict(self) -> None:
+		excess = len(self._sessions) - self.max_sessions
+		if excess <= 0:
+			return
+		idle = [sid for sid, entry in self._sessions.items() if entry.users == 0]
+		for session_id in idle[:excess]:
+			del self._sessions[session_id]
+
+	def _load_slice(
+		self, session_id: str, start: int, stop: Optional[int]
+	) -> List[ChatMessage]:
+		with self._locked(session_id) as entry:
+			index = self._index(session_id, entry)
+			count = index.count
+			if start < 0:
+				start = max(count + start, 0)
+			stop = count if stop is None else min(stop, count)
+			return self._read(session_id, index, min(start, count), stop)
+
+	def _count(self, session_id: str) -> int:
+		with self._locked(session_id) as entry:
+			return self._index(session_id, entry).count
+
+	def _save(self, session_id: str, messages: List[ChatMessage]) -> None:
+		ensure_dir(self.base_path)
+		with self._locked(session_id) as entry:
+			index = self._index(session_id, entry)
+			if len(messages) < index.count:
+				# History was rewritten rather than extended; start over after a marker.
+				self._append_marker(session_id, index)
+				self._append(session_id, index, messages)
+			elif len(messages) > index.count:
+				self._append(session_id, index, messages[index.count :])
+			dead = index.dead_bytes
+			if dead >= self.compact_min_bytes and dead >= self.compact_ratio * index.log_size:
+				self._compact(session_id, index)
+
+	def _compact_locked(self, session_id: str) -> None:
+		with self._locked(session_id) as entry:
+			self._compact(session_id, self._index(session_id, entry))
+
+	# Index maintenance
+
+	def _index(self, session_id: str, entry: _Session) -> _SessionIndex:
+		if entry.index is None:
+			entry.index = self._open_index(session_id)
+		return entry.index
+
+	def _open_index(self, session_id: str) -> _SessionIndex:
+		log_path = self._log_path(session_id)
+		if not os.path.exists(log_path):
+			if os.path.exists(self._idx_path(session_id)):
+				os.remove(self._idx_path(session_id))
+			index = _SessionIndex()
+			self._migrate_legacy(session_id, index)
+			return index
+		log_size = os.path.getsize(log_path)
+		try:
+			with open(self._idx_path(session_id), "rb") as f:
+				raw = f.read()
+			header = array("Q", raw[:_HEADER])
+			if header and header[0] == log_size and (len(raw) - _HEADER) % (2 * _HEADER) == 0:
+				entries = array("Q")
+				entries.frombytes(raw[_HEADER:])
+				return _SessionIndex(entries, log_size)
+		except (OSError, ValueError):
+			pass
+		# Missing or stale index (e.g. a crash between log and index writes).
+		index = self._scan_log(session_id)
+		self._write_index(session_id, index)
+		return index
+
+	def _scan_log(self, session_id: str) -> _SessionIndex:
+		log_path = self._log_path(session_id)
+		with open(log_path, "rb") as f:
+			data = f.read()
+		entries = array("Q")
+		pos = 0
+		while True:
+			end = data.find(b"\n", pos)
+			if end < 0:
+				break
+			try:
+				record = orjson.loads(data[pos:end])
+			except orjson.JSONDecodeError:
+				record = None
+			if isinstance(record, dict) and record.get("op") == "truncate":
+				del entries[2 * int(record.get("n", 0)) :]
+			elif isinstance(record, dict):
+				entries.extend((pos, end + 1 - pos))
+			pos = end + 1
+		if pos < len(data):
+			# Drop a torn trailing record left by an interrupted append.
+			with open(log_path, "r+b") as f:
+				f.truncate(pos)
+		return _SessionIndex(entries, pos)
+
+	def _write_index(self, session_id: str, index: _SessionIndex) -> None:
+		path = self._idx_path(session_id)
+		tmp = path + ".tmp"
+		with open(tmp, "wb") as f:
+			f.write(array("Q", [index.log_size]).tobytes())
+			f.write(index.entries.tobytes())
+		os.replace(tmp, path)
+
+	# Log writes
+
+	def _append(self, session_id: str, index: _SessionIndex, messages: List[ChatMessage]) -> None:
+		if not messages:
+			return
+		records = [orjson.dumps(m.to_dict()) + b"\n" for m in messages]
+		new_entries = array("Q")
+		offset = index.log_size
+		for record in records:
+			new_entries.extend((offset, len(record)))
+			offset += len(record)
+		with open(self._log_path(session_id), "ab") as f:
+			f.write(b"".join(records))
+		index.entries.extend(new_entries)
+		index.log_size = offset
+		idx_path = self._idx_path(session_id)
+		if not os.path.exists(idx_path):
+			self._write_index(session_id, index)
+			return
+		with open(idx_path, "r+b") as f:
+			f.seek(0, os.SEEK_END)
+			f.write(new_entries.tobytes())
+			f.seek(0)
+			f.write(array("Q", [index.log_size]).tobytes())
+
+	def _append_marker(self, session_id: str, index: _SessionIndex) -> None:
+		record = orjson.dumps({"op": "truncate", "n": 0}) + b"\n"
+		with open(self._log_path(session_id), "ab") as f:
+			f.write(record)
+		index.entries = array("Q")
+		index.log_size += len(record)
+		self._write_index(session_id, index)
+
+	def _read(
+		self, session_id: str, index: _SessionIndex, start: int, stop: int
+	) -> List[ChatMessage]:
+		if start >= stop:
+			return []
+		entries = index.entries
+		first = entries[2 * start]
+		last = entries[2 * (stop - 1)] + entries[2 * (stop - 1) + 1]
+		with open(self._log_path(session_id), "rb") as f:
+			f.seek(first)
+			data = f.read(last - first)
+		messages = []
+		for i in range(start, stop):
+			off = entries[2 * i] - first
+			messages.append(ChatMessage(**orjson.loads(data[off : off + entries[2 * i + 1]])))
+		return messages
+
+	# Compaction
+
+	def _compact(self, session_id: str, index: _SessionIndex) -> None:
+		if index.dead_bytes == 0:
+			return
+		log_path = self._log_path(session_id)
+		first = index.entries[0] if index.count else index.log_size
+		with open(log_path, "rb") as f:
+			f.seek(first)
+			live = f.read(index.log_size - first)
+		tmp = log_path + ".tmp"
+		with open(tmp, "wb") as f:
+			f.write(live)
+		entries = array("Q", index.entries)
+		for i in range(0, len(entries), 2):
+			entries[i] -= first
+		os.replace(tmp, log_path)
+		index.entries = entries
+		index.log_size = len(live)
+		self._write_index(session_id, index)
+
+	# Migration from FileMemoryStore
+
+	def _migrate_legacy(self, session_id: str, index: _SessionIndex) -> bool:
+		legacy = self._legacy_path(session_id)
+		if not os.path.exists(legacy):
+			return False
+		with open(legacy, "r", encoding="utf-8") as f:
+			data = json.load(f)
+		self._append(session_id, index, [ChatMessage(**m) for m in data])
+		os.replace(legacy, legacy + ".migrated")
+		return True
+
+
+def migrate_legacy_sessions(store: JSONLMemoryStore) -> int:
+	"""Import every legacy ``*.json`` session under ``store.base_path``.
+
+	Returns the number of migrated sessions. Originals are kept as
+	``*.json.migrated``.
+	"""
+	migrated = 0
+	if not os.path.isdir(store.base_path):
+		return 0
+	for entry in sorted(os.listdir(store.base_path)):
+		if not entry.endswith(".json"):
+			continue
+		session_id = entry[: -len(".json")]
+		if os.path.exists(store._log_path(session_id)):
+			continue
+		if store._migrate_legacy(session_id, _SessionIndex()):
+			migrated += 1
+	return migrated
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Migrate JSON session files to JSONL logs")
+	parser.add_argument("path", type=str, help="Memory directory, e.g. samurai_data/memory")
+	args = parser.parse_args()
+	count = migrate_legacy_sessions(JSONLMemoryStore(base_path=args.path))
+	print(f"migrated {count} session(s)")
+
+
+if __name__ == "__main__":
+	main()
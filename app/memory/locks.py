@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict
+
+
+class _SessionLock:
+	__slots__ = ("lock", "refs")
+
+	def __init__(self) -> None:
+		self.lock = asyncio.Lock()
+		self.refs = 0
+
+
+class SessionLocks:
+	"""Per-session asyncio locks, created on demand and dropped when idle.
+
+	Different sessions never contend. Wait time spent acquiring a lock is
+	recorded so contention between tabs of one session is visible.
+	"""
+
+	def __init__(self) -> None:
+		self._locks: Dict[str, _SessionLock] = {}
+		self.acquisitions = 0
+		self.contended = 0
+		self.wait_seconds_total = 0.0
+		self.wait_seconds_max = 0.0
+
+	@asynccontextmanager
+	async def hold(self, session_id: str) -> AsyncIterator[None]:
+		entry = self._locks.get(session_id)
+		if entry is None:
+			entry = self._locks[session_id] = _SessionLock()
+		entry.refs += 1
+		try:
+			if entry.lock.locked():
+				self.contended += 1
+			start = time.perf_counter()
+			await entry.lock.acquire()
+			waited = time.perf_counter() - start
+			self.acquisitions += 1
+			self.wait_seconds_total += waited
+			self.wait_seconds_max = max(self.wait_seconds_max, waited)
+			try:
+				yield
+			finally:
+				entry.lock.release()
+		finally:
+			entry.refs -= 1
+			if entry.refs == 0:
+				del self._locks[session_id]
+
+	def stats(self) -> Dict[str, Any]:
+		return {
+			"held": len(self._locks),
+			"acquisitions": self.acquisitions,
+			"contended": self.contended,
+			"wait_seconds_total": self.wait_seconds_total,
+			"wait_seconds_max": self.wait_seconds_max,
+		}
@@ -1,37 +1,180 @@
 from __future__ import annotations
 
-import json
 import os
-from typing import List
+import threading
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
 
+import orjson
+
+from ..config import Settings
 from ..llm.base import ChatMessage
+from .io import BlockingIO, CoalescingWriter
+from .locks import SessionLocks
 
 
 class MemoryStore:
+	_locks: Optional[SessionLocks] = None
+
+	@property
+	def locks(self) -> SessionLocks:
+		if self._locks is None:
+			self._locks = SessionLocks()
+		return self._locks
+
 	async def load_history(self, session_id: str) -> List[ChatMessage]:
 		raise NotImplementedError
 
 	async def save_history(self, session_id: str, messages: List[ChatMessage]) -> None:
 		raise NotImplementedError
 
+	async def append_history(self, session_id: str, messages: List[ChatMessage]) -> None:
+		"""Append ``messages`` to the stored history of a session.
+
+		The read-modify-write runs under the session's lock, so concurrent
+		turns of the same session are all kept instead of the last save
+		overwriting the others. Other sessions are not blocked.
+		"""
+		if not messages:
+			return
+		async with self.locks.hold(session_id):
+			history = await self.load_history(session_id)
+			history.extend(messages)
+			await self.save_history(session_id, history)
+
+	async def load_state(self, session_id: str) -> Dict[str, Any]:
+		"""Small per-session metadata stored next to the history (e.g. the
+		rolling summary). Stores without support return an empty dict."""
+		return {}
+
+	async def save_state(self, session_id: str, state: Dict[str, Any]) -> None:
+		return None
+
+	async def aclose(self) -> None:
+		"""Flush pending writes and release resources."""
+		return None
+
+	def stats(self) -> Dict[str, Any]:
+		return {"locks": self.locks.stats()}
+
 
 class FileMemoryStore(MemoryStore):
-	def __init__(self, base_path: str) -> None:
+	"""One JSON document per session, written atomically.
+
+	Disk I/O and (de)serialization run on a bounded thread pool, and saves for
+	the same session are coalesced so at most one write is in flight and a
+	burst of saves ends in a single write of the newest history.
+	"""
+
+	def __init__(self, base_path: str, io: Optional[BlockingIO] = None) -> None:
 		self.base_path = base_path
-		os.makedirs(self.base_path, exist_ok=True)
+		self._io = io or BlockingIO()
+		self._writer: CoalescingWriter[List[ChatMessage]] = CoalescingWriter(
+			self._io, self._write
+		)
 
 	def _path(self, session_id: str) -> str:
 		return os.path.join(self.base_path, f"{session_id}.json")
 
 	async def load_history(self, session_id: str) -> List[ChatMessage]:
+		pending = self._writer.latest(session_id)
+		if pending is not None:
+			return list(pending)
+		return await self._io.run(self._read, session_id)
+
+	async def save_history(self, session_id: str, messages: List[ChatMessage]) -> None:
+		await self._writer.submit(session_id, list(messages))
+
+	async def load_state(self, session_id: str) -> Dict[str, Any]:
+		return await self._io.run(read_state_file, self._state_path(session_id))
+
+	async def save_state(self, session_id: str, state: Dict[str, Any]) -> None:
+		await self._io.run(write_state_file, self._state_path(session_id), dict(state))
+
+	async def aclose(self) -> None:
+		await self._writer.flush()
+		self._io.shutdown()
+
+	def _state_path(self, session_id: str) -> str:
+		return os.path.join(self.base_path, f"{session_id}.state")
+
+	def _read(self, session_id: str) -> List[ChatMessage]:
 		path = self._path(session_id)
-		if not os.path.exists(path):
+		try:
+			with open(path, "rb") as f:
+				data = orjson.loads(f.read())
+		except FileNotFoundError:
 			return []
-		with open(path, "r", encoding="utf-8") as f:
-			data = json.load(f)
 		return [ChatMessage(**m) for m in data]
 
-	async def save_history(self, session_id: str, messages: List[ChatMessage]) -> None:
+	def _write(self, session_id: str, messages: List[ChatMessage]) -> None:
+		ensure_dir(self.base_path)
 		path = self._path(session_id)
-		with open(path, "w", encoding="utf-8") as f:
-			json.dump([m.__dict__ for m in messages], f, ensure_ascii=False, indent=2)
+		tmp = f"{path}.{threading.get_ident()}.tmp"
+		with open(tmp, "wb") as f:
+			f.write(orjson.dumps(messages, option=orjson.OPT_INDENT_2))
+		os.replace(tmp, path)
+
+
+@lru_cache(maxsize=None)
+def ensure_dir(path: str) -> None:
+	"""Create ``path`` once per process. Stores call this before their first
+	write rather than at construction, so starting the app touches no disk."""
+	os.makedirs(path, exist_ok=True)
+
+
+def read_state_file(path: str) -> Dict[str, Any]:
+	try:
+		with open(path, "rb") as f:
+			return orjson.loads(f.read())
+	except FileNotFoundError:
+		return {}
+
+
+def write_state_file(path: str, state: Dict[str, Any]) -> None:
+	ensure_dir(os.path.dirname(path) or ".")
+	tmp = f"{path}.{threading.get_ident()}.tmp"
+	with open(tmp, "wb") as f:
+		f.write(orjson.dumps(state))
+	os.replace(tmp, path)
+
+
+def create_memory_store(settings: Settings) -> MemoryStore:
+	"""Build the memory backend selected by ``SAMURAI_MEMORY_BACKEND``.
+
+	The backend is wrapped in a :class:`CachedMemoryStore` unless
+	``SAMURAI_MEMORY_CACHE`` is disabled. The SQLite backend is never wrapped:
+	it is shared by worker processes, and a per-process cache would go stale.
+	"""
+	store = _create_backend(settings)
+	if not settings.memory_cache or settings.memory_backend == "sqlite":
+		return store
+	from .cache import CachedMemoryStore
+
+	return CachedMemoryStore(
+		store,
+		max_messages=settings.memory_cache_max_messages,
+		max_bytes=settings.memory_cache_max_bytes,
+		flush_interval=settings.memory_flush_interval,
+	)
+
+
+def _create_backend(settings: Settings) -> MemoryStore:
+	io = BlockingIO(max_workers=settings.memory_io_workers)
+	if settings.memory_backend == "sqlite":
+		from .sqlite_store import SQLiteMemoryStore
+
+		return SQLiteMemoryStore(
+			path=settings.memory_sqlite_path or os.path.join(settings.memory_path, "memory.sqlite3"),
+			io=io,
+		)
+	if settings.memory_backend == "jsonl":
+		from .jsonl_store import JSONLMemoryStore
+
+		return JSONLMemoryStore(
+			base_path=settings.memory_path,
+			compact_ratio=settings.memory_compact_ratio,
+			compact_min_bytes=settings.memory_compact_min_bytes,
+			io=io,
+		)
+	return FileMemoryStore(base_path=settings.memory_path, io=io)
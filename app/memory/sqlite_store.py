@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+
+from ..llm.base import ChatMessage
+from .io import BlockingIO
+from .memory import MemoryStore
+
+
+_SCHEMA = (
+	"CREATE TABLE IF NOT EXISTS messages ("
+	"session_id TEXT NOT NULL, seq INTEGER NOT NULL, role TEXT NOT NULL, "
+	"content TEXT NOT NULL, name TEXT, PRIMARY KEY (session_id, seq)) WITHOUT ROWID",
+	"CREATE TABLE IF NOT EXISTS state (session_id TEXT PRIMARY KEY, value BLOB NOT NULL)",
+)
+
+# Write operations: (kind, session_id, payload)
+_Op = Tuple[str, str, Any]
+
+
+class SQLiteMemoryStore(MemoryStore):
+	"""Session store in one SQLite database, safe to share between worker
+	processes (``uvicorn --workers N``).
+
+	Messages are rows keyed by ``(session_id, seq)``, so loading the last N
+	messages or a range is an index range scan. The database runs in WAL mode:
+	reads go through per-thread connections on the I/O pool and never block
+	on writers. Writes run on one dedicated thread; all operations submitted
+	while a transaction is in progress are committed together in the next
+	one. Each transaction takes SQLite's write lock up front
+	(``BEGIN IMMEDIATE``), so appends from several processes are serialized
+	and none is lost.
+
+	:meth:`append_history` is a single ``INSERT`` transaction, no
+	load-modify-save. :meth:`save_history` appends the messages beyond the
+	stored count, and rewrites the session only when given fewer messages.
+	"""
+
+	def __init__(self, path: str, io: Optional[BlockingIO] = None, busy_timeout: float = 10.0) -> None:
+		self.path = path
+		self.busy_timeout = busy_timeout
+		self._io = io or BlockingIO()
+		self._write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="samurai-sqlite")
+		self._local = threading.local()
+		self._connections: List[sqlite3.Connection] = []
+		self._connections_guard = threading.Lock()
+		self._pending: List[Tuple[_Op, asyncio.Future]] = []
+		self._flushing: Optional[asyncio.Task] = None
+		self.transactions = 0
+		self.operations = 0
+		# The database is created by the first query, not at construction.
+		self._ready = False
+
+	def _connect(self) -> sqlite3.Connection:
+		conn = getattr(self._local, "conn", None)
+		if conn is None:
+			if not self._ready:
+				os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+			conn = sqlite3.connect(
+				self.path,
+				timeout=self.busy_timeout,
+				isolation_level=None,
+				check_same_thread=False,
+			)
+			conn.execute("PRAGMA journal_mode=WAL")
+			conn.execute("PRAGMA synchronous=NORMAL")
+			self._local.conn = conn
+			with self._connections_guard:
+				self._connections.append(conn)
+				if not self._ready:
+					for statement in _SCHEMA:
+						conn.execute(statement)
+					self._ready = True
+		return conn
+
+	async def load_history(self, session_id: str) -> List[ChatMessage]:
+		return await self._io.run(self._select, session_id, 0, None)
+
+	async def load_tail(self, session_id: str, n: int) -> List[ChatMessage]:
+		"""Return the last ``n`` messages of a session."""
+		return await self._io.run(self._select_tail, session_id, n)
+
+	async def load_range(self, session_id: str, start: int, stop: int) -> List[ChatMessage]:
+		"""Return messages ``start:stop`` (non-negative indices) of a session."""
+		return await self._io.run(self._select, session_id, start, stop)
+
+	async def count(self, session_id: str) -> int:
+		return await self._io.run(self._count, session_id)
+
+	async def append_history(self, session_id: str, messages: List[ChatMessage]) -> None:
+		if messages:
+			await self._submit(("append", session_id, list(messages)))
+
+	async def save_history(self, session_id: str, messages: List[ChatMessage]) -> None:
+		await self._submit(("save", session_id, list(messages)))
+
+	async def load_state(self, session_id: str) -> Dict[str, Any]:
+		return await self._io.run(self._select_state, session_id)
+
+	async def save_state(self, session_id: str, state: Dict[str, Any]) -> None:
+		await self._submit(("state", session_id, orjson.dumps(state)))
+
+	async def aclose(self) -> None:
+		if self._flushing is not None:
+			await self._flushing
+		self._write_executor.shutdown(wait=True)
+		self._io.shutdown()
+		with self._connections_guard:
+			for conn in self._connections:
+				conn.close()
+			self._connections.clear()
+
+	def stats(self) -> Dict[str, Any]:
+		stats = super().stats()
+		stats["sqlite"] = {"transactions": self.transactions, "operations": self.operations}
+		return stats
+
+	async def _submit(self, op: _Op) -> None:
+		future = asyncio.get_running_loop().create_future()
+		self._pending.append((op, future))
+		if self._flushing is None:
+			self._flushing = asyncio.ensure_future(self._flush())
+		# The write goes ahead even if the caller is cancelled.
+		await asyncio.shield(future)
+
+	async def _flush(self) -> None:
+		loop = asyncio.get_running_loop()
+		try:
+			while self._pending:
+				batch, self._pending = self._pending, []
+				try:
+					await loop.run_in_executor(
+						self._write_executor, self._write, [op for op, _ in batch]
+					)
+				except Exception as e:
+					for _, future in batch:
+						if not future.done():
+							future.set_exception(e)
+				else:
+					for _, future in batch:
+						if not future.done():
+							future.set_result(None)
+		finally:
+			self._flushing = None
+
+	# Blocking operations
+
+	def _write(self, ops: List[_Op]) -> None:
+		conn = self._connect()
+		conn.execute("BEGIN IMMEDIATE")
+		try:
+			for kind, session_id, payload in ops:
+				if kind == "append":
+					self._insert(conn, session_id, self._next_seq(conn, session_id), payload)
+				elif kind == "save":
+					stored = self._next_seq(conn, session_id)
+					if len(payload) >= stored:
+						self._insert(conn, session_id, stored, payload[stored:])
+					else:
+						conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+						self._insert(conn, session_id, 0, payload)
+				else:
+					conn.execute(
+						"INSERT OR REPLACE INTO state (session_id, value) VALUES (?, ?)",
+						(session_id, payload),
+					)
+			conn.execute("COMMIT")
+		except BaseException:
+			conn.execute("ROLLBACK")
+			raise
+		self.transactions += 1
+		self.operations += len(ops)
+
+	@staticmethod
+	def _next_seq(conn: sqlite3.Connection, session_id: str) -> int:
+		row = conn.execute(
+			"SELECT MAX(seq) FROM messages WHERE session_id = ?", (session_id,)
+		).fetchone()
+		return 0 if row[0] is None else row[0] + 1
+
+	@staticmethod
+	def _insert(
+		conn: sqlite3.Connection, session_id: str, first_seq: int, messages: List[ChatMessage]
+	) -> None:
+		conn.executemany(
+			"INSERT INTO messages (session_id, seq, role, content, name) VALUES (?, ?, ?, ?, ?)",
+			[
+				(session_id, first_seq + i, m.role, m.content, m.name)
+				for i, m in enumerate(messages)
+			],
+		)
+
+	def _select(self, session_id: str, start: int, stop: Optional[int]) -> List[ChatMessage]:
+		rows = self._connect().execute(
+			"SELECT role, content, name FROM messages WHERE session_id = ? "
+			"ORDER BY seq LIMIT ? OFFSET ?",
+			(session_id, -1 if stop is None else max(stop - start, 0), start),
+		)
+		return [ChatMessage(role=role, content=content, name=name) for role, content, name in rows]
+
+	def _select_tail(self, session_id: str, n: int) -> List[ChatMessage]:
+		rows = self._connect().execute(
+			"SELECT role, content, name FROM messages WHERE session_id = ? "
+			"ORDER BY seq DESC LIMIT ?",
+			(session_id, max(n, 0)),
+		).fetchall()
+		return [ChatMessage(role=role, content=content, name=name) for role, content, name in reversed(rows)]
+
+	def _count(self, session_id: str) -> int:
+		return self._connect().execute(
+			"SELECT COUNT(*) FROM messages WHERE session_id = ?", (session_id,)
+		).fetchone()[0]
+
+	def _select_state(self, session_id: str) -> Dict[str, Any]:
+		row = self._connect().execute(
+			"SELECT value FROM state WHERE session_id = ?", (session_id,)
+		).fetchone()
+		return orjson.loads(row[0]) if row else {}
@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import os
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Seconds; covers fast cache hits up to slow local models.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry: List["_Metric"] = []
+
+
+class _Metric:
+	kind = ""
+
+	def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> None:
+		self.name = name
+		self.help = help
+		self.labelnames = labelnames
+		_registry.append(self)
+
+	def _labels(self, values: Tuple[Any, ...]) -> str:
+		if not values:
+			return ""
+		pairs = ",".join(
+			f'{name}="{_escape(str(value))}"' for name, value in zip(self.labelnames, values)
+		)
+		return "{" + pairs + "}"
+
+	def render(self) -> List[str]:
+		return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+	kind = "counter"
+
+	def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> None:
+		super().__init__(name, help, labelnames)
+		self._values: Dict[Tuple[Any, ...], float] = {}
+
+	def inc(self, *labels: Any, amount: float = 1.0) -> None:
+		self._values[labels] = self._values.get(labels, 0.0) + amount
+
+	def value(self, *labels: Any) -> float:
+		return self._values.get(labels, 0.0)
+
+	def render(self) -> List[str]:
+		lines = super().render()
+		for labels, value in self._values.items():
+			lines.append(f"{self.name}{self._labels(labels)} {_number(value)}")
+		return lines
+
+
+class Histogram(_Metric):
+	"""Fixed-bucket histogram. ``observe`` is one bisect and two additions;
+	bucket counts are made cumulative only when rendered."""
+
+	kind = "histogram"
+
+	def __init__(
+		self,
+		name: str,
+		help: str,
+		labelnames: Tuple[str, ...] = (),
+		buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+	) -> None:
+		super().__init__(name, help, labelnames)
+		self.buckets = buckets
+		# labels -> [per-bucket counts (+Inf last), sum]
+		self._series: Dict[Tuple[Any, ...], List[Any]] = {}
+
+	def observe(self, value: float, *labels: Any) -> None:
+		series = self._series.get(labels)
+		if series is None:
+			series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+		series[0][bisect_left(self.buckets, value)] += 1
+		series[1] += value
+
+	def time(self, *labels: Any) -> "_Timer":
+		"""``with histogram.time(label): ...`` observes the block's duration."""
+		return _Timer(self, labels)
+
+	def count(self, *labels: Any) -> int:
+		series = self._series.get(labels)
+		return sum(series[0]) if series else 0
+
+	def render(self) -> List[str]:
+		lines = super().render()
+		for labels, (counts, total) in self._series.items():
+			cumulative = 0
+			for bound, n in zip(self.buckets + (float("inf"),), counts):
+				cumulative += n
+				le = "+Inf" if bound == float("inf") else _number(bound)
+				bucket_labels = self._labels(labels)[:-1] + "," if labels else "{"
+				lines.append(f'{self.name}_bucket{bucket_labels}le="{le}"}} {cumulative}')
+			lines.append(f"{self.name}_sum{self._labels(labels)} {_number(total)}")
+			lines.append(f"{self.name}_count{self._labels(labels)} {cumulative}")
+		return lines
+
+
+class _Timer:
+	__slots__ = ("histogram", "labels", "start")
+
+	def __init__(self, histogram: Histogram, labels: Tuple[Any, ...]) -> None:
+		self.histogram = histogram
+		self.labels = labels
+		self.start = 0.0
+
+	def __enter__(self) -> "_Timer":
+		self.start = time.perf_counter()
+		return self
+
+	def __exit__(self, *exc: Any) -> None:
+		self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+def render() -> str:
+	"""All metrics in the Prometheus text exposition format."""
+	lines: List[str] = []
+	for metric in _registry:
+		lines.extend(metric.render())
+	rss = resident_memory_bytes()
+	if rss is not None:
+		lines.append("# HELP process_resident_memory_bytes Resident memory size in bytes.")
+		lines.append("# TYPE process_resident_memory_bytes gauge")
+		lines.append(f"process_resident_memory_bytes {rss}")
+	return "\n".join(lines) + "\n"
+
+
+def resident_memory_bytes() -> Optional[int]:
+	"""Current RSS of this process (Linux only)."""
+	try:
+		with open("/proc/self/statm", "rb") as f:
+			pages = int(f.read().split()[1])
+	except (OSError, IndexError, ValueError):
+		return None
+	return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def _escape(value: str) -> str:
+	return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+	return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class MetricsMiddleware:
+	"""ASGI middleware timing every ``/api`` request until its response body
+	(including a stream) has been sent. Requests are labelled by route
+	template, not by raw path."""
+
+	def __init__(self, app: Any) -> None:
+		self.app = app
+
+	async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+		path: Optional[str] = scope.get("path") if scope["type"] == "http" else None
+		if path is None or not path.startswith("/api/"):
+			await self.app(scope, receive, send)
+			return
+		status = [500]
+
+		async def send_wrapper(message: Dict[str, Any]) -> None:
+			if message["type"] == "http.response.start":
+				status[0] = message["status"]
+			await send(message)
+
+		start = time.perf_counter()
+		try:
+			await self.app(scope, receive, send_wrapper)
+		finally:
+			HTTP_SECONDS.observe(time.perf_counter() - start, scope["method"], _route_label(scope), status[0])
+
+
+def _route_label(scope: Dict[str, Any]) -> str:
+	"""The matched route template (``/api/chat/stream/{session_id}/{turn_id}``)
+	set by the router, so label values stay bounded whatever clients request."""
+	route = scope.get("route")
+	return getattr(route, "path", None) or "<unmatched>"
+
+
+HTTP_SECONDS = Histogram(
+	"samurai_http_request_duration_seconds",
+	"HTTP request latency, until the last body byte is sent.",
+	("method", "path", "status"),
+)
+LLM_SECONDS = Histogram(
+	"samurai_llm_request_duration_seconds",
+	"Provider latency; for streams, the time until the response starts.",
+	("provider",),
+)
+LLM_TTFT_SECONDS = Histogram(
+	"samurai_llm_time_to_first_token_seconds",
+	"Time from sending a streaming request to its first chunk.",
+	("provider",),
+)
+LLM_REQUESTS = Counter(
+	"samurai_llm_requests_total",
+	"Provider calls by outcome (success, error, rate_limited, cached).",
+	("provider", "outcome"),
+)
+LLM_FALLBACKS = Counter(
+	"samurai_llm_fallbacks_total",
+	"Replies served by a provider after higher-priority providers failed.",
+	("provider",),
+)
+LLM_TOKENS = Counter(
+	"samurai_llm_tokens_total",
+	"Token usage reported by providers.",
+	("provider", "kind"),
+)
+TOOL_SECONDS = Histogram(
+	"samurai_tool_duration_seconds",
+	"Tool invocation latency.",
+	("tool",),
+)
+TOOL_ERRORS = Counter(
+	"samurai_tool_errors_total",
+	"Tool invocations that raised or timed out.",
+	("tool",),
+)
+MEMORY_SECONDS = Histogram(
+	"samurai_memory_operation_duration_seconds",
+	"Memory store latency per operation (load, append, load_state, save_state).",
+	("operation",),
+	buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+OLLAMA_LOAD_SECONDS = Histogram(
+	"samurai_ollama_model_load_seconds",
+	"Ollama model load time reported by the server (load_duration).",
+	("model",),
+	buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0),
+)
+SCHEMA_VALIDATOR_CACHE = Counter(
+	"samurai_schema_validator_cache_total",
+	"Compiled JSON Schema validator lookups (hit, miss).",
+	("result",),
+)
+SCHEMA_REPAIRS = Counter(
+	"samurai_schema_repairs_total",
+	"Structured-output repair attempts (fixed, failed).",
+	("result",),
+)
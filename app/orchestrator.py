@@ -2,12 +2,21 @@ from __future__ import annotations
 
 import asyncio
 import json
-from typing import Any, AsyncGenerator, Dict, List, Optional
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
 
+from . import metrics
+from .context import ContextBuilder
 from .llm import LLMManager, ChatMessage
-from .tools.registry import ToolRegistry
+from .llm.base import LLMResponse, LLMStream
+from .tools.registry import ToolRegistry, ToolResult
 from .memory.memory import MemoryStore
-from .utils.structured import validate_json_string
+from .utils.structured import JSONPrefixChecker, validate_json_string
+
+
+DEFAULT_EXPERTS = [
+	"You are Expert A. Propose a detailed solution with pros.",
+	"You are Expert B. Critique and find risks and alternatives.",
+]
 
 
 class ChatOrchestrator:
@@ -18,36 +27,61 @@ class ChatOrchestrator:
 		llm_manager: LLMManager,
 		tool_registry: ToolRegistry,
 		memory_store: MemoryStore,
+		context_builder: Optional[ContextBuilder] = None,
 	) -> None:
 		self.llm_manager = llm_manager
 		self.tool_registry = tool_registry
 		self.memory_store = memory_store
+		self.context_builder = context_builder or ContextBuilder(
+			llm_manager, memory_store, llm_manager.settings
+		)
 
 	async def chat(self, session_id: str, message: str, options: Dict[str, Any]) -> Dict[str, Any]:
-		messages: List[ChatMessage] = await self.memory_store.load_history(session_id)
+		with metrics.MEMORY_SECONDS.time("load"):
+			messages: List[ChatMessage] = await self.memory_store.load_history(session_id)
+		history_len = len(messages)
 		messages.append(ChatMessage(role="user", content=message))
 
-		use_tool = options.get("tool")
 		debate = bool(options.get("debate"))
 		model_hint = options.get("model")
 		structured_schema = options.get("schema")
 
-		if use_tool:
-			tool = self.tool_registry.get_tool(use_tool)
-			if tool is None:
-				return {"error": f"unknown tool: {use_tool}"}
-			tool_result = await tool.invoke(message=message, session_id=session_id)
-			messages.append(ChatMessage(role="tool", content=json.dumps(tool_result)))
+		calls, tool_error = self._tool_calls(options, message)
+		if tool_error:
+			return {"error": tool_error}
+		if calls:
+			for result in await self.tool_registry.invoke_many(calls, session_id):
+				messages.append(_tool_message(result))
 
+		llm_options = _llm_options(options, session_id)
+		prompt = await self.context_builder.build(session_id, messages, model_hint, options)
 		if debate:
-			assistant_reply = await self._debate(messages, model_hint)
+			resp = await self._debate(
+				prompt, model_hint, _expert_personas(options), llm_options
+			)
 		else:
-			resp = await self.llm_manager.complete(messages, model_hint=model_hint, stream=False)
-			assistant_reply = resp.text if hasattr(resp, "text") else str(resp)
+			resp = await self.llm_manager.complete(
+				prompt, model_hint=model_hint, stream=False, **llm_options
+			)
+		assistant_reply = resp.text if hasattr(resp, "text") else str(resp)
 
-		# Optional structured validation
+		# Optional structured validation, re-asking the model with the errors
+		repairs = 0
 		if structured_schema:
-			ok, err = validate_json_string(assistant_reply, structured_schema)
+			first_error = bool(options.get("schema_first_error"))
+			retries = self._schema_retries(options)
+			ok, err = validate_json_string(assistant_reply, structured_schema, first_error)
+			while not ok and repairs < retries:
+				repairs += 1
+				resp = await self.llm_manager.complete(
+					_repair_messages(prompt, assistant_reply, err),
+					model_hint=model_hint,
+					stream=False,
+					**llm_options,
+				)
+				assistant_reply = resp.text if hasattr(resp, "text") else str(resp)
+				ok, err = validate_json_string(assistant_reply, structured_schema, first_error)
+				metrics.SCHEMA_REPAIRS.inc("fixed" if ok else "failed")
 			if not ok:
 				assistant_reply = (
 					"The output did not match the requested schema. Errors:\n"
@@ -55,64 +89,258 @@ class ChatOrchestrator:
 				)
 
 		messages.append(ChatMessage(role="assistant", content=assistant_reply))
-		await self.memory_store.save_history(session_id, messages)
-		return {"reply": assistant_reply}
+		with metrics.MEMORY_SECONDS.time("append"):
+			await self.memory_store.append_history(session_id, messages[history_len:])
+		return {
+			"reply": assistant_reply,
+			"provider": getattr(resp, "provider", None),
+			"fallback_reason": getattr(resp, "fallback_reason", None),
+			"cached": getattr(resp, "cached", False),
+			"schema_repairs": repairs,
+		}
 
 	async def stream_chat(
 		self, session_id: str, message: str, options: Dict[str, Any]
-	) -> AsyncGenerator[str, None]:
-		messages: List[ChatMessage] = await self.memory_store.load_history(session_id)
+	) -> AsyncGenerator[str | Dict[str, Any], None]:
+		"""Stream the assistant reply.
+
+		Yields text chunks, interleaved with event dicts (each with an
+		``event`` key) for debate progress and structured-output validation.
+		"""
+		with metrics.MEMORY_SECONDS.time("load"):
+			messages: List[ChatMessage] = await self.memory_store.load_history(session_id)
+		history_len = len(messages)
 		messages.append(ChatMessage(role="user", content=message))
 
-		use_tool = options.get("tool")
+		debate = bool(options.get("debate"))
 		model_hint = options.get("model")
+		structured_schema = options.get("schema")
 
-		if use_tool:
-			tool = self.tool_registry.get_tool(use_tool)
-			if tool is None:
-				yield "[tool-error] unknown tool"
-			else:
-				tool_result = await tool.invoke(message=message, session_id=session_id)
-				messages.append(ChatMessage(role="tool", content=json.dumps(tool_result)))
+		calls, tool_error = self._tool_calls(options, message)
+		if tool_error:
+			yield f"[tool-error] {tool_error}"
+		elif calls:
+			for result in await self.tool_registry.invoke_many(calls, session_id):
+				messages.append(_tool_message(result))
+				yield {
+					"event": "tool",
+					"name": result.name,
+					"ok": result.ok,
+					"elapsed_ms": round(result.elapsed * 1000, 1),
+				}
+
+		llm_options = _llm_options(options, session_id)
+		prompt = await self.context_builder.build(session_id, messages, model_hint, options)
+		if debate:
+			experts = _expert_personas(options)
+			replies = [""] * len(experts)
+			yield {"event": "debate", "phase": "experts", "total": len(experts)}
+			done = 0
+			async for index, reply in self._iter_experts(
+				prompt, model_hint, experts, llm_options
+			):
+				replies[index] = reply
+				done += 1
+				yield {"event": "expert", "index": index, "done": done, "total": len(experts)}
+			yield {"event": "debate", "phase": "synthesis"}
+			prompt = self._synthesis_messages(prompt, replies)
 
-		stream_resp = await self.llm_manager.complete(messages, model_hint=model_hint, stream=True)
-		assistant_text = ""
-		async for chunk in stream_resp:  # type: ignore
-			assistant_text += chunk
-			yield chunk
+		first_error = bool(options.get("schema_first_error"))
+		retries = self._schema_retries(options) if structured_schema else 0
+		attempt_prompt = prompt
+		repairs = 0
+		while True:
+			checker = JSONPrefixChecker() if structured_schema else None
+			stream_resp = await self.llm_manager.complete(
+				attempt_prompt, model_hint=model_hint, stream=True, **llm_options
+			)
+			parts: List[str] = []
+			try:
+				if isinstance(stream_resp, LLMStream):
+					yield {
+						"event": "provider",
+						"provider": stream_resp.provider,
+						"model": stream_resp.model,
+						"fallback_reason": stream_resp.fallback_reason,
+						"cached": stream_resp.cached,
+					}
+				async for chunk in stream_resp:  # type: ignore
+					parts.append(chunk)
+					yield chunk
+					if checker is not None and checker.error is None and checker.feed(chunk):
+						yield {"event": "schema", "ok": False, "error": checker.error}
+			except BaseException:
+				# Cancelled, closed or failed mid-answer: keep what was generated
+				# so a retry does not have to pay for it again.
+				if parts:
+					messages.append(ChatMessage(role="assistant", content="".join(parts)))
+					with metrics.MEMORY_SECONDS.time("append"):
+						await asyncio.shield(
+							self.memory_store.append_history(session_id, messages[history_len:])
+						)
+				raise
+			finally:
+				# Frees the provider's gate slot even if the stream was never read.
+				if isinstance(stream_resp, LLMStream):
+					await stream_resp.aclose()
+			assistant_text = "".join(parts)
+
+			if not structured_schema:
+				break
+			ok, err = validate_json_string(assistant_text, structured_schema, first_error)
+			if repairs:
+				metrics.SCHEMA_REPAIRS.inc("fixed" if ok else "failed")
+			yield {"event": "validation", "ok": ok, "errors": err}
+			if ok or repairs >= retries:
+				break
+			# The text streamed so far is replaced by the next attempt.
+			repairs += 1
+			yield {"event": "repair", "attempt": repairs, "max": retries}
+			attempt_prompt = _repair_messages(prompt, assistant_text, err)
 
 		messages.append(ChatMessage(role="assistant", content=assistant_text))
-		await self.memory_store.save_history(session_id, messages)
+		with metrics.MEMORY_SECONDS.time("append"):
+			await self.memory_store.append_history(session_id, messages[history_len:])
 
-	async def _debate(self, messages: List[ChatMessage], model_hint: Optional[str]) -> str:
-		"""Simple two-expert debate followed by synthesis."""
-		pro_messages = messages + [
-			ChatMessage(
-				role="system",
-				content=(
-					"You are Expert A. Propose a detailed solution with pros."
-				),
-			)
-		]
-		con_messages = messages + [
-			ChatMessage(
-				role="system",
-				content=(
-					"You are Expert B. Critique and find risks and alternatives."
-				),
+	async def _debate(
+		self,
+		messages: List[ChatMessage],
+		model_hint: Optional[str],
+		experts: Optional[List[str]] = None,
+		llm_options: Optional[Dict[str, Any]] = None,
+	) -> LLMResponse:
+		"""Expert debate followed by synthesis.
+
+		All experts are queried concurrently, so a debate costs one parallel
+		round plus the synthesis call regardless of the number of experts.
+		"""
+		llm_options = llm_options or {}
+		replies = await self._run_experts(
+			messages, model_hint, experts or DEFAULT_EXPERTS, llm_options
+		)
+		return await self.llm_manager.complete(  # type: ignore[return-value]
+			self._synthesis_messages(messages, replies), model_hint=model_hint, **llm_options
+		)
+
+	async def _run_experts(
+		self,
+		messages: List[ChatMessage],
+		model_hint: Optional[str],
+		experts: List[str],
+		llm_options: Dict[str, Any],
+	) -> List[str]:
+		replies = [""] * len(experts)
+		async for index, reply in self._iter_experts(messages, model_hint, experts, llm_options):
+			replies[index] = reply
+		return replies
+
+	async def _iter_experts(
+		self,
+		messages: List[ChatMessage],
+		model_hint: Optional[str],
+		experts: List[str],
+		llm_options: Dict[str, Any],
+	) -> AsyncGenerator[Tuple[int, str], None]:
+		"""Ask every expert persona in parallel and yield ``(index, reply)`` as
+		each finishes. If one fails (or the consumer stops), the rest are
+		cancelled. The persona follows the shared conversation, so every
+		expert call reuses the provider's cached prefix of the turn."""
+
+		async def ask(persona: str) -> str:
+			resp = await self.llm_manager.complete(
+				messages + [ChatMessage(role="system", content=persona)],
+				model_hint=model_hint,
+				**llm_options,
 			)
-		]
-		resp_a = await self.llm_manager.complete(pro_messages, model_hint=model_hint)
-		resp_b = await self.llm_manager.complete(con_messages, model_hint=model_hint)
-		synthesis_messages = messages + [
+			return getattr(resp, "text", str(resp))
+
+		tasks = {asyncio.ensure_future(ask(persona)): i for i, persona in enumerate(experts)}
+		pending = set(tasks)
+		try:
+			while pending:
+				done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+				for task in done:
+					yield tasks[task], task.result()
+		finally:
+			for task in tasks:
+				if not task.done():
+					task.cancel()
+
+	def _schema_retries(self, options: Dict[str, Any]) -> int:
+		retries = options.get("schema_retries")
+		if isinstance(retries, int) and not isinstance(retries, bool):
+			return max(0, min(retries, 5))
+		return self.llm_manager.settings.schema_repair_retries
+
+	def _tool_calls(self, options: Dict[str, Any], message: str) -> Tuple[List[Tuple[str, str]], Optional[str]]:
+		"""``(tool name, input)`` pairs from ``options.tool``: a tool name, or a
+		list of names and ``{"name": ..., "input": ...}`` objects (the input
+		defaults to the user message; non-string inputs are sent as JSON).
+		Returns an error message instead for unknown tools or too many calls."""
+		spec = options.get("tool")
+		if not spec:
+			return [], None
+		calls: List[Tuple[str, str]] = []
+		for item in spec if isinstance(spec, list) else [spec]:
+			if isinstance(item, dict):
+				name = str(item.get("name") or "")
+				value = item.get("input", message)
+				calls.append((name, value if isinstance(value, str) else json.dumps(value)))
+			else:
+				calls.append((str(item), message))
+		max_calls = self.llm_manager.settings.tool_max_calls
+		if max_calls > 0 and len(calls) > max_calls:
+			return [], f"too many tool calls: {len(calls)} > {max_calls}"
+		unknown = [name for name, _ in calls if self.tool_registry.get_tool(name) is None]
+		if unknown:
+			return [], f"unknown tool: {', '.join(unknown)}"
+		return calls, None
+
+	@staticmethod
+	def _synthesis_messages(messages: List[ChatMessage], replies: List[str]) -> List[ChatMessage]:
+		return messages + [
 			ChatMessage(
 				role="system",
 				content=(
-					"Synthesize the best plan combining A and B, be concise and actionable."
+					"Synthesize the best plan combining the experts' answers, "
+					"be concise and actionable."
 				),
 			),
-			ChatMessage(role="assistant", content=getattr(resp_a, "text", str(resp_a))),
-			ChatMessage(role="assistant", content=getattr(resp_b, "text", str(resp_b))),
-		]
-		resp_s = await self.llm_manager.complete(synthesis_messages, model_hint=model_hint)
-		return getattr(resp_s, "text", str(resp_s))
+		] + [ChatMessage(role="assistant", content=reply) for reply in replies]
+
+
+def _tool_message(result: ToolResult) -> ChatMessage:
+	return ChatMessage(role="tool", content=f'{{"tool":{json.dumps(result.name)},"output":{result.content}}}')
+
+
+def _repair_messages(prompt: List[ChatMessage], reply: str, errors: str) -> List[ChatMessage]:
+	"""``prompt`` plus the invalid reply and a request to correct it."""
+	return prompt + [
+		ChatMessage(role="assistant", content=reply),
+		ChatMessage(
+			role="user",
+			content=(
+				"Your reply did not match the required JSON Schema. Errors:\n"
+				f"{errors}\n"
+				"Reply again with only the corrected JSON document."
+			),
+		),
+	]
+
+
+def _llm_options(options: Dict[str, Any], session_id: str) -> Dict[str, Any]:
+	"""Request options that are forwarded to :meth:`LLMManager.complete`."""
+	llm_options: Dict[str, Any] = {"priority": "interactive", "session_id": session_id}
+	if "cache" in options:
+		llm_options["cache"] = options["cache"]
+	return llm_options
+
+
+def _expert_personas(options: Dict[str, Any]) -> List[str]:
+	"""Personas from ``options.experts`` (list of system prompts) or the defaults."""
+	experts = options.get("experts")
+	if isinstance(experts, list):
+		personas = [str(e) for e in experts if isinstance(e, str) and e.strip()]
+		if personas:
+			return personas
+	return DEFAULT_EXPERTS
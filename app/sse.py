@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, AsyncGenerator, AsyncIterator, Deque, List, Optional
+
+import orjson
+
+
+HEARTBEAT = b": keep-alive\n\n"
+_DONE = object()
+
+
+def encode_event(event: Any, event_id: Optional[int] = None) -> bytes:
+	"""One SSE frame; text chunks are sent as ``{"chunk": ...}``."""
+	if not isinstance(event, dict):
+		event = {"chunk": event}
+	data = b"data: " + orjson.dumps(event) + b"\n\n"
+	if event_id is None:
+		return data
+	return b"id: %d\n" % event_id + data
+
+
+class SSEWriter:
+	"""Turns a stream of text chunks and event dicts into SSE bytes.
+
+	The source is consumed by a background task. Everything it has produced
+	by the time the response is written goes out in one write, with
+	consecutive text chunks merged into a single frame. ``coalesce_window``
+	(seconds) additionally holds text back for up to that long, or until
+	``coalesce_bytes`` have accumulated, to cut frames for fast providers.
+	Every frame carries an ``id`` — the sequence number of the last source
+	item it contains — so clients can resume with ``Last-Event-ID``. Items
+	are counted from 1 unless ``numbered`` sources yield ``(offset, item)``
+	pairs, in which case the id is ``offset + 1``. A comment is sent after ``heartbeat`` idle
+	seconds to keep proxies from closing long generations.
+	"""
+
+	def __init__(
+		self,
+		coalesce_window: float = 0.0,
+		coalesce_bytes: int = 4096,
+		heartbeat: float = 15.0,
+	) -> None:
+		self.coalesce_window = coalesce_window
+		self.coalesce_bytes = coalesce_bytes
+		self.heartbeat = heartbeat
+		self.next_id = 0
+		self._items: Deque[Any] = deque()
+		self._waiter: Optional[asyncio.Future] = None
+		self._error: Optional[BaseException] = None
+
+	async def stream(self, source: AsyncIterator[Any], numbered: bool = False) -> AsyncGenerator[bytes, None]:
+		producer = asyncio.ensure_future(self._produce(source))
+		text: List[str] = []
+		text_bytes = 0
+		text_since = 0.0
+		try:
+			while True:
+				out: List[bytes] = []
+				done = False
+				while self._items:
+					item = self._items.popleft()
+					if item is _DONE:
+						done = True
+						break
+					if numbered:
+						offset, item = item
+						if text and offset != self.next_id:
+							out.append(encode_event("".join(text), self.next_id))
+							text, text_bytes = [], 0
+						self.next_id = offset + 1
+					else:
+						self.next_id += 1
+					if isinstance(item, str):
+						if not text:
+							text_since = time.monotonic()
+						text.append(item)
+						text_bytes += len(item)
+						continue
+					if text:
+						out.append(encode_event("".join(text), self.next_id - 1))
+						text, text_bytes = [], 0
+					out.append(encode_event(item, self.next_id))
+				if text and (
+					done
+					or not self.coalesce_window
+					or text_bytes >= self.coalesce_bytes
+					or time.monotonic() - text_since >= self.coalesce_window
+				):
+					out.append(encode_event("".join(text), self.next_id))
+					text, text_bytes = [], 0
+				if out:
+					yield b"".join(out)
+				if done:
+					if self._error is not None:
+						raise self._error
+					return
+				if text:
+					await self._wait(text_since + self.coalesce_window - time.monotonic())
+				elif not await self._wait(self.heartbeat if self.heartbeat > 0 else None):
+					yield HEARTBEAT
+		finally:
+			producer.cancel()
+
+	async def _produce(self, source: AsyncIterator[Any]) -> None:
+		try:
+			async for item in source:
+				self._items.append(item)
+				self._wake()
+		except Exception as e:
+			self._error = e
+		finally:
+			self._items.append(_DONE)
+			self._wake()
+
+	def _wake(self) -> None:
+		if self._waiter is not None and not self._waiter.done():
+			self._waiter.set_result(True)
+
+	async def _wait(self, timeout: Optional[float]) -> bool:
+		"""Wait until the producer adds an item; False if ``timeout`` passed."""
+		if self._items:
+			return True
+		if timeout is not None and timeout <= 0:
+			return False
+		loop = asyncio.get_running_loop()
+		self._waiter = waiter = loop.create_future()
+		handle = loop.call_later(timeout, _expire, waiter) if timeout is not None else None
+		try:
+			return await waiter
+		finally:
+			if handle is not None:
+				handle.cancel()
+			self._waiter = None
+
+
+def _expire(waiter: asyncio.Future) -> None:
+	if not waiter.done():
+		waiter.set_result(False)
@@ -1,11 +1,18 @@
 from __future__ import annotations
 
 import asyncio
-import os
-import random
+import multiprocessing
 import time
+from concurrent.futures import BrokenExecutor, Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Protocol
+from typing import Any, Callable, Dict, List, Optional, Protocol, Tuple
+
+import orjson
+
+from .. import metrics
+
+
+EXECUTORS = ("inline", "thread", "process")
 
 
 class Tool(Protocol):
@@ -22,24 +29,190 @@ class ToolInfo:
 	description: str
 
 
+@dataclass
+class ToolSpec:
+	"""A registered tool and how it is run.
+
+	``executor`` is ``"inline"`` (``invoke`` on the event loop), ``"thread"``
+	or ``"process"`` (the tool's synchronous ``run(message, session_id)`` on
+	the registry's pools; process tools must be picklable). ``timeout`` is in
+	seconds and ``max_result_bytes`` caps the JSON result; 0 disables either.
+	"""
+
+	tool: Tool
+	executor: str = "inline"
+	timeout: float = 0.0
+	max_result_bytes: int = 0
+
+
+@dataclass
+class ToolResult:
+	name: str
+	# The tool's output as JSON, ready to be sent to the model.
+	content: str
+	ok: bool = True
+	elapsed: float = 0.0
+
+	@property
+	def output(self) -> Dict[str, Any]:
+		return orjson.loads(self.content)
+
+
 class ToolRegistry:
-	"""Holds built-in tools and user-extendable registry."""
+	"""Holds built-in tools and user-extendable registry.
 
-	def __init__(self) -> None:
-		self._tools: Dict[str, Tool] = {}
-		self._register_builtins()
+	Tools declare where they run (see :class:`ToolSpec`); ``register`` can
+	override it. CPU-heavy tools go to a process pool so large inputs do not
+	stall the event loop, blocking I/O tools to a thread pool. Process tools
+	with inputs up to ``inline_max_bytes`` (UTF-8) run inline, where
+	dispatching would cost more than the work; thread tools always use the
+	pool, since their run time does not depend on the input size. A call
+	that times out returns an error result; queued pool work is cancelled,
+	but a call already running in a pool finishes in the background.
 
-	def register(self, tool: Tool) -> None:
-		self._tools[tool.name] = tool
+	The built-in tools are imported and registered on first lookup, so
+	building a registry costs nothing at startup.
+	"""
+
+	def __init__(
+		self,
+		timeout: float = 10.0,
+		max_result_bytes: int = 1024 * 1024,
+		thread_workers: int = 4,
+		process_workers: int = 2,
+		inline_max_bytes: int = 8192,
+	) -> None:
+		self.timeout = timeout
+		self.max_result_bytes = max_result_bytes
+		self.thread_workers = thread_workers
+		self.process_workers = process_workers
+		self.inline_max_bytes = inline_max_bytes
+		self._tools: Dict[str, ToolSpec] = {}
+		self._pools: Dict[str, Executor] = {}
+		self._builtins_loaded = False
+
+	def register(
+		self,
+		tool: Tool,
+		executor: Optional[str] = None,
+		timeout: Optional[float] = None,
+		max_result_bytes: Optional[int] = None,
+	) -> None:
+		"""Add a tool. Unset arguments fall back to the tool's own ``executor``,
+		``timeout`` and ``max_result_bytes`` attributes, then to the registry
+		defaults."""
+		executor = executor or getattr(tool, "executor", None) or "inline"
+		if executor not in EXECUTORS:
+			raise ValueError(f"unknown executor for {tool.name}: {executor}")
+		if timeout is None:
+			timeout = getattr(tool, "timeout", None)
+		if max_result_bytes is None:
+			max_result_bytes = getattr(tool, "max_result_bytes", None)
+		self._tools[tool.name] = ToolSpec(
+			tool=tool,
+			executor=executor,
+			timeout=self.timeout if timeout is None else timeout,
+			max_result_bytes=self.max_result_bytes if max_result_bytes is None else max_result_bytes,
+		)
 
 	def get_tool(self, name: str) -> Optional[Tool]:
-		return self._tools.get(name)
+		self._load_builtins()
+		spec = self._tools.get(name)
+		return spec.tool if spec is not None else None
 
 	def list_tools_info(self) -> List[Dict[str, str]]:
+		self._load_builtins()
 		return [
-			{"name": t.name, "description": t.description} for t in self._tools.values()
+			{"name": s.tool.name, "description": s.tool.description, "executor": s.executor}
+			for s in self._tools.values()
 		]
 
+	async def invoke(self, name: str, message: str, session_id: str) -> ToolResult:
+		"""Run one tool. Failures, timeouts and oversized results come back as
+		``{"error": ...}`` outputs rather than exceptions."""
+		self._load_builtins()
+		spec = self._tools.get(name)
+		if spec is None:
+			raise KeyError(name)
+		start = time.perf_counter()
+		ok = False
+		try:
+			if spec.timeout > 0:
+				content = await asyncio.wait_for(self._run(spec, message, session_id), spec.timeout)
+			else:
+				content = await self._run(spec, message, session_id)
+			ok = True
+		except asyncio.TimeoutError:
+			content = _serialize({"error": f"tool timed out after {spec.timeout:g}s"}, 0)
+		except Exception as e:
+			content = _serialize({"error": f"{type(e).__name__}: {e}"}, 0)
+		finally:
+			elapsed = time.perf_counter() - start
+			metrics.TOOL_SECONDS.observe(elapsed, name)
+		if not ok:
+			metrics.TOOL_ERRORS.inc(name)
+		return ToolResult(name=name, content=content, ok=ok, elapsed=elapsed)
+
+	async def invoke_many(self, calls: List[Tuple[str, str]], session_id: str) -> List[ToolResult]:
+		"""Run ``(tool name, input)`` calls concurrently; results keep call order."""
+		return list(await asyncio.gather(*(self.invoke(n, m, session_id) for n, m in calls)))
+
+	def shutdown(self) -> None:
+		for pool in self._pools.values():
+			pool.shutdown(wait=False, cancel_futures=True)
+		self._pools.clear()
+
+	async def _run(self, spec: ToolSpec, message: str, session_id: str) -> str:
+		if spec.executor == "inline" or (spec.executor == "process" and self._small(message)):
+			output = await spec.tool.invoke(message=message, session_id=session_id)
+			return _serialize(output, spec.max_result_bytes)
+		pool = self._pool(spec.executor)
+		try:
+			# Serialized and capped in the worker: a large result never crosses
+			# the process boundary or gets encoded on the event loop.
+			return await asyncio.get_running_loop().run_in_executor(
+				pool, _run_serialized, getattr(spec.tool, "run"), message, session_id, spec.max_result_bytes
+			)
+		except BrokenExecutor:
+			# A worker died (crash, OOM kill); start a fresh pool next time.
+			if self._pools.get(spec.executor) is pool:
+				del self._pools[spec.executor]
+				pool.shutdown(wait=False)
+			raise
+
+	def _small(self, message: str) -> bool:
+		# A str never has fewer UTF-8 bytes than characters, so only
+		# short inputs need encoding.
+		return len(message) <= self.inline_max_bytes and len(message.encode()) <= self.inline_max_bytes
+
+	def _pool(self, executor: str) -> Executor:
+		pool = self._pools.get(executor)
+		if pool is None:
+			if executor == "process":
+				# Forking a process that runs threads (I/O pools, SQLite
+				# writer) is unsafe; workers start from a fresh interpreter.
+				pool = ProcessPoolExecutor(
+					max_workers=max(1, self.process_workers),
+					mp_context=multiprocessing.get_context("spawn"),
+				)
+			else:
+				pool = ThreadPoolExecutor(
+					max_workers=max(1, self.thread_workers),
+					thread_name_prefix="samurai-tool",
+				)
+			self._pools[executor] = pool
+		return pool
+
+	def _load_builtins(self) -> None:
+		"""Register the built-ins ahead of any tools added so far, which keep
+		precedence over a built-in of the same name."""
+		if self._builtins_loaded:
+			return
+		self._builtins_loaded = True
+		custom, self._tools = self._tools, {}
+		self._register_builtins()
+		self._tools.update(custom)
+
 	def _register_builtins(self) -> None:
 		from .tools_builtin import (
 			TimeTool,
@@ -73,3 +246,20 @@ class ToolRegistry:
 			SlugifyTool,
 		]:
 			self.register(tool_cls())
+
+
+def _run_serialized(run: Callable[[str, str], Dict[str, Any]], message: str, session_id: str, max_bytes: int) -> str:
+	return _serialize(run(message, session_id), max_bytes)
+
+
+def _serialize(output: Dict[str, Any], max_bytes: int) -> str:
+	data = orjson.dumps(output, default=str)
+	if max_bytes <= 0 or len(data) <= max_bytes:
+		return data.decode()
+	return orjson.dumps({
+		"error": "result too large",
+		"bytes": len(data),
+		"limit": max_bytes,
+		# Re-encoding the JSON text as a string can double it.
+		"truncated": data[: max_bytes // 2].decode(errors="ignore"),
+	}).decode()
@@ -16,8 +16,14 @@ from typing import Any, Dict, List
 class BaseTool:
 	name: str = "base"
 	description: str = ""
+	# Where the registry runs the tool: "inline", "thread" or "process".
+	# Pooled tools implement the synchronous ``run``.
+	executor: str = "inline"
 
 	async def invoke(self, message: str, session_id: str) -> Dict[str, Any]:
+		return self.run(message, session_id)
+
+	def run(self, message: str, session_id: str) -> Dict[str, Any]:
 		raise NotImplementedError
 
 
@@ -42,8 +48,9 @@ class UUIDTool(BaseTool):
 class SearchReplaceTool(BaseTool):
 	name = "text.search_replace"
 	description = "Find and replace pattern in text. Input JSON: {text, pattern, replace}"
+	executor = "process"
 
-	async def invoke(self, message: str, session_id: str) -> Dict[str, Any]:
+	def run(self, message: str, session_id: str) -> Dict[str, Any]:
 		try:
 			obj = json.loads(message)
 		except Exception:
@@ -84,8 +91,9 @@ class RandomNumberTool(BaseTool):
 class MarkdownToHTMLTool(BaseTool):
 	name = "convert.md_to_html"
 	description = "Very small markdown-to-HTML converter for headings and code blocks"
+	executor = "process"
 
-	async def invoke(self, message: str, session_id: str) -> Dict[str, Any]:
+	def run(self, message: str, session_id: str) -> Dict[str, Any]:
 		text = message
 		# extremely minimal conversion
 		html = text
@@ -99,8 +107,9 @@ class MarkdownToHTMLTool(BaseTool):
 class JSONValidatorTool(BaseTool):
 	name = "json.validate"
 	description = "Validate JSON string and return parsed object or error"
+	executor = "process"
 
-	async def invoke(self, message: str, session_id: str) -> Dict[str, Any]:
+	def run(self, message: str, session_id: str) -> Dict[str, Any]:
 		try:
 			parsed = json.loads(message)
 			return {"valid": True, "object": parsed}
@@ -111,8 +120,9 @@ class JSONValidatorTool(BaseTool):
 class TextSummarizerTool(BaseTool):
 	name = "text.summarize"
 	description = "Naive summarizer: returns the first N sentences. Input JSON: {text, sentences}"
+	executor = "process"
 
-	async def invoke(self, message: str, session_id: str) -> Dict[str, Any]:
+	def run(self, message: str, session_id: str) -> Dict[str, Any]:
 		try:
 			obj = json.loads(message)
 		except Exception:
@@ -126,8 +136,9 @@ class TextSummarizerTool(BaseTool):
 class KeywordExtractorTool(BaseTool):
 	name = "text.keywords"
 	description = "Extract frequent keywords (naive). Input JSON: {text, topN}"
+	executor = "process"
 
-	async def invoke(self, message: str, session_id: str) -> Dict[str, Any]:
+	def run(self, message: str, session_id: str) -> Dict[str, Any]:
 		try:
 			obj = json.loads(message)
 		except Exception:
@@ -147,8 +158,9 @@ class KeywordExtractorTool(BaseTool):
 class CSVToJSONTool(BaseTool):
 	name = "convert.csv_to_json"
 	description = "Convert CSV text to JSON array"
+	executor = "process"
 
-	async def invoke(self, message: str, session_id: str) -> Dict[str, Any]:
+	def run(self, message: str, session_id: str) -> Dict[str, Any]:
 		reader = csv.DictReader(io.StringIO(message))
 		return {"rows": list(reader)}
 
@@ -1,19 +1,81 @@
 from __future__ import annotations
 
-import json
-from typing import Any, Dict, Tuple
+import hashlib
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
-from jsonschema import Draft202012Validator
+import orjson
 
+from .. import metrics
 
-def validate_json_string(text: str, schema: Dict[str, Any]) -> Tuple[bool, str]:
-	"""Validate a JSON string against a JSON Schema. Returns (ok, error_string)."""
+if TYPE_CHECKING:
+	from jsonschema import Draft202012Validator
+
+
+class ValidatorCache:
+	"""LRU of compiled validators keyed by a hash of the canonical schema.
+
+	Checking a schema and building its validator (with its ``$ref``
+	resolver) costs far more than validating a typical reply, and clients
+	send the same few schemas over and over. Equal schemas share an entry
+	however their keys are ordered. Invalid schemas are cached too.
+	jsonschema is imported on the first miss, so apps that never validate
+	do not load it.
+	"""
+
+	def __init__(self, max_entries: int = 128) -> None:
+		self.max_entries = max_entries
+		self._entries: "OrderedDict[str, Tuple[Optional[Draft202012Validator], str]]" = OrderedDict()
+
+	def get(self, schema: Dict[str, Any]) -> Tuple[Optional[Draft202012Validator], str]:
+		"""Return ``(validator, "")``, or ``(None, error)`` for an invalid schema."""
+		key = hashlib.sha256(orjson.dumps(schema, option=orjson.OPT_SORT_KEYS)).hexdigest()
+		entry = self._entries.get(key)
+		if entry is not None:
+			self._entries.move_to_end(key)
+			metrics.SCHEMA_VALIDATOR_CACHE.inc("hit")
+			return entry
+		metrics.SCHEMA_VALIDATOR_CACHE.inc("miss")
+		from jsonschema import Draft202012Validator
+		from jsonschema.exceptions import SchemaError
+
+		try:
+			Draft202012Validator.check_schema(schema)
+			entry = (Draft202012Validator(schema), "")
+		except SchemaError as e:
+			entry = (None, f"invalid schema: {e.message}")
+		self._entries[key] = entry
+		while len(self._entries) > self.max_entries:
+			self._entries.popitem(last=False)
+		return entry
+
+	def __len__(self) -> int:
+		return len(self._entries)
+
+
+validators = ValidatorCache()
+
+
+def validate_json_string(
+	text: str, schema: Dict[str, Any], first_error: bool = False
+) -> Tuple[bool, str]:
+	"""Validate a JSON string against a JSON Schema. Returns (ok, error_string).
+
+	With ``first_error`` validation stops at the first error instead of
+	collecting and sorting all of them.
+	"""
 	try:
-		obj = json.loads(text)
-	except Exception as e:
+		obj = orjson.loads(text)
+	except orjson.JSONDecodeError as e:
 		return False, f"JSON parse error: {e}"
-	validator = Draft202012Validator(schema)
-	errors = sorted(validator.iter_errors(obj), key=lambda e: e.path)
+	validator, schema_error = validators.get(schema)
+	if validator is None:
+		return False, schema_error
+	if first_error:
+		error = next(validator.iter_errors(obj), None)
+		errors = [error] if error is not None else []
+	else:
+		errors = sorted(validator.iter_errors(obj), key=lambda e: [str(p) for p in e.path])
 	if errors:
 		lines = []
 		for err in errors:
@@ -21,3 +83,133 @@ def validate_json_string(text: str, schema: Dict[str, Any]) -> Tuple[bool, str]:
 			lines.append(f"{loc}: {err.message}")
 		return False, "\n".join(lines)
 	return True, ""
+
+
+_LITERALS = {"t": "rue", "f": "alse", "n": "ull"}
+_NUMBER_CHARS = frozenset("0123456789+-.eE")
+_ESCAPES = frozenset('"\\/bfnrtu')
+_HEX = frozenset("0123456789abcdefABCDEF")
+
+
+class JSONPrefixChecker:
+	"""Incremental JSON syntax check for streamed model output.
+
+	Feed chunks as they arrive; ``error`` is set as soon as the text seen so
+	far can no longer be the prefix of a valid JSON document. Schema
+	validation still needs the complete text (see :func:`validate_json_string`).
+	"""
+
+	def __init__(self) -> None:
+		self.error: Optional[str] = None
+		self.position = 0
+		self._stack: List[str] = []
+		self._expect = "value"
+		self._in_string = False
+		self._string_is_key = False
+		self._escape = False
+		self._unicode_left = 0
+		self._literal = ""
+		self._in_number = False
+
+	@property
+	def complete(self) -> bool:
+		"""True if the text fed so far is one whole JSON document."""
+		return (
+			self.error is None
+			and not self._stack
+			and not self._in_string
+			and not self._literal
+			and (self._in_number or self._expect == "after_value")
+		)
+
+	def feed(self, text: str) -> Optional[str]:
+		"""Consume ``text`` and return the first syntax error, if any."""
+		for c in text:
+			if self.error is not None:
+				break
+			self._step(c)
+			self.position += 1
+		return self.error
+
+	def _fail(self, c: str) -> None:
+		self.error = f"unexpected {c!r} at offset {self.position}"
+
+	def _step(self, c: str) -> None:
+		if self._in_string:
+			if self._unicode_left:
+				if c not in _HEX:
+					self._fail(c)
+				self._unicode_left -= 1
+			elif self._escape:
+				if c not in _ESCAPES:
+					self._fail(c)
+				self._escape = False
+				if c == "u":
+					self._unicode_left = 4
+			elif c == "\\":
+				self._escape = True
+			elif c == '"':
+				self._in_string = False
+				self._expect = "colon" if self._string_is_key else "after_value"
+			elif ord(c) < 0x20:
+				self._fail(c)
+			return
+		if self._literal:
+			if c != self._literal[0]:
+				self._fail(c)
+				return
+			self._literal = self._literal[1:]
+			if not self._literal:
+				self._expect = "after_value"
+			return
+		if self._in_number:
+			if c in _NUMBER_CHARS:
+				return
+			self._in_number = False
+			self._expect = "after_value"
+		if c in " \t\r\n":
+			return
+		expect = self._expect
+		if expect in ("value", "value_or_end"):
+			if c == "{":
+				self._stack.append("{")
+				self._expect = "key_or_end"
+			elif c == "[":
+				self._stack.append("[")
+				self._expect = "value_or_end"
+			elif c == '"':
+				self._in_string = True
+				self._string_is_key = False
+			elif c == "-" or c.isdigit():
+				self._in_number = True
+			elif c in _LITERALS:
+				self._literal = _LITERALS[c]
+			elif c == "]" and expect == "value_or_end":
+				self._close()
+			else:
+				self._fail(c)
+		elif expect in ("key", "key_or_end"):
+			if c == '"':
+				self._in_string = True
+				self._string_is_key = True
+			elif c == "}" and expect == "key_or_end":
+				self._close()
+			else:
+				self._fail(c)
+		elif expect == "colon":
+			if c == ":":
+				self._expect = "value"
+			else:
+				self._fail(c)
+		elif not self._stack:
+			self._fail(c)
+		elif c == ",":
+			self._expect = "key" if self._stack[-1] == "{" else "value"
+		elif (c == "}" and self._stack[-1] == "{") or (c == "]" and self._stack[-1] == "["):
+			self._close()
+		else:
+			self._fail(c)
+
+	def _close(self) -> None:
+		self._stack.pop()
+		self._expect = "after_value"
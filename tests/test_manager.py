@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+from app.config import Settings
+from app.llm.base import ChatMessage
+from app.llm.manager import LLMManager
+from app.llm.ratelimit import QueueFullError
+
+
+PROMPT = [ChatMessage(role="user", content="one two three four five six")]
+
+
+def _manager(monkeypatch: pytest.MonkeyPatch, **env: str) -> LLMManager:
+	monkeypatch.setenv("SAMURAI_PROVIDERS", "mock")
+	monkeypatch.setenv("SAMURAI_RESPONSE_CACHE", "off")
+	for name, value in env.items():
+		monkeypatch.setenv(name, value)
+	return LLMManager(Settings())
+
+
+def test_open_stream_holds_its_gate_slot(monkeypatch: pytest.MonkeyPatch) -> None:
+	manager = _manager(
+		monkeypatch,
+		SAMURAI_PROVIDER_CONCURRENCY="mock=1",
+		SAMURAI_PROVIDER_QUEUE_MAX="0",
+	)
+
+	async def run() -> None:
+		first = await manager.complete(PROMPT, stream=True)
+		await first.__anext__()
+		# The first stream is still open, so it still holds the only slot.
+		with pytest.raises(QueueFullError):
+			await manager.complete(PROMPT, stream=True)
+		await first.aclose()
+		second = await manager.complete(PROMPT, stream=True)
+		assert [chunk async for chunk in second]
+		assert manager._gate("mock").in_flight == 0
+		await manager.aclose()
+
+	asyncio.run(run())
+
+
+def test_unread_stream_frees_its_gate_slot_on_close(monkeypatch: pytest.MonkeyPatch) -> None:
+	manager = _manager(monkeypatch, SAMURAI_PROVIDER_CONCURRENCY="mock=1")
+
+	async def run() -> None:
+		stream = await manager.complete(PROMPT, stream=True)
+		assert manager._gate("mock").in_flight == 1
+		await stream.aclose()
+		assert manager._gate("mock").in_flight == 0
+		await manager.aclose()
+
+	asyncio.run(run())
+
+
+def _half_open(manager: LLMManager) -> None:
+	health = manager.health.get("mock")
+	health.opened_at = time.monotonic() - health.cooldown - 1
+	assert health.state == "half_open"
+
+
+def test_probe_stream_closed_unread_gives_back_the_probe(monkeypatch: pytest.MonkeyPatch) -> None:
+	manager = _manager(monkeypatch)
+	_half_open(manager)
+
+	async def run() -> None:
+		stream = await manager.complete(PROMPT, stream=True)
+		assert not manager.health.get("mock").allow()
+		await stream.aclose()
+		assert manager.health.get("mock").allow()
+		await manager.aclose()
+
+	asyncio.run(run())
+
+
+def test_probe_stream_cancelled_before_first_chunk_gives_back_the_probe(
+	monkeypatch: pytest.MonkeyPatch,
+) -> None:
+	manager = _manager(monkeypatch, SAMURAI_MOCK_TTFT="5")
+	_half_open(manager)
+
+	async def run() -> None:
+		stream = await manager.complete(PROMPT, stream=True)
+		reader = asyncio.ensure_future(stream.__anext__())
+		await asyncio.sleep(0.05)
+		reader.cancel()
+		with pytest.raises(asyncio.CancelledError):
+			await reader
+		await stream.aclose()
+		assert manager.health.get("mock").allow()
+		await manager.aclose()
+
+	asyncio.run(run())